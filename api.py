@@ -1,41 +1,254 @@
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import binascii
+import functools
+import json
 import logging
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
 from bson import ObjectId
-from egg_price_schema import EggPriceDatabase
+from price_storage import get_price_storage
+from price_records import city_key, expand_egg_rates
+from price_retention import (
+    read_prices_by_date_range, read_prices_on_date, read_prices_page, read_record_batches, read_records_for_cities,
+)
+from price_stats import DEFAULT_WINDOW, compute_price_stats, lookback_start
+from price_export import ARROW_AVAILABLE, DEFAULT_BATCH_SIZE, export_chunks, export_filename, media_type
+from mongo_connection import close_mongo_clients, get_pool_stats
+from timeseries_storage import TimeSeriesPriceStore
+from api_metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, registry as metrics, timed_db_call
+from api_push import PriceBroadcaster
+from api_cache import (
+    MISSING, CityCatalog, DataVersions, RateLimiter, SingleFlight, TTLCache, cache_key, http_date, is_not_modified,
+    make_etag,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def convert_objectid(doc):
-    """Convert MongoDB ObjectId to string for JSON serialization"""
-    if isinstance(doc, dict):
-        for key, value in doc.items():
-            if isinstance(value, ObjectId):
-                doc[key] = str(value)
-            elif isinstance(value, dict):
-                convert_objectid(value)
-            elif isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict):
-                        convert_objectid(item)
-    return doc
+# Egg document fields that never appear in a response; the rates are flattened into the top level
+EGG_INTERNAL_FIELDS = frozenset(('_id', 'query_text', 'unit_price', 'packs', 'missing_packs', 'rates'))
+CHICKEN_RATE_FIELDS = (
+    'boneless', 'chicken', 'chicken_liver', 'country', 'live', 'skinless', 'date_of_price', 'date_of_scraping',
+)
+
+def egg_rates(price):
+    """Full egg rates of a legacy (rates) or compact (unit price plus observed packs) document"""
+    if 'rates' in price:
+        return price['rates']
+    if 'unit_price' in price:
+        return expand_egg_rates(price['unit_price'], price.get('packs'), price.get('missing_packs'))
+    return {}
+
+def format_egg_price(price):
+    """Flatten the egg rates into the top level of the document"""
+    formatted = {key: value for key, value in price.items() if key not in EGG_INTERNAL_FIELDS}
+    formatted.update(egg_rates(price))
+    return formatted
+
+def format_chicken_rates(doc):
+    """Pick the chicken variety prices and dates out of a chicken document"""
+    return {field: doc.get(field) for field in CHICKEN_RATE_FIELDS}
+
+def format_chicken_price(price):
+    """Shape a chicken document for the historical and range endpoints"""
+    return {
+        'city': price['city'],
+        'timestamp': price['date_of_scraping'],
+        'chicken_rates': format_chicken_rates(price)
+    }
+
+def format_latest_response(commodity, prices, city=None):
+    """Shape the newest documents per city the way /prices/latest returns them"""
+    if commodity == Commodity.CHICKEN:
+        return [{"chicken_rates": format_chicken_rates(price)} for price in prices]
+    if city:
+        if commodity == Commodity.EGG:
+            return [format_egg_price(price) for price in prices]
+        return prices
+    formatted = []
+    for price in prices:
+        if commodity == Commodity.EGG:
+            # All-city egg results keep the nested rates and also expose them at the top level
+            rates = egg_rates(price)
+            price = {key: value for key, value in price.items() if key not in EGG_INTERNAL_FIELDS}
+            if rates:
+                price['rates'] = rates
+                price.update(rates)
+        formatted.append({'_id': price['city'], 'latest_price': price})
+    return formatted
+
+def format_range_response(commodity, prices):
+    """Shape date-ordered documents the way /prices/range returns them"""
+    if commodity == Commodity.CHICKEN:
+        return [format_chicken_price(price) for price in prices]
+    if commodity == Commodity.EGG:
+        return [format_egg_price(price) for price in prices]
+    return prices
+
+def encode_response(content) -> bytes:
+    """
+    Encode a response body as JSON
+
+    Uses orjson when it is installed; anything it cannot encode natively
+    (ObjectId from documents read without a projection) is written as a string.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=str)
+    return json.dumps(
+        jsonable_encoder(content, custom_encoder={ObjectId: str}),
+        ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+    ).encode("utf-8")
+
+def json_response(content, status_code: int = 200) -> Response:
+    """Uncached JSON response encoded with encode_response"""
+    return Response(encode_response(content), status_code=status_code, media_type='application/json')
+
+def columnar_prices(records_by_commodity, varieties=None):
+    """
+    Lay out price records as one shared dates array plus value arrays per series
+
+    Args:
+        records_by_commodity (dict): {commodity: price records}
+        varieties (list, optional): Only these varieties
+
+    Returns:
+        dict: {'dates': ['YYYY-MM-DD', ...],
+               'series': {commodity: {city_key: {variety: [price or None per date]}}}}
+    """
+    wanted = set(varieties) if varieties else None
+    selected = {
+        commodity: [r for r in records if wanted is None or r['variety'] in wanted]
+        for commodity, records in records_by_commodity.items()
+    }
+    dates = sorted({r['date'] for records in selected.values() for r in records})
+    position = {day: i for i, day in enumerate(dates)}
+    series = {}
+    for commodity, records in selected.items():
+        cities = series.setdefault(commodity, {})
+        for record in records:
+            values = cities.setdefault(record['city_key'], {}).get(record['variety'])
+            if values is None:
+                values = cities[record['city_key']][record['variety']] = [None] * len(dates)
+            values[position[record['date']]] = record['price']
+    return {'dates': [day.strftime('%Y-%m-%d') for day in dates], 'series': series}
+
+def encode_cursor(position) -> Optional[str]:
+    """Opaque page token for a keyset position (see price_retention.read_prices_page)"""
+    if position is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(token):
+    """Keyset position of a page token; raises ValueError for tokens this API did not issue"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if (not isinstance(position, list) or len(position) != 3 or position[0] not in ('archive', 'raw')
+            or not all(isinstance(part, str) for part in position)):
+        raise ValueError("Invalid cursor")
+    # Storage parses both parts; a forged date or document id must not reach it
+    try:
+        datetime.fromisoformat(position[1])
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if position[2] and not ObjectId.is_valid(position[2]):
+        raise ValueError("Invalid cursor")
+    return position
 
 class Commodity(str, Enum):
     EGG = "egg"
     COPRA = "copra"
     CHICKEN = "chicken"
 
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    PARQUET = "parquet"
+    ARROW = "arrow"
+
+class RollupPeriod(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Per-worker startup and shutdown
+
+    Creates the database thread pool and connects to the price storage. A
+    worker whose storage is down still starts: /ready answers 503 and
+    requests retry the connection until it succeeds.
+    """
+    global db, db_executor, _timeseries_store
+    if API_DB_THREADS > 0:
+        db_executor = ThreadPoolExecutor(max_workers=API_DB_THREADS, thread_name_prefix='api-db')
+    try:
+        await get_db()
+    except HTTPException:
+        print(f"⚠️ Starting without price storage: {_storage_error['message']}")
+    yield
+    await price_push.close()
+    if db_executor is not None:
+        db_executor.shutdown(wait=True)
+        db_executor = None
+    if db is not None:
+        db.close()
+        db = None
+    _timeseries_store = None
+    close_mongo_clients()
+
 app = FastAPI(
     title="Egg Price API",
     description="API for retrieving and managing egg price data",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Per-client token buckets in front of every route except the probes; off unless API_RATE_LIMIT is set
+API_RATE_LIMIT = float(os.getenv('API_RATE_LIMIT', '0'))
+API_RATE_LIMIT_HEADER = os.getenv('API_RATE_LIMIT_HEADER')
+RATE_LIMIT_EXEMPT_PATHS = frozenset(('/', '/ready', '/metrics'))
+rate_limiter = RateLimiter(API_RATE_LIMIT, float(os.getenv('API_RATE_BURST') or 2 * API_RATE_LIMIT))
+
+def client_id(request: Request) -> str:
+    """Rate limit identity: the API_RATE_LIMIT_HEADER value (first hop) or the peer address"""
+    if API_RATE_LIMIT_HEADER:
+        value = request.headers.get(API_RATE_LIMIT_HEADER)
+        if value:
+            return value.split(',')[0].strip()
+    return request.client.host if request.client else 'unknown'
+
+# Registered before CORS so 429 responses still carry the CORS headers
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    if rate_limiter.enabled and request.url.path not in RATE_LIMIT_EXEMPT_PATHS:
+        wait = rate_limiter.acquire(client_id(request))
+        if wait:
+            return Response(
+                encode_response({"detail": "Too many requests"}), status_code=429,
+                media_type='application/json', headers={'Retry-After': str(math.ceil(wait))},
+            )
+    return await call_next(request)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -45,22 +258,238 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Database connection
-try:
-    db = EggPriceDatabase()
-    # Add chicken prices collection
-    db.chicken_prices = db.client["egg_price_data"]["chicken_prices_pw"]
-    # Verify collections exist (check if they are None, not their truth value)
-    if db.egg_prices is None:
-        raise Exception("Egg prices collection not initialized")
-    if db.copra_prices is None:
-        raise Exception("Copra prices collection not initialized")
-    if db.chicken_prices is None:
-        raise Exception("Chicken prices collection not initialized")
-    print("Successfully connected to all collections")
-except Exception as e:
-    print(f"Database connection error: {e}")
-    raise
+# Request latency, status, size and in-flight metrics (outermost, so 429s and CORS are included)
+API_METRICS = os.getenv('API_METRICS', '1') != '0'
+if API_METRICS:
+    app.add_middleware(MetricsMiddleware)
+
+# Storage calls are blocking (pymongo / sqlite3), so routes run them in a dedicated
+# thread pool instead of on the event loop. Keep API_DB_THREADS at or below
+# MONGO_MAX_POOL_SIZE so threads do not queue for connections; 0 runs them inline.
+API_DB_THREADS = int(os.getenv('API_DB_THREADS', '32'))
+# Seconds a failed storage connection is reported (503) before it is retried
+API_STORAGE_RETRY_SECONDS = float(os.getenv('API_STORAGE_RETRY_SECONDS', '5'))
+
+# The price storage (backend selected by PRICE_STORAGE_BACKEND: mongo or sqlite)
+# and the thread pool are opened per worker process by the lifespan hook, never
+# at import, so importing the app (tests, OpenAPI export, a pre-fork server
+# master) does no network I/O and workers do not share a MongoClient
+db = None
+db_executor = None
+_connect_lock = threading.Lock()
+_storage_error = {'message': None, 'failed_at': None}
+
+def connect_storage():
+    """
+    Open the price storage once per process (blocking)
+
+    Raises:
+        Exception: While the storage is unreachable (re-tried after API_STORAGE_RETRY_SECONDS)
+    """
+    global db
+    with _connect_lock:
+        if db is None:
+            failed_at = _storage_error['failed_at']
+            if failed_at is not None and time.monotonic() - failed_at < API_STORAGE_RETRY_SECONDS:
+                raise RuntimeError(_storage_error['message'])
+            try:
+                db = get_price_storage()
+            except Exception as e:
+                _storage_error.update(message=str(e), failed_at=time.monotonic())
+                raise
+            _storage_error.update(message=None, failed_at=None)
+            print(f"Successfully connected to {db.backend} price storage (pid {os.getpid()})")
+        return db
+
+db_call_stats = {'in_flight': 0, 'max_in_flight': 0, 'calls': 0}
+
+async def run_db(func, *args):
+    """Run a blocking storage call in the database thread pool, timed per operation for /metrics"""
+    db_call_stats['calls'] += 1
+    call = functools.partial(timed_db_call, func, *args) if API_METRICS else functools.partial(func, *args)
+    if db_executor is None:
+        return call()
+    db_call_stats['in_flight'] += 1
+    db_call_stats['max_in_flight'] = max(db_call_stats['max_in_flight'], db_call_stats['in_flight'])
+    try:
+        return await asyncio.get_running_loop().run_in_executor(db_executor, call)
+    finally:
+        db_call_stats['in_flight'] -= 1
+
+async def get_db():
+    """The price storage, connected on first use; 503 while it cannot be reached"""
+    if db is not None:
+        return db
+    try:
+        return await run_db(connect_storage)
+    except Exception as e:
+        logger.error(f"Database connection error: {str(e)}")
+        raise HTTPException(status_code=503, detail="Price storage unavailable")
+
+# Documents per keyset batch when streaming a range as NDJSON
+API_STREAM_BATCH_SIZE = int(os.getenv('API_STREAM_BATCH_SIZE', '500'))
+API_BATCH_MAX_CITIES = int(os.getenv('API_BATCH_MAX_CITIES', '200'))
+
+# Read responses are cached per data version; scrapers bump a commodity's
+# version on every write, so new prices are served within API_CACHE_VERSION_POLL seconds
+response_cache = TTLCache(
+    max_entries=int(os.getenv('API_CACHE_MAX_ENTRIES', '1024')),
+    ttl=float(os.getenv('API_CACHE_TTL', '300')),
+)
+data_versions = DataVersions(lambda: connect_storage().get_data_versions(), float(os.getenv('API_CACHE_VERSION_POLL', '2')))
+# Concurrent misses for the same key (e.g. every dashboard polling /prices/latest
+# right after a scrape) share one storage query
+single_flight = SingleFlight()
+
+# City keys with data per commodity, reloaded when the commodity's data version changes
+# (or after API_CITY_CATALOG_TTL seconds, for writes that do not bump the version)
+city_catalog = CityCatalog(ttl=float(os.getenv('API_CITY_CATALOG_TTL', '300')))
+
+async def known_cities(commodity):
+    """
+    City keys with prices for a commodity, from the in-memory catalog
+
+    Returns None when the data versions cannot be read; callers then skip validation.
+    """
+    if data_versions.is_stale():
+        await run_db(data_versions.refresh)
+    version = data_versions.get(commodity.value)
+    if version is None:
+        return None
+    cities = city_catalog.get(commodity.value, version)
+    if cities is None:
+        storage = await get_db()
+        keys = await single_flight.run(
+            ('city_keys', commodity.value, version), lambda: run_db(storage.get_city_keys, commodity.value)
+        )
+        cities = city_catalog.set(commodity.value, version, keys)
+    return cities
+
+async def check_cities(commodity, cities):
+    """Reject cities without prices for a commodity (404) before any price query runs"""
+    if not cities:
+        return
+    known = await known_cities(commodity)
+    if known is None:
+        return
+    unknown = [city for city in cities if city_key(city) not in known]
+    if unknown:
+        city_catalog.rejected()
+        raise HTTPException(
+            status_code=404,
+            detail=f"No {commodity.value} price data found for {', '.join(unknown)} (see /cities)"
+        )
+
+def collect_cache_metrics():
+    """Response cache, coalescing, rate limit and thread pool values for /metrics"""
+    cache = response_cache.stats()
+    endpoints = cache['endpoints']
+    flights = single_flight.stats()
+    limits = rate_limiter.stats()
+    return [
+        ('api_cache_hits_total', 'counter', 'Response cache hits per endpoint',
+         [({'endpoint': endpoint}, counts['hits']) for endpoint, counts in endpoints.items()]),
+        ('api_cache_misses_total', 'counter', 'Response cache misses per endpoint',
+         [({'endpoint': endpoint}, counts['misses']) for endpoint, counts in endpoints.items()]),
+        ('api_cache_hit_ratio', 'gauge', 'Response cache hit ratio per endpoint',
+         [({'endpoint': endpoint}, counts['hit_ratio']) for endpoint, counts in endpoints.items()]),
+        ('api_cache_entries', 'gauge', 'Cached responses', [({}, cache['entries'])]),
+        ('api_cache_evictions_total', 'counter', 'Responses evicted from the cache', [({}, cache['evictions'])]),
+        ('api_coalesced_requests_total', 'counter', 'Requests that joined an identical query in flight',
+         [({}, flights['coalesced'])]),
+        ('api_rate_limited_requests_total', 'counter', 'Requests rejected with 429', [({}, limits['limited'])]),
+        ('api_db_calls_in_flight', 'gauge', 'Storage calls running or queued in the thread pool',
+         [({}, db_call_stats['in_flight'])]),
+        ('api_unknown_city_rejections_total', 'counter', 'Requests for unknown cities answered without a query',
+         [({}, city_catalog.stats()['rejected'])]),
+    ]
+
+metrics.add_collector(collect_cache_metrics)
+
+async def load_versions():
+    """Data versions for the push channel, sharing the response cache's poll"""
+    if data_versions.is_stale():
+        await run_db(data_versions.refresh)
+    return data_versions.versions
+
+async def load_latest_payloads(commodity):
+    """Encoded /prices/stream payload per city: the city's /prices/latest entry"""
+    storage = await get_db()
+    prices = await run_db(storage.get_latest_prices, commodity, None)
+    payloads = {}
+    for price in prices:
+        key = city_key(price['city'])
+        payloads[key] = encode_response({
+            "commodity": commodity,
+            "city": key,
+            "price": format_latest_response(Commodity(commodity), [price], price['city'])[0],
+        })
+    return payloads
+
+# One broadcaster per worker: each new price is read once and fanned out to every subscriber
+API_PUSH_HEARTBEAT = float(os.getenv('API_PUSH_HEARTBEAT', '15'))
+price_push = PriceBroadcaster(
+    load_versions, load_latest_payloads,
+    poll_interval=float(os.getenv('API_PUSH_POLL', '2')),
+    queue_size=int(os.getenv('API_PUSH_QUEUE_SIZE', '100')),
+    max_subscribers=int(os.getenv('API_PUSH_MAX_SUBSCRIBERS', '1000')),
+)
+
+def collect_push_metrics():
+    """Push channel values for /metrics"""
+    push = price_push.stats()
+    return [
+        ('api_push_subscribers', 'gauge', 'Open /prices/stream subscriptions', [({}, push['subscribers'])]),
+        ('api_push_events_total', 'counter', 'Price events published', [({}, push['events'])]),
+        ('api_push_deliveries_total', 'counter', 'Price events queued to subscribers', [({}, push['deliveries'])]),
+        ('api_push_loads_total', 'counter', 'Latest price reads made for the push channel', [({}, push['loads'])]),
+        ('api_push_slow_disconnects_total', 'counter', 'Subscribers dropped for falling behind',
+         [({}, push['disconnected_slow'])]),
+    ]
+
+metrics.add_collector(collect_push_metrics)
+
+async def cached_response(request, endpoint, commodity, parts, compute):
+    """
+    Serve an endpoint call from the response cache, computing and caching it on a miss
+
+    Responses carry an ETag (hash of the body) and, once the commodity has a
+    recorded write, Last-Modified; matching conditional requests get 304.
+
+    Args:
+        request (Request): Incoming request (for If-None-Match / If-Modified-Since)
+        endpoint (str): Endpoint name (part of the key and of the hit/miss statistics)
+        commodity (Commodity): Commodity whose data version the response depends on
+        parts (tuple): Remaining key parts (city key, dates)
+        compute (callable): Coroutine function producing the response content; exceptions are not
+            cached. Concurrent misses for the same key await a single call.
+    """
+    if data_versions.is_stale():
+        await run_db(data_versions.refresh)
+    version = data_versions.get(commodity.value)
+    use_cache = response_cache.enabled and version is not None
+
+    key = cache_key(endpoint, commodity.value, version, *parts)
+    entry = response_cache.get(key, endpoint) if use_cache else MISSING
+    if entry is MISSING:
+        async def compute_entry():
+            body = encode_response(await compute())
+            entry = {
+                'body': body, 'etag': make_etag(body), 'last_modified': data_versions.last_modified(commodity.value),
+            }
+            if use_cache:
+                response_cache.set(key, entry)
+            return entry
+
+        entry = await single_flight.run(key, compute_entry)
+
+    # no-cache: clients may store the response but must revalidate it on every poll
+    headers = {'ETag': entry['etag'], 'Cache-Control': 'no-cache'}
+    if entry['last_modified'] is not None:
+        headers['Last-Modified'] = http_date(entry['last_modified'])
+    if is_not_modified(request.headers, entry['etag'], entry['last_modified']):
+        return Response(status_code=304, headers=headers)
+    return Response(entry['body'], media_type='application/json', headers=headers)
 
 # Pydantic models for request/response validation
 class EggPriceRate(BaseModel):
@@ -108,123 +537,99 @@ async def root():
     """
     return {"message": "Welcome to Egg Price API", "version": "1.0.0"}
 
+@app.get("/ready")
+async def readiness():
+    """
+    Readiness probe: 200 once this worker's price storage is connected and answers a ping
+    """
+    try:
+        storage = await get_db()
+        await run_db(storage.ping)
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        return json_response({"status": "unavailable", "detail": detail, "pid": os.getpid()}, status_code=503)
+    return {"status": "ready", "backend": storage.backend, "pid": os.getpid()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics of this worker: request latency and size per route, storage call timing, cache and limiter counters
+    """
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/db/pool")
+async def get_db_pool_stats():
+    """
+    Get shared MongoDB connection pool and API database thread pool statistics
+    """
+    return {
+        "pools": get_pool_stats(),
+        "db_threads": API_DB_THREADS,
+        "db_calls": db_call_stats,
+    }
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Get response cache hit/miss statistics, data versions, request coalescing and rate limit counters
+    """
+    return {
+        **response_cache.stats(),
+        "data_versions": data_versions.versions,
+        "coalescing": single_flight.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "push": price_push.stats(),
+        "city_catalog": city_catalog.stats(),
+    }
+
 @app.get("/prices/latest")
 async def get_latest_prices(
+    request: Request,
     city: Optional[str] = Query(None, description="City name to filter prices"),
     commodity: Commodity = Query(Commodity.EGG, description="Commodity type (egg, copra, or chicken)")
 ):
     """
     Get latest prices for selected commodity for all cities or a specific city
     """
-    try:
-        if commodity == Commodity.EGG:
-            collection = db.egg_prices
-            if city:
-                query = {'city': city.lower(), 'commodity': 'egg'}
-                prices = list(collection.find(query).sort('date', -1).limit(1))
-                if prices:
-                    for price in prices:
-                        convert_objectid(price)
-                        if 'rates' in price:
-                            price.update(price['rates'])
-                            del price['rates']
-            else:
-                pipeline = [
-                    {'$match': {'commodity': 'egg'}},
-                    {'$sort': {'date': -1}},
-                    {'$group': {
-                        '_id': '$city',
-                        'latest_price': {'$first': '$$ROOT'}
-                    }},
-                    {'$project': {
-                        'latest_price': {
-                            '$mergeObjects': [
-                                '$latest_price',
-                                {'$ifNull': ['$latest_price.rates', {}]}
-                            ]
-                        }
-                    }}
-                ]
-                prices = list(collection.aggregate(pipeline))
-                # Convert ObjectId to string for JSON serialization
-                for price in prices:
-                    convert_objectid(price)
-
-        elif commodity == Commodity.COPRA:
-            collection = db.copra_prices
-            if city:
-                query = {'city': city.lower()}
-                prices = list(collection.find(query).sort('price_date', -1).limit(1))
-                for price in prices:
-                    convert_objectid(price)
-            else:
-                pipeline = [
-                    {'$sort': {'price_date': -1}},
-                    {'$group': {
-                        '_id': '$city',
-                        'latest_price': {'$first': '$$ROOT'}
-                    }}
-                ]
-                prices = list(collection.aggregate(pipeline))
-                for price in prices:
-                    convert_objectid(price)
-
-        else:  # CHICKEN
-            collection = db.chicken_prices
-            if city:
-                if city.lower() in ['bangalore', 'bengaluru']:
-                    query = {'city': {'$in': ['Bangalore', 'Bengaluru']}}
-                else:
-                    query = {'city': city.title()}
-                prices = list(collection.find(query).sort('date_of_scraping', -1).limit(1))
-                for price in prices:
-                    convert_objectid(price)
-            else:
-                pipeline = [
-                    {'$sort': {'date_of_scraping': -1}},
-                    {'$group': {
-                        '_id': '$city',
-                        'latest_price': {'$first': '$$ROOT'}
-                    }}
-                ]
-                prices = list(collection.aggregate(pipeline))
-                for price in prices:
-                    convert_objectid(price)
-
+    async def compute():
+        storage = await get_db()
+        prices = await run_db(storage.get_latest_prices, commodity.value, city)
         if not prices:
             raise HTTPException(status_code=404, detail=f"No {commodity.value} price data found")
+        return format_latest_response(commodity, prices, city)
 
-        # Format response for chicken
-        if commodity == Commodity.CHICKEN:
-            formatted_prices = []
-            for price_doc in prices:
-                if 'latest_price' in price_doc:
-                    doc = price_doc['latest_price']
-                else:
-                    doc = price_doc
-
-                chicken_data = {
-                    "boneless": doc.get('boneless'),
-                    "chicken": doc.get('chicken'),
-                    "chicken_liver": doc.get('chicken_liver'),
-                    "country": doc.get('country'),
-                    "live": doc.get('live'),
-                    "skinless": doc.get('skinless'),
-                    "date_of_price": doc.get('date_of_price'),
-                    "date_of_scraping": doc.get('date_of_scraping')
-                }
-                formatted_prices.append({"chicken_rates": chicken_data})
-            return formatted_prices
-
-        # For EGG and COPRA, return original format
-        return prices
+    await check_cities(commodity, [city] if city else None)
+    try:
+        return await cached_response(request, 'latest', commodity, (city_key(city) if city else None,), compute)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 from datetime import date as date_type
 
+@app.get("/prices/stream")
+async def stream_latest_prices(
+    commodity: Commodity = Query(Commodity.EGG, description="Commodity type (egg, copra, or chicken)"),
+    city: Optional[str] = Query(None, description="Only this city; all cities by default")
+):
+    """
+    Server-sent events: a snapshot of the latest prices, then one event per city whenever a scrape changes it
+    """
+    await check_cities(commodity, [city] if city else None)
+    subscription = price_push.subscribe(commodity.value, city_key(city) if city else None)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many price streams on this worker")
+    return StreamingResponse(
+        price_push.stream(subscription, API_PUSH_HEARTBEAT),
+        media_type="text/event-stream",
+        # Proxies must neither cache nor buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/prices/historical")
 async def get_historical_prices(
+    request: Request,
     city: str = Query(..., description="City name to get prices for"),
     date: date_type = Query(..., description="Date to get prices for (YYYY-MM-DD format)"),
     commodity: Commodity = Query(Commodity.EGG, description="Commodity type (egg, copra, or chicken)")
@@ -232,114 +637,49 @@ async def get_historical_prices(
     """
     Get prices for selected commodity for a specific city and date
     """
+    async def compute():
+        storage = await get_db()
+        price_data = await run_db(read_prices_on_date, storage, commodity.value, city, date)
+        if not price_data:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No {commodity.value} price data found for {city} on {date}"
+            )
+        return format_range_response(commodity, [price_data])[0]
+
+    await check_cities(commodity, [city])
     try:
-        if commodity == Commodity.EGG:
-            collection = db.egg_prices
-            start_datetime = datetime.combine(date, datetime.min.time())
-            end_datetime = datetime.combine(date, datetime.max.time())
-            price_data = collection.find_one({
-                'city': city.lower(),
-                'commodity': 'egg',
-                'date': {
-                    '$gte': start_datetime,
-                    '$lte': end_datetime
-                }
-            })
-            if not price_data:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No egg price data found for {city} on {date}"
-                )
-            convert_objectid(price_data)
-            if 'rates' in price_data:
-                price_data.update(price_data['rates'])
-                del price_data['rates']
-            return price_data
-
-        elif commodity == Commodity.COPRA:
-            collection = db.copra_prices
-            start_datetime = datetime.combine(date, datetime.min.time())
-            end_datetime = datetime.combine(date, datetime.max.time())
-            price_data = collection.find_one({
-                'city': city.lower(),
-                'price_date': {
-                    '$gte': start_datetime,
-                    '$lte': end_datetime
-                }
-            })
-            if not price_data:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No copra price data found for {city} on {date}"
-                )
-            convert_objectid(price_data)
-            return price_data
-
-        else:  # CHICKEN
-            collection = db.chicken_prices
-            date_str = date.strftime('%Y-%m-%d')
-            if city.lower() in ['bangalore', 'bengaluru']:
-                price_data = collection.find_one({
-                    'city': {'$in': ['Bangalore', 'Bengaluru']},
-                    'date_of_price': date_str
-                })
-            else:
-                price_data = collection.find_one({
-                    'city': city.title(),
-                    'date_of_price': date_str
-                })
-            if not price_data:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No chicken price data found for {city} on {date_str}"
-                )
-
-            convert_objectid(price_data)
-            formatted_price = {
-                'city': price_data['city'],
-                'timestamp': price_data['date_of_scraping'],
-                'chicken_rates': {
-                    'boneless': price_data.get('boneless'),
-                    'chicken': price_data.get('chicken'),
-                    'chicken_liver': price_data.get('chicken_liver'),
-                    'country': price_data.get('country'),
-                    'live': price_data.get('live'),
-                    'skinless': price_data.get('skinless'),
-                    'date_of_price': price_data.get('date_of_price'),
-                    'date_of_scraping': price_data['date_of_scraping']
-                }
-            }
-            return formatted_price
+        return await cached_response(request, 'historical', commodity, (city_key(city), date), compute)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/cities")
-async def get_available_cities(commodity: Commodity = Query(Commodity.EGG, description="Commodity type (egg or copra)")):
+async def get_available_cities(
+    request: Request,
+    commodity: Commodity = Query(Commodity.EGG, description="Commodity type (egg, copra, or chicken)")
+):
     """
-    Get a list of available cities based on the commodity type
+    Get the cities with price data for a commodity
     """
+    async def compute():
+        cities = await known_cities(commodity)
+        if cities is None:
+            storage = await get_db()
+            cities = await run_db(storage.get_city_keys, commodity.value)
+        return {"cities": sorted(cities)}
+
     try:
-        if commodity == Commodity.EGG:
-            cities = ['bengaluru', 'mumbai', 'chennai', 'kolkata', 'delhi', 'hyderabad']
-        elif commodity == Commodity.COPRA:
-            cities = ['bangalore', 'chennai', 'mumbai', 'delhi', 'hyderabad', 'kolkata', 'pune', 'thiruvananthapuram', 
-                     'surat', 'kochi', 'coimbatore', 'mangaluru', 'visakhapatnam', 'madurai', 'kozhikode', 'ahmedabad', 
-                     'gandhidham', 'bhadohi', 'indore', 'pollachi', 'tiptur', 'secunderabad', 'mandya', 'namakkal', 
-                     'erode', 'mysore', 'thane', 'cuttack', 'karikkad', 'doiwala', 'jaipur', 'agra', 'gurugram', 
-                     'loni', 'kanpur', 'tumakuru', 'hosur', 'vasai-virar', 'panvel', 'nashik', 'karjat', 'vellakovil', 
-                     'udumalpet', 'hassan', 'salem', 'hubli', 'gobichettipalayam', 'nagpur', 'raipur', 'patna', 
-                     'amritsar', 'noida', 'rajkot', 'varanasi', 'lucknow', 'bhopal', 'theni-allinagaram', 
-                     'navi-mumbai', 'new-delhi']
-        else:
-            cities = ['mumbai', 'chennai', 'bangalore', 'hyderabad', 'delhi', 'kolkata', 'ahmedabad', 'madurai',
-                     'visakhapatnam', 'lucknow', 'vijayawada', 'surat', 'patna', 'kochi', 'jaipur', 'mysore',
-                     'trivandrum', 'vadodara', 'nagpur', 'coimbatore', 'pune', 'bhubaneswar', 'nashik']
-        return {"cities": cities}
+        return await cached_response(request, 'cities', commodity, (), compute)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/prices/range")
 async def get_prices_by_date_range(
+    request: Request,
     city: str = Query(..., description="City name to get prices for"),
     start_date: date_type = Query(..., description="Start date (YYYY-MM-DD format)"),
     end_date: date_type = Query(..., description="End date (YYYY-MM-DD format)"),
@@ -348,107 +688,320 @@ async def get_prices_by_date_range(
     """
     Get prices for selected commodity for a specific city within a date range
     """
+    async def compute():
+        # Reads through to the archive when the range starts before the retention horizon
+        storage = await get_db()
+        prices = await run_db(read_prices_by_date_range, storage, commodity.value, city, start_date, end_date)
+        if not prices:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No {commodity.value} price data found for {city} between {start_date} and {end_date}"
+            )
+        return format_range_response(commodity, prices)
+
+    await check_cities(commodity, [city])
     try:
-        if commodity == Commodity.EGG:
-            collection = db.egg_prices
-            start_datetime = datetime.combine(start_date, datetime.min.time())
-            end_datetime = datetime.combine(end_date, datetime.max.time())
-            prices = list(collection.find({
-                'city': city.lower(),
-                'commodity': 'egg',
-                'date': {
-                    '$gte': start_datetime,
-                    '$lte': end_datetime
-                }
-            }).sort('date', 1))
-            
-            if not prices:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No egg price data found for {city} between {start_date} and {end_date}"
-                )
-            
-            for price in prices:
-                convert_objectid(price)
-                if 'rates' in price:
-                    price.update(price['rates'])
-                    del price['rates']
-            return prices
-
-        elif commodity == Commodity.COPRA:
-            collection = db.copra_prices
-            start_datetime = datetime.combine(start_date, datetime.min.time())
-            end_datetime = datetime.combine(end_date, datetime.max.time())
-            prices = list(collection.find({
-                'city': city.lower(),
-                'price_date': {
-                    '$gte': start_datetime,
-                    '$lte': end_datetime
-                }
-            }).sort('price_date', 1))
-            
-            if not prices:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No copra price data found for {city} between {start_date} and {end_date}"
-                )
-            for price in prices:
-                convert_objectid(price)
-            return prices
-
-        else:  # CHICKEN
-            collection = db.chicken_prices
-            start_str = start_date.strftime('%Y-%m-%d')
-            end_str = end_date.strftime('%Y-%m-%d')
-            
-            if city.lower() in ['bangalore', 'bengaluru']:
-                query = {'city': {'$in': ['Bangalore', 'Bengaluru']}}
-            else:
-                query = {'city': city.title()}
-            
-            query['date_of_price'] = {
-                '$gte': start_str,
-                '$lte': end_str
-            }
-            
-            prices = list(collection.find(query).sort('date_of_scraping', 1))
-            
-            if not prices:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No chicken price data found for {city} between {start_str} and {end_str}"
-                )
-            
-            formatted_prices = []
-            for price in prices:
-                convert_objectid(price)
-                formatted_price = {
-                    'city': price['city'],
-                    'timestamp': price['date_of_scraping'],
-                    'chicken_rates': {
-                        'boneless': price.get('boneless'),
-                        'chicken': price.get('chicken'),
-                        'chicken_liver': price.get('chicken_liver'),
-                        'country': price.get('country'),
-                        'live': price.get('live'),
-                        'skinless': price.get('skinless'),
-                        'date_of_price': price.get('date_of_price'),
-                        'date_of_scraping': price['date_of_scraping']
-                    }
-                }
-                formatted_prices.append(formatted_price)
-            return formatted_prices
+        return await cached_response(request, 'range', commodity, (city_key(city), start_date, end_date), compute)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in get_prices_by_date_range: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error while fetching price range data")
 
-@app.on_event("shutdown")
-def shutdown_event():
+@app.get("/prices/range/page")
+async def get_prices_page(
+    request: Request,
+    city: str = Query(..., description="City name to get prices for"),
+    start_date: date_type = Query(..., description="Start date (YYYY-MM-DD format)"),
+    end_date: date_type = Query(..., description="End date (YYYY-MM-DD format)"),
+    commodity: Commodity = Query(Commodity.EGG, description="Commodity type (egg, copra, or chicken)"),
+    limit: int = Query(100, ge=1, le=1000, description="Documents per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+):
+    """
+    Get one page of /prices/range; follow next_cursor until it is null
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def compute():
+        storage = await get_db()
+        prices, position = await run_db(
+            read_prices_page, storage, commodity.value, city, start_date, end_date, after, limit
+        )
+        if not prices and after is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No {commodity.value} price data found for {city} between {start_date} and {end_date}"
+            )
+        return {"items": format_range_response(commodity, prices), "next_cursor": encode_cursor(position)}
+
+    await check_cities(commodity, [city])
+    try:
+        return await cached_response(
+            request, 'range_page', commodity, (city_key(city), start_date, end_date, limit, cursor), compute
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_prices_page: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error while fetching price range data")
+
+async def ndjson_batches(storage, commodity, city, start_date, end_date, prices, position):
+    """Yield NDJSON chunks of a range, reading the next keyset batch only after sending the last one"""
+    while True:
+        yield b"".join(encode_response(price) + b"\n" for price in format_range_response(commodity, prices))
+        if position is None:
+            return
+        try:
+            prices, position = await run_db(
+                read_prices_page, storage, commodity.value, city, start_date, end_date, position, API_STREAM_BATCH_SIZE
+            )
+        except Exception as e:
+            # The status line is already sent; end the stream early
+            logger.error(f"Error streaming {commodity.value} prices for {city}: {str(e)}")
+            return
+
+@app.get("/prices/range/stream")
+async def stream_prices_by_date_range(
+    city: str = Query(..., description="City name to get prices for"),
+    start_date: date_type = Query(..., description="Start date (YYYY-MM-DD format)"),
+    end_date: date_type = Query(..., description="End date (YYYY-MM-DD format)"),
+    commodity: Commodity = Query(Commodity.EGG, description="Commodity type (egg, copra, or chicken)")
+):
+    """
+    Stream /prices/range as newline-delimited JSON, one document per line
+    """
+    await check_cities(commodity, [city])
+    storage = await get_db()
+    try:
+        prices, position = await run_db(
+            read_prices_page, storage, commodity.value, city, start_date, end_date, None, API_STREAM_BATCH_SIZE
+        )
+    except Exception as e:
+        logger.error(f"Error in stream_prices_by_date_range: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error while fetching price range data")
+    if not prices:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No {commodity.value} price data found for {city} between {start_date} and {end_date}"
+        )
+    return StreamingResponse(
+        ndjson_batches(storage, commodity, city, start_date, end_date, prices, position),
+        media_type="application/x-ndjson",
+    )
+
+class BatchPriceQuery(BaseModel):
+    commodities: List[Commodity]
+    cities: Optional[List[str]] = None
+    start_date: date_type
+    end_date: date_type
+    varieties: Optional[List[str]] = None
+
+@app.post("/prices/batch")
+async def get_prices_batch(query: BatchPriceQuery):
+    """
+    Get several commodities and cities over one date range in a single columnar response
+
+    One query per commodity (run concurrently); omit cities for every city
+    with prices. Values are aligned with the shared dates array, null where a
+    series has no price for a date.
+    """
+    if query.end_date < query.start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if query.cities is not None and len(query.cities) > API_BATCH_MAX_CITIES:
+        raise HTTPException(status_code=400, detail=f"At most {API_BATCH_MAX_CITIES} cities per request")
+
+    commodities = list(dict.fromkeys(query.commodities))
+    if query.cities:
+        # A city only has to be known for one of the requested commodities
+        known = set()
+        for commodity in commodities:
+            cities = await known_cities(commodity)
+            if cities is None:
+                known = None
+                break
+            known |= cities
+        unknown = [city for city in query.cities if city_key(city) not in known] if known is not None else []
+        if unknown:
+            city_catalog.rejected()
+            raise HTTPException(status_code=404, detail=f"No price data found for {', '.join(unknown)} (see /cities)")
+    storage = await get_db()
+    try:
+        results = await asyncio.gather(*(
+            run_db(read_records_for_cities, storage, commodity.value, query.cities, query.start_date, query.end_date)
+            for commodity in commodities
+        ))
+    except Exception as e:
+        logger.error(f"Error in get_prices_batch: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error while fetching batch price data")
+
+    columns = columnar_prices(
+        {commodity.value: records for commodity, records in zip(commodities, results)}, query.varieties
+    )
+    return json_response({"start_date": query.start_date, "end_date": query.end_date, **columns})
+
+@app.get("/prices/stats")
+async def get_price_stats(
+    request: Request,
+    start_date: date_type = Query(..., description="Start date (YYYY-MM-DD format)"),
+    end_date: date_type = Query(..., description="End date (YYYY-MM-DD format)"),
+    commodity: Commodity = Query(Commodity.EGG, description="Commodity type (egg, copra, or chicken)"),
+    cities: Optional[List[str]] = Query(None, alias="city", description="Cities (repeatable); all by default"),
+    window: int = Query(DEFAULT_WINDOW, ge=2, le=365, description="Rolling window in days"),
+    variety: Optional[List[str]] = Query(None, description="Only these varieties (repeatable)")
+):
+    """
+    Get rolling mean/min/max, volatility, percent change and range summaries per city and variety
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if cities is not None and len(cities) > API_BATCH_MAX_CITIES:
+        raise HTTPException(status_code=400, detail=f"At most {API_BATCH_MAX_CITIES} cities per request")
+
+    async def compute():
+        storage = await get_db()
+        records = await run_db(
+            read_records_for_cities, storage, commodity.value, cities, lookback_start(start_date, window), end_date
+        )
+        # The pandas pass is CPU work; keep it off the event loop like the read
+        stats = await run_db(compute_price_stats, records, start_date, end_date, window, variety)
+        if not stats:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No {commodity.value} price data found between {start_date} and {end_date}"
+            )
+        return {
+            "commodity": commodity.value,
+            "start_date": start_date,
+            "end_date": end_date,
+            "window": window,
+            "cities": stats,
+        }
+
+    await check_cities(commodity, cities)
+    key_cities = tuple(sorted({city_key(city) for city in cities})) if cities is not None else None
+    key_varieties = tuple(sorted(set(variety))) if variety else None
+    try:
+        return await cached_response(
+            request, 'stats', commodity, (key_cities, start_date, end_date, window, key_varieties), compute
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_price_stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error while computing price statistics")
+
+@app.get("/export/{commodity}")
+async def export_prices(
+    commodity: Commodity,
+    format: ExportFormat = Query(ExportFormat.CSV, description="csv (gzip), parquet or arrow (IPC stream)"),
+    cities: Optional[List[str]] = Query(None, alias="city", description="Only these cities (repeatable); all by default"),
+    start_date: Optional[date_type] = Query(None, description="First day (YYYY-MM-DD format)"),
+    end_date: Optional[date_type] = Query(None, description="Last day (YYYY-MM-DD format)"),
+    compress: bool = Query(True, description="gzip the CSV output")
+):
+    """
+    Stream a commodity's complete or filtered history for bulk loading
+    """
+    if format != ExportFormat.CSV and not ARROW_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Parquet and Arrow exports need pyarrow on the server")
+
+    await check_cities(commodity, cities)
+    storage = await get_db()
+    # Starlette iterates this in worker threads; each batch is read, encoded and
+    # sent before the next one is fetched from the cursor
+    batches = read_record_batches(storage, commodity.value, cities, start_date, end_date, DEFAULT_BATCH_SIZE)
+    filename = export_filename(commodity.value, format.value, compress)
+    return StreamingResponse(
+        export_chunks(batches, format.value, compress),
+        media_type=media_type(format.value, compress),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/prices/rollups")
+async def get_price_rollups(
+    city: str = Query(..., description="City name to get rollups for"),
+    commodity: Commodity = Query(Commodity.EGG, description="Commodity type (egg, copra, or chicken)"),
+    period: RollupPeriod = Query(RollupPeriod.DAY, description="Bucket size (day, week, or month)"),
+    start_date: Optional[date_type] = Query(None, description="First bucket start date (YYYY-MM-DD format)"),
+    end_date: Optional[date_type] = Query(None, description="Last bucket start date (YYYY-MM-DD format)"),
+    variety: Optional[str] = Query(None, description="Only this variety (e.g. tray, avg_price, boneless)")
+):
     """
-    Close database connection on shutdown
+    Get pre-aggregated min/max/avg/first/last prices per bucket for a city
     """
-    db.close()
+    await check_cities(commodity, [city])
+    try:
+        storage = await get_db()
+        rollups = await run_db(storage.get_rollups, commodity.value, city, period.value, start_date, end_date, variety)
+        if not rollups:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No {period.value} {commodity.value} rollups found for {city}"
+            )
+        return json_response(rollups)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_price_rollups: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error while fetching rollups")
+
+_timeseries_store = None
+
+def get_timeseries_store():
+    """Get the time-series store, creating it on first use"""
+    global _timeseries_store
+    if _timeseries_store is None:
+        _timeseries_store = TimeSeriesPriceStore()
+    return _timeseries_store
+
+@app.get("/prices/timeseries/latest")
+async def get_latest_prices_timeseries(
+    city: Optional[str] = Query(None, description="City name to filter prices"),
+    commodity: Commodity = Query(Commodity.EGG, description="Commodity type (egg, copra, or chicken)")
+):
+    """
+    Same as /prices/latest, served from the time-series collection
+    """
+    try:
+        store = await run_db(get_timeseries_store)
+        prices = await run_db(store.get_latest_prices, commodity.value, city)
+        if not prices:
+            raise HTTPException(status_code=404, detail=f"No {commodity.value} price data found")
+        return json_response(format_latest_response(commodity, prices, city))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/prices/timeseries/range")
+async def get_prices_by_date_range_timeseries(
+    city: str = Query(..., description="City name to get prices for"),
+    start_date: date_type = Query(..., description="Start date (YYYY-MM-DD format)"),
+    end_date: date_type = Query(..., description="End date (YYYY-MM-DD format)"),
+    commodity: Commodity = Query(Commodity.EGG, description="Commodity type (egg, copra, or chicken)")
+):
+    """
+    Same as /prices/range, served from the time-series collection
+    """
+    try:
+        store = await run_db(get_timeseries_store)
+        prices = await run_db(store.get_prices_by_date_range, commodity.value, city, start_date, end_date)
+        if not prices:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No {commodity.value} price data found for {city} between {start_date} and {end_date}"
+            )
+        return json_response(format_range_response(commodity, prices))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_prices_by_date_range_timeseries: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error while fetching price range data")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run("api:app", host="0.0.0.0", port=8000, workers=int(os.getenv('API_WORKERS', '1')))
\ No newline at end of file
@@ -0,0 +1,669 @@
+"""
+API Benchmarks
+==============
+
+Load test for the FastAPI service. Seeds a SQLite price database with
+synthetic history (or uses the configured MongoDB), starts uvicorn once per
+configuration and fires concurrent requests at it.
+
+    load        Throughput and latency with storage calls inline on the event loop
+                (API_DB_THREADS=0) vs. offloaded to the database thread pool
+    serialize   CPU per /prices/range response for long ranges: full documents
+                through the old ObjectId walk + FastAPI encoder vs. projected
+                documents through the field maps + orjson (no server needed)
+    startup     Cold start of one process (import, lifespan startup, peak RSS)
+                and the resident memory of each uvicorn worker after a warm-up
+    suite       Reproducible release benchmark: seeds N years of history ending
+                on a fixed date, drives /prices/latest, /prices/historical and
+                /prices/range at several concurrency levels with the response
+                cache off, and writes RPS, p50/p95/p99 latency and server
+                CPU/RSS per scenario to a JSON artifact
+    compare     Diff two suite artifacts (e.g. the last release and this branch)
+
+Usage:
+    python api_benchmark.py load [--concurrency 32] [--requests 2000] [--days 365]
+    python api_benchmark.py load --backend mongo     # use the existing MongoDB data
+    python api_benchmark.py serialize [--days 3650] [--repeats 20]
+    python api_benchmark.py startup [--workers 4] [--repeats 5]
+    python api_benchmark.py suite [--years 1,5] [--concurrency-levels 1,8,32] [--requests 1000] [--output api_benchmark.json]
+    python api_benchmark.py compare baseline.json api_benchmark.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_CITIES = ['mumbai', 'delhi', 'chennai', 'kolkata', 'hyderabad', 'bengaluru']
+
+
+def seed_sqlite(path: str, days: int = 365, cities: Optional[List[str]] = None,
+                end_date: Optional[date] = None) -> str:
+    """
+    Create a SQLite price database with `days` of synthetic egg, copra and chicken prices
+
+    Args:
+        path: Database file to create (replaced if it exists)
+        days: Days of history per city
+        cities: City keys (default: BENCH_CITIES)
+        end_date: Last day of history (default: today)
+
+    Returns:
+        str: The database path
+    """
+    from price_rollups import PriceRollups
+    from price_storage import SQLitePriceStorage
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    cities = cities or BENCH_CITIES
+    rng = random.Random(42)
+    storage = SQLitePriceStorage(path)
+    today = datetime.combine(end_date or datetime.now().date(), datetime.min.time())
+    copra, chicken = [], []
+    for offset in range(days):
+        day = today - timedelta(days=days - 1 - offset)
+        for city in cities:
+            egg = round(5 + rng.random() * 2, 2)
+            storage.store_egg_prices(city, {'single egg': f"₹{egg}", 'tray': f"₹{round(egg * 30, 2)}"}, date=day)
+            base = 100 + rng.random() * 20
+            copra.append({
+                'city': city, 'commodity': 'copra', 'price_date': day, 'timestamp': day,
+                'min_price': round(base - 5, 2), 'avg_price': round(base, 2), 'max_price': round(base + 5, 2),
+            })
+            chicken.append({
+                'city': city.title(), 'date_of_price': day.strftime('%Y-%m-%d'), 'date_of_scraping': day,
+                'boneless': round(250 + rng.random() * 30, 2), 'chicken': round(160 + rng.random() * 20, 2),
+                'live': round(110 + rng.random() * 10, 2), 'skinless': round(190 + rng.random() * 20, 2),
+            })
+    storage.store_copra_prices(copra)
+    storage.store_chicken_prices(chicken)
+    rollups = PriceRollups(storage)
+    for commodity in ('egg', 'copra', 'chicken'):
+        rollups.rebuild(commodity)
+    storage.close()
+    return path
+
+
+def request_mix(days: int) -> List[str]:
+    """The request paths a load test cycles through"""
+    end = datetime.now().date()
+    start = end - timedelta(days=min(days, 90) - 1)
+    paths = []
+    for commodity in ('egg', 'copra', 'chicken'):
+        paths.append('/prices/latest?' + urlencode({'commodity': commodity}))
+        for city in BENCH_CITIES[:3]:
+            paths.append('/prices/range?' + urlencode({
+                'commodity': commodity, 'city': city,
+                'start_date': start.isoformat(), 'end_date': end.isoformat(),
+            }))
+            paths.append('/prices/historical?' + urlencode({
+                'commodity': commodity, 'city': city, 'date': end.isoformat(),
+            }))
+    return paths
+
+
+class ApiServer:
+    """uvicorn running api:app in a subprocess with extra environment variables"""
+
+    def __init__(self, env: Dict[str, str], port: int, workers: int = 1):
+        self.env = {**os.environ, **env}
+        self.port = port
+        self.workers = workers
+        self.process = None
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'api:app', '--host', '127.0.0.1', '--port', str(self.port),
+             '--workers', str(self.workers), '--log-level', 'warning'],
+            cwd=REPO_DIR, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"API server exited: {self.process.stderr.read().decode(errors='replace')[-2000:]}")
+            try:
+                urllib.request.urlopen(self.base_url + '/', timeout=1).read()
+                return self
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.2)
+        raise RuntimeError("API server did not start within 60 seconds")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def _fetch(url: str):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=60) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return (time.perf_counter() - started) * 1000, status
+
+
+def run_load(base_url: str, paths: List[str], concurrency: int, total: int) -> Dict:
+    """
+    Send `total` GET requests with `concurrency` clients in flight
+
+    Returns:
+        dict: requests, errors (5xx), elapsed_s, requests_per_s, p50_ms, p95_ms, p99_ms, max_ms
+    """
+    urls = [base_url + paths[i % len(paths)] for i in range(total)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(_fetch, urls))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'requests': total,
+        'errors': sum(1 for _, status in results if status >= 500),
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(total / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        'p99_ms': round(latencies[max(int(len(latencies) * 0.99) - 1, 0)], 2),
+        'max_ms': round(latencies[-1], 2),
+    }
+
+
+def benchmark_load(backend: str, concurrency: int, total: int, days: int, port: int) -> Dict[str, Dict]:
+    """Compare inline storage calls with the database thread pool"""
+    env = {'PRICE_STORAGE_BACKEND': backend}
+    if backend == 'sqlite':
+        path = os.path.join(tempfile.gettempdir(), 'api_benchmark_prices.db')
+        print(f"Seeding {days} days of prices into {path}...")
+        env['SQLITE_DB_PATH'] = seed_sqlite(path, days)
+
+    paths = request_mix(days)
+    results = {}
+    for label, threads in (('inline (API_DB_THREADS=0)', '0'), ('thread pool (API_DB_THREADS=32)', '32')):
+        with ApiServer({**env, 'API_DB_THREADS': threads}, port) as server:
+            run_load(server.base_url, paths, concurrency, min(total, 100))  # warm-up
+            results[label] = run_load(server.base_url, paths, concurrency, total)
+    return results
+
+
+def stored_documents(commodity: str, days: int) -> List[Dict]:
+    """
+    One city's documents as MongoDB returns them without a projection
+
+    Egg documents use the pre-compaction shape (four rates plus the query_text
+    copy of the scraped data) that most of the stored history still has.
+    """
+    from bson import ObjectId
+
+    rng = random.Random(7)
+    start = datetime(2015, 1, 1)
+    documents = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        if commodity == 'egg':
+            egg = round(5 + rng.random() * 2, 2)
+            scraped = {'single egg': f"₹{egg}", 'tray': f"₹{round(egg * 30, 2)}",
+                       '100 eggs': f"₹{round(egg * 100, 2)}", 'box': f"₹{round(egg * 210, 2)}",
+                       'source': 'https://example.com/egg-rate/mumbai', 'notes': 'Wholesale NECC rate ' * 8}
+            documents.append({
+                '_id': ObjectId(), 'city': 'mumbai', 'commodity': 'egg', 'date': day, 'timestamp': day,
+                'rates': {
+                    name: {'price': round(egg * quantity, 2), 'quantity': quantity}
+                    for name, quantity in (('single_egg', 1), ('tray', 30), ('hundred_eggs', 100), ('box', 210))
+                },
+                'query_text': str(scraped),
+            })
+        elif commodity == 'copra':
+            base = round(100 + rng.random() * 20, 2)
+            documents.append({
+                '_id': ObjectId(), 'city': 'mumbai', 'commodity': 'copra', 'price_date': day, 'timestamp': day,
+                'min_price': base - 5, 'avg_price': base, 'max_price': base + 5,
+            })
+        else:
+            documents.append({
+                '_id': ObjectId(), 'city': 'Mumbai', 'date_of_price': day.strftime('%Y-%m-%d'), 'price_date': day,
+                'date_of_scraping': day, 'boneless': round(250 + rng.random() * 30, 2),
+                'chicken': round(160 + rng.random() * 20, 2), 'chicken_liver': None, 'country': None,
+                'live': round(110 + rng.random() * 10, 2), 'skinless': round(190 + rng.random() * 20, 2),
+            })
+    return documents
+
+
+def _convert_objectid(doc):
+    from bson import ObjectId
+
+    for key, value in doc.items():
+        if isinstance(value, ObjectId):
+            doc[key] = str(value)
+        elif isinstance(value, dict):
+            _convert_objectid(value)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    _convert_objectid(item)
+    return doc
+
+
+def legacy_serialize(commodity: str, documents: List[Dict]) -> bytes:
+    """/prices/range response encoding before the serialization layer (mutates documents)"""
+    from fastapi.encoders import jsonable_encoder
+
+    if commodity == 'egg':
+        content = []
+        for price in documents:
+            _convert_objectid(price)
+            price.update(price.pop('rates'))
+            content.append(price)
+    elif commodity == 'chicken':
+        content = []
+        for price in documents:
+            _convert_objectid(price)
+            content.append({
+                'city': price['city'],
+                'timestamp': price['date_of_scraping'],
+                'chicken_rates': {
+                    field: price.get(field)
+                    for field in ('boneless', 'chicken', 'chicken_liver', 'country', 'live', 'skinless',
+                                  'date_of_price', 'date_of_scraping')
+                },
+            })
+    else:
+        content = [_convert_objectid(price) for price in documents]
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _cpu_ms(func, inputs: List) -> float:
+    """Median CPU time of func over the prepared inputs, in milliseconds"""
+    timings = []
+    for value in inputs:
+        started = time.process_time()
+        func(value)
+        timings.append((time.process_time() - started) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark_serialize(days: int, repeats: int) -> Dict[str, Dict]:
+    """Compare the old and new /prices/range serialization for one city over `days` days"""
+    import bson
+
+    import api
+    from price_storage import READ_PROJECTIONS
+
+    results = {}
+    for commodity in ('egg', 'copra', 'chicken'):
+        full = stored_documents(commodity, days)
+        projection = READ_PROJECTIONS[commodity]
+        excluded = {field for field, keep in projection.items() if not keep}
+        included = {field for field, keep in projection.items() if keep}
+        projected = [
+            {key: value for key, value in doc.items()
+             if key not in excluded and (not included or key in included)}
+            for doc in full
+        ]
+        # The old path mutates its documents, so every run gets a fresh copy
+        legacy_ms = _cpu_ms(lambda docs: legacy_serialize(commodity, docs),
+                            [copy.deepcopy(full) for _ in range(repeats)])
+        fast_ms = _cpu_ms(lambda docs: api.encode_response(api.format_range_response(api.Commodity(commodity), docs)),
+                          [projected] * repeats)
+        results[commodity] = {
+            'documents': days,
+            'fetched_kb_before': round(sum(len(bson.encode(doc)) for doc in full) / 1024, 1),
+            'fetched_kb_after': round(sum(len(bson.encode(doc)) for doc in projected) / 1024, 1),
+            'response_kb': round(len(api.encode_response(
+                api.format_range_response(api.Commodity(commodity), projected))) / 1024, 1),
+            'cpu_ms_before': round(legacy_ms, 2),
+            'cpu_ms_after': round(fast_ms, 2),
+            'speedup': round(legacy_ms / fast_ms, 1) if fast_ms else None,
+        }
+    return results
+
+
+def print_serialize_results(results: Dict[str, Dict]):
+    print(f"\n{'commodity':<10} {'docs':>6} {'fetched KB':>16} {'response KB':>12} {'CPU ms':>18} {'speedup':>8}")
+    for commodity, result in results.items():
+        fetched = f"{result['fetched_kb_before']} -> {result['fetched_kb_after']}"
+        cpu = f"{result['cpu_ms_before']} -> {result['cpu_ms_after']}"
+        print(f"{commodity:<10} {result['documents']:>6} {fetched:>16} {result['response_kb']:>12} "
+              f"{cpu:>18} {str(result['speedup']) + 'x':>8}")
+
+
+# Run in a fresh interpreter: time the import and the lifespan startup of api:app
+STARTUP_PROBE = """
+import asyncio, json, resource, time
+started = time.perf_counter()
+import api
+imported = time.perf_counter()
+
+async def start():
+    async with api.app.router.lifespan_context(api.app):
+        return time.perf_counter()
+
+ready = asyncio.run(start())
+print(json.dumps({
+    'import_s': imported - started,
+    'startup_s': ready - imported,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def measure_cold_start(env: Dict[str, str]) -> Dict:
+    """Import and lifespan startup time of api:app in a new process"""
+    output = subprocess.run(
+        [sys.executable, '-c', STARTUP_PROBE], cwd=REPO_DIR, env={**os.environ, **env},
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process (Linux /proc)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def _worker_pids(pid: int) -> List[int]:
+    """uvicorn worker processes of a server (the server itself when it runs a single worker)"""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except OSError:
+        return [pid]
+    workers = []
+    for child in children:
+        try:
+            with open(f"/proc/{child}/cmdline", 'rb') as f:
+                if b'resource_tracker' in f.read():
+                    continue
+        except OSError:
+            continue
+        workers.append(child)
+    return workers or [pid]
+
+
+def benchmark_startup(backend: str, days: int, workers: int, repeats: int, port: int) -> Dict:
+    """Cold start of one process, and per-worker memory of a multi-worker server"""
+    env = {'PRICE_STORAGE_BACKEND': backend}
+    if backend == 'sqlite':
+        path = os.path.join(tempfile.gettempdir(), 'api_benchmark_prices.db')
+        print(f"Seeding {days} days of prices into {path}...")
+        env['SQLITE_DB_PATH'] = seed_sqlite(path, days)
+
+    runs = [measure_cold_start(env) for _ in range(repeats)]
+    results = {'cold_start': {key: round(statistics.median(run[key] for run in runs), 3) for key in runs[0]}}
+
+    started = time.perf_counter()
+    with ApiServer(env, port, workers) as server:
+        results['server_start_s'] = round(time.perf_counter() - started, 3)
+        # Every worker answers /ready with its pid; spread enough requests to reach all of them
+        run_load(server.base_url, ['/ready'] + request_mix(days), max(workers * 4, 8), 500)
+        results['workers'] = {pid: _rss_mb(pid) for pid in _worker_pids(server.process.pid)}
+    return results
+
+
+def print_startup_results(results: Dict):
+    cold = results['cold_start']
+    print(f"\nCold start (median): import {cold['import_s']} s, lifespan startup {cold['startup_s']} s, "
+          f"peak RSS {round(cold['max_rss_mb'], 1)} MB")
+    print(f"Server with {len(results['workers'])} worker(s) up in {results['server_start_s']} s")
+    for pid, rss in results['workers'].items():
+        print(f"  worker {pid}: {rss} MB resident")
+
+
+# The suite's history always ends on this day, so runs on different days query the same data
+SUITE_END_DATE = date(2024, 12, 31)
+SUITE_SCENARIOS = ('latest', 'historical', 'range_30d', 'range_1y')
+SUITE_PATHS_PER_SCENARIO = 200
+
+
+def suite_paths(scenario: str, days: int, seed: int = 7) -> List[str]:
+    """
+    Request paths for one suite scenario, drawn with a fixed seed
+
+    Args:
+        scenario: 'latest', 'historical', 'range_30d' or 'range_1y'
+        days: Days of seeded history ending on SUITE_END_DATE
+    """
+    rng = random.Random(f"{scenario}-{seed}")
+    first = SUITE_END_DATE - timedelta(days=days - 1)
+    span = {'range_30d': 30, 'range_1y': 365}.get(scenario, 1)
+    span = min(span, days)
+    paths = []
+    for _ in range(SUITE_PATHS_PER_SCENARIO):
+        commodity = rng.choice(('egg', 'copra', 'chicken'))
+        city = rng.choice(BENCH_CITIES)
+        if scenario == 'latest':
+            # All-city and single-city requests, like the dashboards send
+            params = {'commodity': commodity, **({'city': city} if rng.random() < 0.5 else {})}
+            paths.append('/prices/latest?' + urlencode(params))
+            continue
+        start = first + timedelta(days=rng.randrange(days - span + 1))
+        if scenario == 'historical':
+            paths.append('/prices/historical?' + urlencode({'commodity': commodity, 'city': city, 'date': start}))
+        else:
+            end = start + timedelta(days=span - 1)
+            paths.append('/prices/range?' + urlencode({
+                'commodity': commodity, 'city': city, 'start_date': start, 'end_date': end,
+            }))
+    return paths
+
+
+def _cpu_seconds(pids: List[int]) -> float:
+    """User plus system CPU time of processes (Linux /proc)"""
+    ticks = os.sysconf('SC_CLK_TCK')
+    total = 0.0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # Fields after the command name; utime and stime are fields 14 and 15
+                fields = f.read().rsplit(')', 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / ticks
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def suite_database(years: int) -> str:
+    """Seeded SQLite file for `years` of history, reused while its size and end date match"""
+    days = years * 365
+    path = os.path.join(tempfile.gettempdir(), f"api_benchmark_{days}d_{SUITE_END_DATE:%Y%m%d}.db")
+    if not os.path.exists(path):
+        print(f"Seeding {years} year(s) of prices into {path}...")
+        started = time.perf_counter()
+        seed_sqlite(path + '.tmp', days, end_date=SUITE_END_DATE)
+        os.replace(path + '.tmp', path)
+        print(f"Seeded in {time.perf_counter() - started:.1f} s")
+    return path
+
+
+def benchmark_suite(backend: str, years: List[int], levels: List[int], total: int, workers: int,
+                    port: int, cache: bool = False) -> Dict:
+    """
+    Run every scenario at every concurrency level for each history size
+
+    Returns:
+        dict: {'meta': {...}, 'results': {'<years>y': {scenario: {'c<level>': run_load result
+               plus server_cpu_s, server_cpu_pct and server_rss_mb}}}}
+    """
+    meta = {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'backend': backend,
+        'years': years,
+        'end_date': SUITE_END_DATE.isoformat(),
+        'cities': len(BENCH_CITIES),
+        'concurrency_levels': levels,
+        'requests': total,
+        'workers': workers,
+        'response_cache': cache,
+    }
+    results = {}
+    sizes = years if backend == 'sqlite' else [None]
+    for size in sizes:
+        env = {'PRICE_STORAGE_BACKEND': backend, 'API_RATE_LIMIT': '0'}
+        if not cache:
+            env['API_CACHE_TTL'] = '0'
+        if size is not None:
+            env['SQLITE_DB_PATH'] = suite_database(size)
+        days = (size or 1) * 365
+        label = f"{size}y" if size is not None else 'mongo'
+        results[label] = {}
+        with ApiServer(env, port, workers) as server:
+            pids = _worker_pids(server.process.pid)
+            for scenario in SUITE_SCENARIOS:
+                paths = suite_paths(scenario, days)
+                run_load(server.base_url, paths, max(levels), min(total, 100))  # warm-up
+                results[label][scenario] = {}
+                for level in levels:
+                    cpu_before = _cpu_seconds(pids)
+                    result = run_load(server.base_url, paths, level, total)
+                    cpu = _cpu_seconds(pids) - cpu_before
+                    result['server_cpu_s'] = round(cpu, 3)
+                    result['server_cpu_pct'] = round(cpu / result['elapsed_s'] * 100, 1)
+                    result['server_rss_mb'] = round(sum(_rss_mb(pid) or 0 for pid in pids), 1)
+                    results[label][scenario][f"c{level}"] = result
+                    print(f"{label:>6} {scenario:<11} c={level:<4} {result['requests_per_s']:>8} req/s  "
+                          f"p99 {result['p99_ms']} ms  errors {result['errors']}")
+    return {'meta': meta, 'results': results}
+
+
+def print_suite_results(report: Dict):
+    print(f"\n{'size':<6} {'scenario':<11} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'cpu %':>7} {'rss MB':>8} {'errors':>7}")
+    for size, scenarios in report['results'].items():
+        for scenario, levels in scenarios.items():
+            for level, r in levels.items():
+                print(f"{size:<6} {scenario:<11} {level[1:]:>5} {r['requests_per_s']:>8} {r['p50_ms']:>8} "
+                      f"{r['p95_ms']:>8} {r['p99_ms']:>8} {r['server_cpu_pct']:>7} {r['server_rss_mb']:>8} "
+                      f"{r['errors']:>7}")
+
+
+def compare_reports(baseline: Dict, current: Dict) -> List[Dict]:
+    """Changes in throughput and tail latency for every run present in both suite artifacts"""
+    rows = []
+    for size, scenarios in current['results'].items():
+        for scenario, levels in scenarios.items():
+            for level, new in levels.items():
+                old = baseline['results'].get(size, {}).get(scenario, {}).get(level)
+                if old is None:
+                    continue
+                row = {'size': size, 'scenario': scenario, 'level': level}
+                for key in ('requests_per_s', 'p95_ms', 'p99_ms', 'server_rss_mb'):
+                    row[key] = (old[key], new[key],
+                                round((new[key] - old[key]) / old[key] * 100, 1) if old[key] else None)
+                rows.append(row)
+    return rows
+
+
+def print_comparison(rows: List[Dict]):
+    print(f"{'size':<6} {'scenario':<11} {'conc':>5} {'req/s':>24} {'p95 ms':>24} {'p99 ms':>24}")
+    for row in rows:
+        cells = []
+        for key in ('requests_per_s', 'p95_ms', 'p99_ms'):
+            old, new, change = row[key]
+            cells.append(f"{old} -> {new} ({'n/a' if change is None else f'{change:+}%'})")
+        print(f"{row['size']:<6} {row['scenario']:<11} {row['level'][1:]:>5} " + ' '.join(f"{c:>24}" for c in cells))
+
+
+def print_results(results: Dict[str, Dict]):
+    print(f"\n{'configuration':<34} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    for label, result in results.items():
+        print(f"{label:<34} {result['requests_per_s']:>8} {result['p50_ms']:>8} {result['p95_ms']:>8} "
+              f"{result['p99_ms']:>8} {result['max_ms']:>8} {result['errors']:>7}")
+
+
+def main():
+    """Command line entry point for the API benchmarks"""
+    parser = argparse.ArgumentParser(description="API benchmarks")
+    parser.add_argument('command', choices=['load', 'serialize', 'startup', 'suite', 'compare'])
+    parser.add_argument('reports', nargs='*', help="Baseline and current suite artifacts (compare)")
+    parser.add_argument('--backend', choices=['sqlite', 'mongo'], default='sqlite')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=None,
+                        help="Requests per run (default: 2000 for load, 1000 per scenario and level for suite)")
+    parser.add_argument('--years', default='1', help="History sizes in years, comma separated (suite)")
+    parser.add_argument('--concurrency-levels', default='1,8,32', help="Concurrent clients, comma separated (suite)")
+    parser.add_argument('--cache', action='store_true', help="Keep the response cache on (suite)")
+    parser.add_argument('--output', default='api_benchmark.json', help="Suite artifact (suite)")
+    parser.add_argument('--days', type=int, default=None,
+                        help="Days of history (default: 365 for load, 3650 for serialize)")
+    parser.add_argument('--repeats', type=int, default=None,
+                        help="Repetitions (default: 20 for serialize, 5 for startup)")
+    parser.add_argument('--workers', type=int, default=None, help="uvicorn workers (default: 4 for startup, 1 for suite)")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.command == 'serialize':
+        print_serialize_results(benchmark_serialize(args.days or 3650, args.repeats or 20))
+        return
+    if args.command == 'startup':
+        print_startup_results(benchmark_startup(args.backend, args.days or 365, args.workers or 4,
+                                                args.repeats or 5, args.port))
+        return
+    if args.command == 'suite':
+        report = benchmark_suite(
+            args.backend, [int(y) for y in args.years.split(',')],
+            [int(c) for c in args.concurrency_levels.split(',')], args.requests or 1000, args.workers or 1,
+            args.port, args.cache,
+        )
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print_suite_results(report)
+        print(f"\nWrote {args.output}")
+        return
+    if args.command == 'compare':
+        if len(args.reports) != 2:
+            parser.error("compare needs two suite artifacts: baseline and current")
+        with open(args.reports[0]) as f:
+            baseline = json.load(f)
+        with open(args.reports[1]) as f:
+            current = json.load(f)
+        print_comparison(compare_reports(baseline, current))
+        return
+    results = benchmark_load(args.backend, args.concurrency, args.requests or 2000, args.days or 365, args.port)
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
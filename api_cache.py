@@ -0,0 +1,366 @@
+"""
+API Response Cache
+==================
+
+In-process cache for API read endpoints. Entries expire after a TTL and the
+least recently used entry is evicted once the cache is full.
+
+Cached entries hold the encoded JSON body and its ETag (a hash of the body),
+so cache hits skip serialization and conditional requests (If-None-Match /
+If-Modified-Since) can be answered with 304 Not Modified without touching
+the database. Last-Modified is the time of the commodity's last write.
+
+Invalidation is driven by data versions: every storage write bumps its
+commodity's version (see PriceStorage.bump_data_version), and the version is
+part of each cache key, so a new scrape makes older entries unreachable
+immediately instead of waiting for the TTL. The versions themselves are
+re-read from storage at most every poll interval, which bounds how long an
+API process can serve data older than the last write.
+
+Two guards keep bursts away from the database:
+
+    SingleFlight   concurrent misses for the same key share one computation,
+                   so a scrape landing under many polling dashboards costs
+                   one query per endpoint instead of one per client
+    RateLimiter    per-client token buckets; clients over their rate get 429
+
+Configuration:
+    API_CACHE_TTL             Seconds a response stays cached (default: 300, 0 disables caching)
+    API_CACHE_MAX_ENTRIES     Most cached responses (default: 1024)
+    API_CACHE_VERSION_POLL    Seconds between data version reads (default: 2)
+    API_CITY_CATALOG_TTL      Seconds before known cities are re-read without a new version (default: 300)
+    API_RATE_LIMIT            Requests per second per client (default: 0, no limit)
+    API_RATE_BURST            Requests a client may burst above the rate (default: 2 x API_RATE_LIMIT)
+    API_RATE_LIMIT_HEADER     Header identifying clients, e.g. X-Forwarded-For behind a proxy
+                              (default: the connection's address)
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+
+MISSING = object()
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries (int): Most entries kept; the least recently used is evicted beyond that
+            ttl (float): Seconds an entry stays valid (0 disables the cache)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+        self._endpoints = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _count(self, endpoint: Optional[str], outcome: str):
+        self._stats[outcome] += 1
+        if endpoint is not None:
+            counts = self._endpoints.setdefault(endpoint, {'hits': 0, 'misses': 0})
+            counts[outcome] += 1
+
+    def get(self, key: Hashable, endpoint: Optional[str] = None):
+        """
+        Look up a cached value
+
+        Args:
+            key: Cache key
+            endpoint (str, optional): Endpoint name the hit or miss is counted under
+
+        Returns:
+            The cached value, or MISSING
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._count(endpoint, 'hits')
+                    return value
+                del self._entries[key]
+                self._stats['expired'] += 1
+            self._count(endpoint, 'misses')
+            return MISSING
+
+    def set(self, key: Hashable, value):
+        """Store a value, evicting least recently used entries beyond max_entries"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        """Drop every entry (statistics are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counts and ratio, overall and per endpoint"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+            stats['entries'] = len(self._entries)
+            stats['max_entries'] = self.max_entries
+            stats['ttl'] = self.ttl
+            stats['endpoints'] = {
+                endpoint: {
+                    **counts,
+                    'hit_ratio': round(counts['hits'] / (counts['hits'] + counts['misses']), 4),
+                }
+                for endpoint, counts in self._endpoints.items()
+            }
+            return stats
+
+
+class DataVersions:
+    """Per-commodity data versions, re-read from storage at most every poll interval"""
+
+    def __init__(self, loader: Callable[[], Dict[str, Dict]], poll_interval: float = 2):
+        """
+        Initialize the tracker
+
+        Args:
+            loader (callable): Returns {commodity: {'version', 'updated_at'}} (e.g. storage.get_data_versions)
+            poll_interval (float): Seconds a loaded set of versions is trusted
+        """
+        self.loader = loader
+        self.poll_interval = poll_interval
+        self.versions = {}
+        self.loaded_at = None
+        self._lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= self.poll_interval
+
+    def refresh(self):
+        """Re-read the versions (blocking); on failure they are unknown until the next refresh"""
+        with self._lock:
+            if not self.is_stale():
+                return
+            try:
+                self.versions = self.loader()
+                self.loaded_at = time.monotonic()
+            except Exception as e:
+                print(f"⚠️ Could not read data versions: {e}")
+                self.versions = {}
+                self.loaded_at = None
+
+    def get(self, commodity: str) -> Optional[int]:
+        """
+        Last loaded version of a commodity (0 if it was never written)
+
+        Returns None when the versions could not be read; callers must not use
+        the cache then.
+        """
+        if self.loaded_at is None:
+            return None
+        return self.versions.get(commodity, {}).get('version', 0)
+
+    def last_modified(self, commodity: str) -> Optional[datetime]:
+        """Time (UTC) of the commodity's last write, if known"""
+        return self.versions.get(commodity, {}).get('updated_at')
+
+
+class CityCatalog:
+    """
+    Known city keys per commodity, held in memory at the data version they were read at
+
+    Requests for a city missing from the catalog can be rejected without a
+    query; a write (new version) makes the next lookup reload the catalog, so
+    a newly scraped city is accepted within one version poll. Entries also
+    expire after `ttl` seconds, for writers that bypass PriceStorage and
+    never bump the version.
+    """
+
+    def __init__(self, ttl: float = 300):
+        """
+        Initialize an empty catalog
+
+        Args:
+            ttl (float): Seconds before a commodity's cities are re-read even at the same version
+        """
+        self.ttl = ttl
+        self._cities: Dict[str, Tuple[int, float, frozenset]] = {}
+        self._stats = {'loads': 0, 'rejected': 0}
+
+    def get(self, commodity: str, version: int) -> Optional[frozenset]:
+        """City keys of a commodity, or None if they were not read at this version or have expired"""
+        entry = self._cities.get(commodity)
+        if entry is None or entry[0] != version or time.monotonic() - entry[1] >= self.ttl:
+            return None
+        return entry[2]
+
+    def set(self, commodity: str, version: int, cities) -> frozenset:
+        """Store the city keys read at a version"""
+        self._stats['loads'] += 1
+        cities = frozenset(cities)
+        self._cities[commodity] = (version, time.monotonic(), cities)
+        return cities
+
+    def rejected(self):
+        """Count a request answered from the catalog without a query"""
+        self._stats['rejected'] += 1
+
+    def stats(self) -> Dict:
+        """Catalog loads, rejected requests and known cities per commodity"""
+        return {
+            **self._stats,
+            'cities': {commodity: len(cities) for commodity, (_, _, cities) in self._cities.items()},
+        }
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one in-flight computation"""
+
+    def __init__(self):
+        """Initialize with no calls in flight"""
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._stats = {'calls': 0, 'coalesced': 0}
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable]):
+        """
+        Await func() once for all concurrent callers with the same key
+
+        The first caller starts the computation; callers arriving while it
+        runs wait for the same result (or exception). A caller that is
+        cancelled (client gone) does not cancel the computation for the others.
+
+        Args:
+            key: Identity of the computation
+            func (callable): Coroutine function to run
+
+        Returns:
+            The result of func()
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self._stats['calls'] += 1
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self._stats['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def stats(self) -> Dict:
+        """Computations started, callers that joined one in flight, and calls in flight now"""
+        return {**self._stats, 'in_flight': len(self._calls)}
+
+
+class RateLimiter:
+    """Token bucket per client: `rate` requests per second with bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        """
+        Initialize the limiter
+
+        Args:
+            rate (float): Tokens added per second (0 disables the limiter)
+            burst (float): Bucket size, i.e. the most requests a client can send at once
+            max_clients (int): Buckets kept; the least recently seen client is forgotten beyond that
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'allowed': 0, 'limited': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, client: Hashable) -> float:
+        """
+        Take one token from a client's bucket
+
+        Returns:
+            float: 0 if the request may proceed, otherwise seconds until a token is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+                self._stats['allowed'] += 1
+            else:
+                wait = (1 - tokens) / self.rate
+                self._stats['limited'] += 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def stats(self) -> Dict:
+        """Allowed and rejected request counts and the limiter settings"""
+        with self._lock:
+            return {**self._stats, 'clients': len(self._buckets), 'rate': self.rate, 'burst': self.burst}
+
+
+def cache_key(endpoint: str, commodity: str, version: int, *parts) -> Tuple:
+    """Cache key for one endpoint call at one data version"""
+    return (endpoint, commodity, version) + parts
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for an encoded response body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime as an HTTP date (Last-Modified)"""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Whether a conditional GET can be answered with 304 Not Modified
+
+    If-None-Match takes precedence; If-Modified-Since is only evaluated when
+    the request carries no If-None-Match (RFC 7232, section 6).
+    """
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        # Weak comparison: a W/ prefix added by a proxy still matches
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
@@ -0,0 +1,281 @@
+"""
+API Metrics
+===========
+
+In-process metrics for the API in the Prometheus text exposition format,
+served at GET /metrics. No client library is needed: counters, gauges and
+histograms are plain dictionaries behind a lock, cheap enough to leave on in
+production (one bisect and a few additions per observation).
+
+Collected:
+    api_requests_total                 requests by route, method and status
+    api_request_duration_seconds       latency per route and commodity (until the last body byte)
+    api_response_size_bytes            body size per route (streamed bodies included)
+    api_requests_in_flight             requests being handled
+    api_db_query_duration_seconds      storage call time per operation (see api.run_db)
+    api_db_query_errors_total          failed storage calls per operation
+
+Values from other components (response cache, coalescing, rate limiter) are
+read when /metrics is scraped through registered collectors.
+
+Each worker process keeps its own metrics; Prometheus scrapes them per
+worker, or sum them in queries.
+
+Usage:
+    from api_metrics import MetricsMiddleware, registry, timed_db_call
+
+    app.add_middleware(MetricsMiddleware)
+    prices = timed_db_call(storage.get_latest_prices, 'egg', None)
+    body = registry.render()
+
+Configuration:
+    API_METRICS    Set to 0 to disable request metrics (default: 1)
+"""
+
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+from urllib.parse import unquote_plus
+
+from price_records import COMMODITIES
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a named metric with a fixed set of label names"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple([str(labels.get(name, '')) for name in self.labels])
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Gauge(Counter):
+    """Value that goes up and down"""
+
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, plus their sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = {key: (list(state[0]), state[1], state[2]) for key, state in self._values.items()}
+        lines = []
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+# A collector returns (name, kind, documentation, [(labels dict, value), ...]) tuples at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+class MetricsRegistry:
+    """Holds the metrics of one process and renders them for a scrape"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collector: Collector):
+        """Register a function whose values are read on every scrape"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    names = sorted(labels)
+                    lines.append(f"{name}{_format_labels(names, [labels[n] for n in names])} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter('api_requests_total', 'HTTP requests handled', ('route', 'method', 'status'))
+REQUEST_SECONDS = registry.histogram(
+    'api_request_duration_seconds', 'Time from request to the last body byte', ('route', 'commodity')
+)
+RESPONSE_BYTES = registry.histogram(
+    'api_response_size_bytes', 'Response body size', ('route',), buckets=SIZE_BUCKETS
+)
+IN_FLIGHT = registry.gauge('api_requests_in_flight', 'Requests being handled')
+DB_QUERY_SECONDS = registry.histogram(
+    'api_db_query_duration_seconds', 'Storage call time per operation', ('operation',)
+)
+DB_QUERY_ERRORS = registry.counter('api_db_query_errors_total', 'Failed storage calls per operation', ('operation',))
+
+
+def _commodity(scope) -> str:
+    """Commodity of a request (path or query parameter), limited to known values to bound label cardinality"""
+    commodity = (scope.get('path_params') or {}).get('commodity')
+    query = scope.get('query_string') or b''
+    if commodity is None and b'commodity=' in query:
+        # A plain scan; parse_qs would be most of the middleware's cost
+        for part in query.split(b'&'):
+            if part.startswith(b'commodity='):
+                commodity = unquote_plus(part[10:].decode('latin-1'))
+                break
+    if commodity is None:
+        return ''
+    return commodity if commodity in COMMODITIES else 'other'
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status, body size and in-flight requests per route"""
+
+    def __init__(self, app, exclude_paths: Sequence[str] = ('/metrics',)):
+        self.app = app
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        state = {'status': 500, 'bytes': 0}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                state['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                state['bytes'] += len(message.get('body', b''))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            # Route templates, not raw paths, so /export/egg and /export/copra share a series
+            route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+            REQUESTS.inc(route=route, method=scope['method'], status=state['status'])
+            REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, commodity=_commodity(scope))
+            RESPONSE_BYTES.observe(state['bytes'], route=route)
+
+
+def timed_db_call(func: Callable, *args):
+    """Call a blocking storage function, recording its duration (and failure) under its name"""
+    operation = getattr(func, '__name__', 'call')
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    except Exception:
+        DB_QUERY_ERRORS.inc(operation=operation)
+        raise
+    finally:
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started, operation=operation)
@@ -0,0 +1,202 @@
+"""
+API Price Push
+==============
+
+Server-sent events for fresh prices, so dashboards subscribe once instead of
+polling /prices/latest:
+
+    GET /prices/stream?commodity=egg&city=mumbai
+
+Each API worker runs one PriceBroadcaster. It follows the data versions that
+every storage write bumps (see PriceStorage.bump_data_version), which the
+response cache polls anyway. When a commodity with subscribers gets a new
+version, the broadcaster reads that commodity's latest prices once. It
+compares them with what it last sent, encodes each changed city once, and
+puts the same event into every matching subscriber's queue. Storage load
+depends on the number of scrapes, not the number of clients.
+
+A subscriber first receives a snapshot of the current prices, then one
+`price` event per changed city, and a comment line every heartbeat interval so
+proxies keep the connection open. A subscriber too slow to drain its queue is
+disconnected; EventSource clients reconnect and get a fresh snapshot.
+
+Configuration:
+    API_PUSH_POLL             Seconds between data version checks (default: 2)
+    API_PUSH_HEARTBEAT        Seconds between keep-alive comments (default: 15)
+    API_PUSH_QUEUE_SIZE       Events buffered per subscriber (default: 100)
+    API_PUSH_MAX_SUBSCRIBERS  Open streams per worker (default: 1000)
+"""
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from api_cache import SingleFlight
+
+
+def sse_event(data: bytes, event: Optional[str] = None, event_id: Optional[str] = None) -> bytes:
+    """Frame a JSON payload as one server-sent event"""
+    lines = []
+    if event_id is not None:
+        lines.append(b"id: " + event_id.encode())
+    if event is not None:
+        lines.append(b"event: " + event.encode())
+    lines.append(b"data: " + data)
+    return b"\n".join(lines) + b"\n\n"
+
+
+class Subscription:
+    """One client's stream: the commodity and city it follows and its pending events"""
+
+    def __init__(self, commodity: str, city: Optional[str], queue_size: int):
+        self.commodity = commodity
+        self.city = city
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def matches(self, commodity: str, city: str) -> bool:
+        return commodity == self.commodity and (self.city is None or city == self.city)
+
+
+class PriceBroadcaster:
+    """Turns data version changes into per-city price events for all subscribers of a worker"""
+
+    def __init__(self, load_versions: Callable[[], Awaitable[Dict[str, Dict]]],
+                 load_latest: Callable[[str], Awaitable[Dict[str, bytes]]],
+                 poll_interval: float = 2, queue_size: int = 100, max_subscribers: int = 1000):
+        """
+        Initialize the broadcaster (the polling task starts with the first subscriber)
+
+        Args:
+            load_versions (callable): Coroutine returning {commodity: {'version', 'updated_at'}}
+            load_latest (callable): Coroutine returning {city_key: encoded JSON payload} for a commodity
+            poll_interval (float): Seconds between version checks
+            queue_size (int): Events buffered per subscriber before it is disconnected
+            max_subscribers (int): Most open subscriptions
+        """
+        self.load_versions = load_versions
+        self.load_latest = load_latest
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: Set[Subscription] = set()
+        self._versions: Dict[str, int] = {}
+        # Last payload sent per commodity and city, at the version in _versions
+        self._latest: Dict[str, Dict[str, bytes]] = {}
+        self._task = None
+        self._loads = SingleFlight()
+        self._stats = {'events': 0, 'deliveries': 0, 'loads': 0, 'disconnected_slow': 0}
+
+    def subscribe(self, commodity: str, city: Optional[str] = None) -> Optional[Subscription]:
+        """Register a subscriber (None when the worker is at max_subscribers)"""
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscription = Subscription(commodity, city, self.queue_size)
+        self._subscribers.add(subscription)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._poll_loop())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    async def snapshot(self, commodity: str) -> Dict[str, bytes]:
+        """Current payload per city of a commodity, loaded if the broadcaster has none yet"""
+        latest = self._latest.get(commodity)
+        if latest is None:
+            if commodity not in self._versions:
+                # Record the version before reading, so a write in between is published by the next check
+                versions = await self.load_versions()
+                self._versions.setdefault(commodity, versions.get(commodity, {}).get('version', 0))
+            # Subscribers connecting together share one read
+            latest = await self._loads.run(commodity, lambda: self._load(commodity))
+        return latest
+
+    async def _load(self, commodity: str) -> Dict[str, bytes]:
+        self._stats['loads'] += 1
+        latest = await self.load_latest(commodity)
+        self._latest[commodity] = latest
+        return latest
+
+    async def _poll_loop(self):
+        while self._subscribers:
+            try:
+                await self.check()
+            except Exception as e:
+                print(f"⚠️ Price push check failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+        # Versions are no longer followed, so what was sent may be stale for the next subscriber
+        self._versions.clear()
+        self._latest.clear()
+        self._task = None
+
+    async def check(self):
+        """Compare data versions with the last check and publish what changed"""
+        versions = await self.load_versions()
+        followed = {subscription.commodity for subscription in self._subscribers}
+        for commodity, info in versions.items():
+            version = info.get('version', 0)
+            if self._versions.get(commodity) == version:
+                continue
+            self._versions[commodity] = version
+            previous = self._latest.get(commodity)
+            if previous is None:
+                # Nothing sent for it yet; the next snapshot loads it fresh
+                continue
+            if commodity not in followed:
+                del self._latest[commodity]
+                continue
+            latest = await self._load(commodity)
+            for city, payload in latest.items():
+                if previous.get(city) != payload:
+                    self.publish(commodity, city, sse_event(payload, 'price', f"{commodity}:{version}"))
+
+    def publish(self, commodity: str, city: str, frame: bytes):
+        """Queue one encoded event for every subscriber of the commodity and city"""
+        self._stats['events'] += 1
+        for subscription in list(self._subscribers):
+            if not subscription.matches(commodity, city):
+                continue
+            try:
+                subscription.queue.put_nowait(frame)
+                self._stats['deliveries'] += 1
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                self._subscribers.discard(subscription)
+                self._stats['disconnected_slow'] += 1
+
+    async def stream(self, subscription: Subscription, heartbeat: float = 15) -> AsyncIterator[bytes]:
+        """
+        Server-sent events for one subscription: a snapshot, then price events as they are published
+
+        Unsubscribes when the client disconnects (the generator is closed) or falls behind.
+        """
+        try:
+            latest = await self.snapshot(subscription.commodity)
+            cities = [city for city in sorted(latest) if subscription.city in (None, city)]
+            yield sse_event(b"[" + b",".join(latest[city] for city in cities) + b"]", 'snapshot')
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    if subscription.overflowed:
+                        return
+                    yield b": keep-alive\n\n"
+                if subscription.overflowed and subscription.queue.empty():
+                    return
+        finally:
+            self.unsubscribe(subscription)
+
+    async def close(self):
+        """Stop polling and drop every subscriber"""
+        self._subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict:
+        """Subscriber count, events published, deliveries, storage loads and slow disconnects"""
+        return {**self._stats, 'subscribers': len(self._subscribers)}
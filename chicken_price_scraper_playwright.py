@@ -3,8 +3,8 @@ from playwright.async_api import async_playwright
 from datetime import datetime
 import re
 import time
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from price_storage import get_price_storage
+from price_write_queue import PriceWriteQueue
 
 class ChickenPriceScraperPlaywright:
     def __init__(self):
@@ -35,7 +35,11 @@ class ChickenPriceScraperPlaywright:
         # MongoDB configuration
         self.mongo_connection_string = "mongodb://localhost:27017/"  # Default MongoDB connection
         self.database_name = "egg_price_data"
-        self.collection_name = "chicken_prices_pw"
+        self.storage = None
+        # Writes run in a worker thread; unreachable storage spools them to disk
+        self.write_queue = PriceWriteQueue(
+            lambda: get_price_storage(self.mongo_connection_string, self.database_name)
+        )
 
     async def scrape_page(self, page, url, variety_name):
         """Scrape a single chicken variety page"""
@@ -372,65 +376,41 @@ class ChickenPriceScraperPlaywright:
             }
         }
 
-    def connect_to_mongodb(self):
-        """Connect to MongoDB and return the collection"""
-        try:
-            # Create MongoDB client
-            client = MongoClient(self.mongo_connection_string, serverSelectionTimeoutMS=5000)
-
-            # Test the connection
-            client.admin.command('ping')
-
-            # Get database and collection
-            db = client[self.database_name]
-            collection = db[self.collection_name]
-
-            print(f"✅ Connected to MongoDB: {self.database_name}.{self.collection_name}")
-            return collection, client
-
-        except (ConnectionFailure, ServerSelectionTimeoutError) as e:
-            print(f"❌ MongoDB connection failed: {e}")
-            print("💡 Make sure MongoDB is running on localhost:27017")
-            return None, None
-        except Exception as e:
-            print(f"❌ MongoDB error: {e}")
-            return None, None
+    def connect_to_storage(self):
+        """Get the configured price storage (MongoDB or SQLite), creating it on first use"""
+        if self.storage is None:
+            try:
+                self.storage = get_price_storage(self.mongo_connection_string, self.database_name)
+                print(f"✅ Connected to {self.storage.backend} price storage")
+            except Exception as e:
+                print(f"❌ Price storage connection failed: {e}")
+                return None
+        return self.storage
 
-    def check_today_data_exists(self, collection, date_of_price):
-        """Check if data for today already exists in MongoDB"""
+    def check_today_data_exists(self, storage, current_date):
+        """Check if chicken prices for today are already stored"""
         try:
-            # Check if any data exists for today's date
-            # Since Bangalore is saved as both Bangalore and Bengaluru,
-            # we expect more documents, so we check for a reasonable threshold
-            existing_count = collection.count_documents({'date_of_price': date_of_price})
-
-            # We expect at least one city's data to exist
-            # (Bangalore will create 2 documents, others create 1 each)
-            # So if we have data for today, existing_count should be > 0
-            return existing_count > 0
+            return storage.has_prices_for_date('chicken', current_date)
         except Exception as e:
             print(f"❌ Error checking existing data: {e}")
             return False
 
-    def save_to_mongodb(self, all_prices):
-        """Save scraped prices to MongoDB with duplicate prevention"""
-        collection, client = self.connect_to_mongodb()
-
-        if collection is None:
-            print("⚠️ Skipping MongoDB storage due to connection issues")
-            return False
-
+    async def save_to_mongodb(self, all_prices):
+        """Queue scraped prices for the price storage with duplicate prevention"""
+        # Writing through the storage keeps latest prices, rollups and the API's
+        # data versions (response cache, city catalog) current; the blocking
+        # calls run in worker threads so the browser keeps going
         try:
             current_date = datetime.now()
             date_of_price = current_date.strftime('%Y-%m-%d')  # Date when prices are valid
             date_of_scraping = current_date  # Full datetime when scraped
 
             # Check if data for today already exists
-            if self.check_today_data_exists(collection, date_of_price):
-                print(f"⚠️ Data for {date_of_price} already exists. Skipping save to prevent duplicates.")
-                return False
-
-            print(f"💾 Saving data to MongoDB...")
+            storage = await asyncio.to_thread(self.connect_to_storage)
+            if storage is not None:
+                if await asyncio.to_thread(self.check_today_data_exists, storage, current_date):
+                    print(f"⚠️ Data for {date_of_price} already exists. Skipping save to prevent duplicates.")
+                    return False
 
             # Prepare documents for each city
             documents = []
@@ -475,9 +455,12 @@ class ChickenPriceScraperPlaywright:
                     print(f"Successfully scraped for {city}")
 
             if documents:
-                # Insert documents
-                result = collection.insert_many(documents)
-                print(f"✅ Successfully saved {len(result.inserted_ids)} records to MongoDB")
+                print(f"💾 Queueing {len(documents)} records for the price storage...")
+                saved = await self.write_queue.submit('store_chicken_prices', documents)
+                if saved is None:
+                    print("📥 Price storage unreachable - records spooled to disk and will be replayed on the next run")
+                else:
+                    print(f"✅ Successfully saved {saved} records to {storage.backend if storage else 'price storage'}")
                 print(f" Date: {date_of_price}")
                 return True
             else:
@@ -487,9 +470,16 @@ class ChickenPriceScraperPlaywright:
         except Exception as e:
             print(f"❌ Error saving to MongoDB: {e}")
             return False
-        finally:
-            if client:
-                client.close()
+
+    async def close_write_queue(self):
+        """Flush queued writes and close the storage handles"""
+        await self.write_queue.close()
+        if self.storage is not None:
+            await asyncio.to_thread(self.storage.close)
+            self.storage = None
+        stats = self.write_queue.stats()
+        print(f"📊 Write queue: {stats['written']} written, {stats['spooled']} spooled, "
+              f"{stats['spool_depth']} waiting in spool")
 
     def get_summary_stats(self, all_prices):
         """Get basic summary statistics"""
@@ -514,7 +504,7 @@ class ChickenPriceScraperPlaywright:
                 final_data = self.get_fallback_data()
 
             # Save to MongoDB
-            mongodb_success = self.save_to_mongodb(final_data)
+            mongodb_success = await self.save_to_mongodb(final_data)
 
             # Summary
             cities_with_data, varieties_found = self.get_summary_stats(final_data)
@@ -529,12 +519,14 @@ class ChickenPriceScraperPlaywright:
             try:
                 fallback_data = self.get_fallback_data()
                 # Save fallback data to MongoDB
-                mongodb_success = self.save_to_mongodb(fallback_data)
+                mongodb_success = await self.save_to_mongodb(fallback_data)
                 cities_with_data, varieties_found = self.get_summary_stats(fallback_data)
                 print(f"� Fallback Summary: {cities_with_data}/{len(self.target_cities)} cities, {varieties_found}/{len(self.chicken_varieties)} varieties")
                 print(f"💾 MongoDB: {'✅ Success' if mongodb_success else '❌ Failed'}")
             except Exception as fallback_error:
                 print(f"❌ Fallback also failed: {str(fallback_error)[:50]}...")
+        finally:
+            await self.close_write_queue()
 
 def main():
     """Main function to run the Playwright chicken price scraper"""
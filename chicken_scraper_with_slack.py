@@ -11,9 +11,9 @@ from playwright.async_api import async_playwright
 from datetime import datetime
 import re
 import time
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 import traceback
+from price_storage import get_price_storage
+from price_write_queue import PriceWriteQueue
 from slack_notifier import SlackNotifier
 
 
@@ -46,10 +46,15 @@ class ChickenPriceScraperWithSlack:
             'Country Chicken', 'Live Chicken', 'Skinless Chicken'
         ]
 
-        # MongoDB configuration
+        # Price storage configuration (MongoDB collection chicken_prices_pw, or SQLite)
         self.mongo_connection_string = "mongodb://localhost:27017/"
         self.database_name = "egg_price_data"
-        self.collection_name = "chicken_prices_pw"
+        self.storage = None
+        # Writes run in a worker thread; unreachable storage spools them to disk.
+        # The queue opens its own handle so it gets a fresh one after a failed write
+        self.write_queue = PriceWriteQueue(
+            lambda: get_price_storage(self.mongo_connection_string, self.database_name)
+        )
         
         # Slack notifier
         self.slack = SlackNotifier()
@@ -322,91 +327,93 @@ class ChickenPriceScraperWithSlack:
             }
         }
 
-    def connect_to_mongodb(self):
-        """Connect to MongoDB and return the collection"""
-        try:
-            client = MongoClient(self.mongo_connection_string, serverSelectionTimeoutMS=5000)
-            client.admin.command('ping')
-            db = client[self.database_name]
-            collection = db[self.collection_name]
-            print(f"✅ Connected to MongoDB: {self.database_name}.{self.collection_name}")
-            return collection, client
-        except (ConnectionFailure, ServerSelectionTimeoutError) as e:
-            print(f"❌ MongoDB connection failed: {e}")
-            return None, None
-        except Exception as e:
-            print(f"❌ MongoDB error: {e}")
-            return None, None
-
-    def check_today_data_exists(self, collection, date_of_price):
-        """Check if data for today already exists in MongoDB"""
-        try:
-            existing_count = collection.count_documents({'date_of_price': date_of_price})
-            return existing_count > 0
-        except Exception as e:
-            print(f"❌ Error checking existing data: {e}")
-            return False
-
-    def save_to_mongodb(self, all_prices):
-        """Save scraped prices to MongoDB with duplicate prevention"""
-        collection, client = self.connect_to_mongodb()
-
-        if collection is None:
-            print("⚠️ Skipping MongoDB storage due to connection issues")
-            return False
+    def connect_to_storage(self):
+        """Get the configured price storage (MongoDB or SQLite), creating it on first use"""
+        if self.storage is None:
+            try:
+                self.storage = get_price_storage(self.mongo_connection_string, self.database_name)
+                print(f"✅ Connected to {self.storage.backend} price storage")
+            except Exception as e:
+                print(f"❌ Price storage connection failed: {e}")
+                return None
+        return self.storage
+
+    def build_documents(self, all_prices, date_of_price, date_of_scraping):
+        """Build one document per city (Bangalore is stored under both spellings)"""
+        documents = []
+        for city, prices in all_prices.items():
+            if prices:
+                base_document = {
+                    'date_of_price': date_of_price,
+                    'boneless': prices.get('Boneless Chicken', None),
+                    'chicken': prices.get('Chicken', None),
+                    'chicken_liver': prices.get('Chicken Liver', None),
+                    'country': prices.get('Country Chicken', None),
+                    'live': prices.get('Live Chicken', None),
+                    'skinless': prices.get('Skinless Chicken', None),
+                    'date_of_scraping': date_of_scraping
+                }
+
+                if city == 'Bangalore':
+                    bangalore_doc = base_document.copy()
+                    bangalore_doc['city'] = 'Bangalore'
+                    documents.append(bangalore_doc)
+
+                    bengaluru_doc = base_document.copy()
+                    bengaluru_doc['city'] = 'Bengaluru'
+                    documents.append(bengaluru_doc)
+                else:
+                    document = base_document.copy()
+                    document['city'] = city
+                    documents.append(document)
+        return documents
 
+    async def save_prices(self, all_prices):
+        """Queue scraped prices for the price storage with duplicate prevention"""
         try:
             current_date = datetime.now()
             date_of_price = current_date.strftime('%Y-%m-%d')
             date_of_scraping = current_date
 
-            if self.check_today_data_exists(collection, date_of_price):
-                print(f"⚠️ Data for {date_of_price} already exists. Skipping save to prevent duplicates.")
-                return False
-
-            print(f"💾 Saving data to MongoDB...")
-            documents = []
-
-            for city, prices in all_prices.items():
-                if prices:
-                    base_document = {
-                        'date_of_price': date_of_price,
-                        'boneless': prices.get('Boneless Chicken', None),
-                        'chicken': prices.get('Chicken', None),
-                        'chicken_liver': prices.get('Chicken Liver', None),
-                        'country': prices.get('Country Chicken', None),
-                        'live': prices.get('Live Chicken', None),
-                        'skinless': prices.get('Skinless Chicken', None),
-                        'date_of_scraping': date_of_scraping
-                    }
-
-                    if city == 'Bangalore':
-                        bangalore_doc = base_document.copy()
-                        bangalore_doc['city'] = 'Bangalore'
-                        documents.append(bangalore_doc)
+            storage = await asyncio.to_thread(self.connect_to_storage)
+            if storage is not None:
+                try:
+                    exists = await asyncio.to_thread(storage.has_prices_for_date, 'chicken', current_date)
+                except Exception as e:
+                    print(f"⚠️ Could not check for existing data: {e}")
+                    exists = False
+                if exists:
+                    print(f"⚠️ Data for {date_of_price} already exists. Skipping save to prevent duplicates.")
+                    return False
 
-                        bengaluru_doc = base_document.copy()
-                        bengaluru_doc['city'] = 'Bengaluru'
-                        documents.append(bengaluru_doc)
-                    else:
-                        document = base_document.copy()
-                        document['city'] = city
-                        documents.append(document)
+            documents = self.build_documents(all_prices, date_of_price, date_of_scraping)
 
             if documents:
-                result = collection.insert_many(documents)
-                print(f"✅ Successfully saved {len(result.inserted_ids)} records to MongoDB")
+                print(f"💾 Queueing {len(documents)} records for the price storage...")
+                saved = await self.write_queue.submit('store_chicken_prices', documents)
+                if saved is None:
+                    print("📥 Price storage unreachable - records spooled to disk and will be replayed on the next run")
+                else:
+                    print(f"✅ Successfully saved {saved} records to {storage.backend if storage else 'price storage'}")
                 return True
             else:
-                print("⚠️ No data to save to MongoDB")
+                print("⚠️ No data to save")
                 return False
 
         except Exception as e:
-            print(f"❌ Error saving to MongoDB: {e}")
+            print(f"❌ Error saving prices: {e}")
             return False
-        finally:
-            if client:
-                client.close()
+
+    async def close_write_queue(self):
+        """Flush queued writes and print the write queue statistics"""
+        await self.write_queue.close()
+        if self.storage is not None:
+            await asyncio.to_thread(self.storage.close)
+            self.storage = None
+        stats = self.write_queue.stats()
+        print(f"📊 Write queue: {stats['written']} written, {stats['spooled']} spooled, "
+              f"{stats['replayed']} replayed, {stats['spool_depth']} waiting in spool, "
+              f"last flush {stats['last_flush_ms']} ms")
 
     def get_summary_stats(self, all_prices):
         """Get basic summary statistics"""
@@ -421,6 +428,13 @@ class ChickenPriceScraperWithSlack:
         Returns:
             bool: True if scraping succeeded, False if failed
         """
+        try:
+            return await self._scrape_and_save()
+        finally:
+            await self.close_write_queue()
+
+    async def _scrape_and_save(self):
+        """Scrape (falling back to sample data) and save, sending the Slack notifications"""
         try:
             # Try Playwright scraping
             scraped_data = await self.scrape_all_varieties()
@@ -435,14 +449,14 @@ class ChickenPriceScraperWithSlack:
                 print("⚠️ Playwright scraping didn't find data, using fallback...")
                 final_data = self.get_fallback_data()
 
-            # Save to MongoDB
-            mongodb_success = self.save_to_mongodb(final_data)
+            # Save to the price storage
+            save_success = await self.save_prices(final_data)
 
             # Summary
             cities_with_data, varieties_found = self.get_summary_stats(final_data)
             print(f"📊 Summary: {cities_with_data}/{len(self.target_cities)} cities, {varieties_found}/{len(self.chicken_varieties)} varieties")
 
-            if mongodb_success:
+            if save_success:
                 print("✅ Chicken scraping completed successfully!")
                 self.slack.send_success(self.scraper_name)
                 return True
@@ -459,9 +473,9 @@ class ChickenPriceScraperWithSlack:
             try:
                 print("🔄 Using fallback data...")
                 fallback_data = self.get_fallback_data()
-                mongodb_success = self.save_to_mongodb(fallback_data)
+                save_success = await self.save_prices(fallback_data)
 
-                if mongodb_success:
+                if save_success:
                     print("✅ Fallback data saved successfully!")
                     self.slack.send_success(self.scraper_name)
                     return True
@@ -9,13 +9,13 @@ Sends success/error messages to Slack channel automatically.
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime, UTC
-from pymongo import MongoClient
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import time
 import logging
 import traceback
 from slack_notifier import SlackNotifier
+from price_storage import get_price_storage
 
 
 class CopraPriceScraperWithSlack:
@@ -44,10 +44,8 @@ class CopraPriceScraperWithSlack:
         self.cities = ['bangalore', 'chennai', 'mumbai', 'delhi', 'hyderabad', 'kolkata', 'pune', 'thiruvananthapuram', 'surat', 'kochi', 'coimbatore', 'mangaluru', 'visakhapatnam', 'madurai', 'kozhikode', 'ahmedabad', 'gandhidham', 'bhadohi', 'indore', 'pollachi', 'tiptur', 'secunderabad', 'mandya', 'namakkal', 'erode', 'mysore', 'thane', 'cuttack', 'karikkad', 'doiwala', 'jaipur', 'agra', 'gurugram', 'loni', 'kanpur', 'tumakuru', 'hosur', 'vasai-virar', 'panvel', 'nashik', 'karjat', 'vellakovil', 'udumalpet', 'hassan', 'salem', 'hubli', 'gobichettipalayam', 'nagpur', 'raipur', 'patna', 'amritsar', 'noida', 'rajkot', 'varanasi', 'lucknow', 'bhopal', 'theni-allinagaram', 'navi-mumbai', 'new-delhi']
         self.prices = {}
         
-        # MongoDB connection
-        self.client = MongoClient('mongodb://localhost:27017/')
-        self.db = self.client['egg_price_data']
-        self.prices_collection = self.db['copra_prices']
+        # Price storage (MongoDB or SQLite, see PRICE_STORAGE_BACKEND)
+        self.storage = get_price_storage()
         
         # Slack notifier
         self.slack = SlackNotifier()
@@ -113,25 +111,14 @@ class CopraPriceScraperWithSlack:
             print(f'Error scraping IndiaMART: {str(e)}')
             raise
 
-    def save_to_mongodb(self):
-        """Save the scraped prices to MongoDB"""
+    def save_prices(self):
+        """Save the scraped prices to the configured price storage"""
         try:
             today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
             documents = []
-            skipped_cities = []
             
             for city, data in self.prices.items():
                 if data.get('min_price') is not None:
-                    existing_record = self.prices_collection.find_one({
-                        'city': city,
-                        'commodity': 'copra',
-                        'price_date': today
-                    })
-                    
-                    if existing_record:
-                        skipped_cities.append(city)
-                        continue
-                        
                     document = {
                         'city': city,
                         'commodity': 'copra',
@@ -143,19 +130,22 @@ class CopraPriceScraperWithSlack:
                     }
                     documents.append(document)
             
-            if documents:
-                self.prices_collection.insert_many(documents)
-                print(f'Successfully saved {len(documents)} price records to MongoDB')
+            # Cities that already have prices for today are skipped by the storage
+            saved = self.storage.store_copra_prices(documents)
+            skipped = len(documents) - saved
+            
+            if saved:
+                print(f'Successfully saved {saved} price records to {self.storage.backend}')
                 return True
             else:
-                if skipped_cities:
-                    print(f'Skipped {len(skipped_cities)} cities as data already exists for today')
+                if skipped:
+                    print(f'Skipped {skipped} cities as data already exists for today')
                 else:
-                    print('No valid price data to save to MongoDB')
+                    print('No valid price data to save')
                 return False
 
         except Exception as e:
-            print(f'Error saving to MongoDB: {str(e)}')
+            print(f'Error saving prices: {str(e)}')
             raise
 
     def run_scraping(self):
@@ -177,8 +167,8 @@ class CopraPriceScraperWithSlack:
                 self.slack.send_error(self.scraper_name)
                 return False
             
-            # Save to MongoDB
-            save_success = self.save_to_mongodb()
+            # Save to the price storage
+            save_success = self.save_prices()
             
             if save_success:
                 print('✅ Copra scraping completed successfully!')
@@ -197,10 +187,9 @@ class CopraPriceScraperWithSlack:
             return False
 
     def close(self):
-        """Close database connections"""
+        """Release database handles (a shared MongoDB client stays open for other scrapers)"""
         try:
-            if hasattr(self, 'client'):
-                self.client.close()
+            self.storage.close()
         except:
             pass
 
@@ -1,5 +1,5 @@
-from pymongo import MongoClient
 from datetime import datetime
+from mongo_connection import get_mongo_client
 
 """
 MongoDB Schema for Egg Price Agent
@@ -28,12 +28,10 @@ class EggPriceDatabase:
             db_name (str): Name of the database
         """
         try:
-            self.client = MongoClient(connection_string)
+            # Shared pooled client (pinged once per process)
+            self.client = get_mongo_client(connection_string)
             self.db = self.client[db_name]
             self.user_queries = self.db.user_queries
-            # Test connection
-            self.client.admin.command('ping')
-            print("Connected successfully to MongoDB")
         except Exception as e:
             print(f"MongoDB connection error: {e}")
             raise
@@ -94,6 +92,7 @@ class EggPriceDatabase:
     
     def close_connection(self):
         """
-        Close the MongoDB connection
+        Release this database handle (the shared MongoClient is closed once
+        per process via mongo_connection.close_mongo_clients())
         """
-        self.client.close()
\ No newline at end of file
+        self.client = None
\ No newline at end of file
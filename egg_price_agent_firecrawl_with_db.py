@@ -1,5 +1,5 @@
 from egg_price_agent_firecrawl import EggPriceAgentFireCrawl
-from egg_price_schema import EggPriceDatabase
+from price_storage import get_price_storage
 from egg_price_historical_scraper import EggPriceHistoricalScraper
 from datetime import datetime
 import re
@@ -9,7 +9,7 @@ class EggPriceAgentFireCrawlWithDB:
     def __init__(self, connection_string="mongodb://localhost:27017/", db_name="egg_price_data"):
         self.agent = EggPriceAgentFireCrawl()
         self.historical_scraper = EggPriceHistoricalScraper()
-        self.db = EggPriceDatabase(connection_string, db_name)
+        self.db = get_price_storage(connection_string, db_name)
         self._store_initial_prices()
         self._store_historical_prices()
     
@@ -32,7 +32,7 @@ class EggPriceAgentFireCrawlWithDB:
         # Get existing entries for today
         existing_entries = {}
         try:
-            latest_prices = self.db.get_latest_prices()
+            latest_prices = self.db.get_latest_prices('egg')
             for entry in latest_prices:
                 if '_id' in entry and 'latest_price' in entry:
                     city = entry['_id']
@@ -135,7 +135,7 @@ class EggPriceAgentFireCrawlWithDB:
         existing_entries = {}
         try:
             # Get latest prices for all cities
-            latest_prices = self.db.get_latest_prices()
+            latest_prices = self.db.get_latest_prices('egg')
             for entry in latest_prices:
                 # For aggregation result structure
                 if '_id' in entry and 'latest_price' in entry:
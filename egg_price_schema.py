@@ -1,16 +1,15 @@
-from pymongo import MongoClient
 from datetime import datetime
+from mongo_connection import get_mongo_client
+from price_records import compact_egg_rates, expand_egg_document, extract_egg_rates
 
 class EggPriceDatabase:
-    def __init__(self, connection_string="mongodb://localhost:27017/", db_name="egg_price_data"):
+    def __init__(self, connection_string=None, db_name="egg_price_data"):
         try:
-            self.client = MongoClient(connection_string)
+            # Shared pooled client (pinged once per process)
+            self.client = get_mongo_client(connection_string)
             self.db = self.client[db_name]
             self.egg_prices = self.db.egg_prices
             self.copra_prices = self.db.copra_prices
-            # Test connection
-            self.client.admin.command('ping')
-            print("Connected successfully to MongoDB")
         except Exception as e:
             print(f"MongoDB connection error: {e}")
             raise
@@ -53,14 +52,27 @@ class EggPriceDatabase:
                 except (AttributeError, TypeError):
                     historical_date = current_timestamp
                 
+                # Compact format: the single-egg price plus only the pack prices
+                # that differ from it; full rates are derived at read time
+                unit_price, packs, missing = compact_egg_rates(rates)
                 document = {
                     'city': city.lower(),  # Normalize city names
                     'commodity': 'egg',  # Add commodity field to stored document
-                    'rates': rates,
+                    'unit_price': unit_price,
                     'timestamp': current_timestamp,  # When the data was stored
                     'date': historical_date,  # When the prices were actually recorded
-                    'query_text': str(price_data)  # Store original query for reference
                 }
+                # Drop the legacy fields when replacing a day stored in the old format
+                unset = {'rates': '', 'query_text': ''}
+                if packs:
+                    document['packs'] = packs
+                else:
+                    unset['packs'] = ''
+                # Packs the scrape did not price are read back as None, not derived
+                if missing:
+                    document['missing_packs'] = missing
+                else:
+                    unset['missing_packs'] = ''
                 
                 # Upsert the document based on city and date
                 result = self.egg_prices.update_one(
@@ -69,7 +81,7 @@ class EggPriceDatabase:
                         'commodity': 'egg',
                         'date': historical_date
                     },
-                    {'$set': document},
+                    {'$set': document, '$unset': unset},
                     upsert=True
                 )
                 
@@ -116,12 +128,13 @@ class EggPriceDatabase:
             )
             
             if result:
+                expand_egg_document(result)
                 return {
                     'city': result['city'],
                     'rates': result['rates'],
                     'timestamp': result['timestamp'],
                     'date': result['date'],
-                    'query_text': result['query_text']
+                    'query_text': result.get('query_text')
                 }
             return None
             
@@ -139,60 +152,7 @@ class EggPriceDatabase:
         Returns:
             dict: Standardized rates with numeric values
         """
-        rates = {
-            'single_egg': {'price': None, 'quantity': 1},
-            'tray': {'price': None, 'quantity': 30},
-            'hundred_eggs': {'price': None, 'quantity': 100},
-            'box': {'price': None, 'quantity': 210}
-        }
-        
-        try:
-            if isinstance(response, str):
-                lines = response.split('\n')
-            elif isinstance(response, dict):
-                # If response is already a dictionary, process it directly
-                lines = [f"- {k}: {v}" for k, v in response.items()]
-            else:
-                return rates
-
-            for line in lines:
-                if ':' in line and (line.strip().startswith('-') or isinstance(response, dict)):
-                    parts = line.strip().lstrip('- ').split(':', 1)
-                    if len(parts) == 2:
-                        key = parts[0].strip().lower()
-                        value = parts[1].strip()
-                        
-                        try:
-                            # Extract numeric value, handling different formats
-                            if '₹' in value:
-                                # Remove rupee symbol and any whitespace
-                                price_str = value.replace('₹', '').strip()
-                                # Remove any other non-numeric characters except decimal point
-                                price_str = ''.join(c for c in price_str if c.isdigit() or c == '.')
-                                # Ensure the string is not empty and doesn't end with a decimal point
-                                if price_str and not price_str.endswith('.'):
-                                    try:
-                                        price = float(price_str)
-                                        # Map to standardized rate keys with price and quantity
-                                        if any(term in key for term in ['single', '1 egg']):
-                                            rates['single_egg']['price'] = price
-                                        elif any(term in key for term in ['tray', '30']):
-                                            rates['tray']['price'] = price
-                                        elif '100' in key:
-                                            rates['hundred_eggs']['price'] = price
-                                        elif any(term in key for term in ['box', '210']):
-                                            rates['box']['price'] = price
-                                    except ValueError:
-                                        # Skip invalid numeric values
-                                        continue
-                        except ValueError:
-                            continue
-            
-            return rates
-            
-        except Exception as e:
-            print(f"Error extracting rates: {e}")
-            return rates
+        return extract_egg_rates(response)
     
     def get_latest_prices(self, city=None):
         """
@@ -207,7 +167,16 @@ class EggPriceDatabase:
                 # Get latest price for specific city
                 query['city'] = city
                 result = self.egg_prices.find(query).sort('timestamp', -1).limit(1)
+                return [expand_egg_document(doc) for doc in result]
             else:
+                # Served from the latest_prices collection kept current by price_storage
+                latest = list(self.db['latest_prices'].find({'commodity': 'egg'}, {'document': 1}))
+                if latest:
+                    return [
+                        {'_id': row['document']['city'], 'latest_price': expand_egg_document(row['document'])}
+                        for row in latest
+                    ]
+
                 # Get latest prices for all cities
                 pipeline = [
                     {'$match': {'commodity': 'egg'}},
@@ -219,7 +188,7 @@ class EggPriceDatabase:
                 ]
                 result = self.egg_prices.aggregate(pipeline)
             
-            return list(result)
+            return [{**row, 'latest_price': expand_egg_document(row['latest_price'])} for row in result]
             
         except Exception as e:
             print(f"Error retrieving egg prices: {e}")
@@ -262,7 +231,11 @@ class EggPriceDatabase:
             return []
     
     def close(self):
-        """Close the MongoDB connection"""
+        """
+        Release this database handle
+
+        The underlying MongoClient is shared with other components, so it is
+        closed once per process via mongo_connection.close_mongo_clients().
+        """
         if hasattr(self, 'client'):
-            self.client.close()
-            print("MongoDB connection closed")
\ No newline at end of file
+            self.client = None
\ No newline at end of file
@@ -35,7 +35,7 @@ class EggScraperWithSlack:
             # So we just need to check if it completed successfully
             
             # Verify that the scraper is working by checking if we can get latest prices
-            latest_prices = self.scraper.db.get_latest_prices()
+            latest_prices = self.scraper.db.get_latest_prices('egg')
             
             if latest_prices and len(latest_prices) > 0:
                 print(f"✅ Egg scraping completed successfully! Found data for {len(latest_prices)} cities.")
@@ -3,9 +3,9 @@ import os
 from playwright.async_api import async_playwright
 from datetime import datetime
 import re
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 from slack_notifier import SlackNotifier
+from price_storage import get_price_storage
+from price_write_queue import PriceWriteQueue
 import traceback
 
 class LinuxChickenScraper:
@@ -38,6 +38,9 @@ class LinuxChickenScraper:
         self.mongo_connection_string = "mongodb://localhost:27017/"
         self.database_name = "egg_price_data"
         self.collection_name = "chicken_prices_linux"
+        self.write_queue = PriceWriteQueue(
+            lambda: get_price_storage(self.mongo_connection_string, self.database_name)
+        )
 
     async def create_browser_context(self, playwright):
         """Create browser with Linux server-optimized settings"""
@@ -202,18 +205,9 @@ class LinuxChickenScraper:
 
         return all_data
 
-    def save_to_mongodb(self, data):
-        """Save scraped data to MongoDB"""
+    async def save_prices(self, data):
+        """Queue scraped data for the price storage (MongoDB chicken_prices_linux, or SQLite)"""
         try:
-            print("💾 Connecting to MongoDB...")
-            client = MongoClient(self.mongo_connection_string, serverSelectionTimeoutMS=5000)
-            
-            # Test connection
-            client.admin.command('ping')
-            
-            db = client[self.database_name]
-            collection = db[self.collection_name]
-            
             # Prepare document
             document = {
                 'timestamp': datetime.now(),
@@ -224,20 +218,27 @@ class LinuxChickenScraper:
                 'total_cities': len(set().union(*[cities.keys() for cities in data.values()]))
             }
             
-            # Insert document
-            result = collection.insert_one(document)
-            print(f"✅ Data saved to MongoDB with ID: {result.inserted_id}")
-            
-            client.close()
+            # Written in a worker thread; spooled to disk if the storage is unreachable
+            print("💾 Queueing data for the price storage...")
+            result = await self.write_queue.submit('store_chicken_snapshot', document)
+            if result is None:
+                print("📥 Price storage unreachable - data spooled to disk and will be replayed on the next run")
+            else:
+                print(f"✅ Data saved to price storage: {result}")
             return True
             
-        except (ConnectionFailure, ServerSelectionTimeoutError) as e:
-            print(f"❌ MongoDB connection failed: {e}")
-            return False
         except Exception as e:
-            print(f"❌ MongoDB save error: {e}")
+            print(f"❌ Price storage save error: {e}")
             return False
 
+    async def close_write_queue(self):
+        """Flush queued writes and print the write queue statistics"""
+        await self.write_queue.close()
+        stats = self.write_queue.stats()
+        print(f"📊 Write queue: {stats['written']} written, {stats['spooled']} spooled, "
+              f"{stats['replayed']} replayed, {stats['spool_depth']} waiting in spool, "
+              f"last flush {stats['last_flush_ms']} ms")
+
     def get_summary_stats(self, data):
         """Get summary statistics"""
         all_cities = set()
@@ -313,6 +314,13 @@ class LinuxChickenScraper:
 
     async def run(self):
         """Main method to run the Linux scraper"""
+        try:
+            return await self._scrape_and_save()
+        finally:
+            await self.close_write_queue()
+
+    async def _scrape_and_save(self):
+        """Scrape all varieties (falling back to sample data), save and notify Slack"""
         print("🐧 Linux Chicken Price Scraper Starting...")
         print(f"🎯 Target cities: {len(self.target_cities)}")
         print(f"🐔 Chicken varieties: {len(self.base_urls)} (5 varieties)")
@@ -333,7 +341,7 @@ class LinuxChickenScraper:
                              for variety in self.base_urls.keys()}
 
             # Save to MongoDB
-            mongodb_success = self.save_to_mongodb(final_data)
+            mongodb_success = await self.save_prices(final_data)
 
             # Summary
             cities_with_data, varieties_found = self.get_summary_stats(final_data)
@@ -363,7 +371,7 @@ class LinuxChickenScraper:
             try:
                 fallback_data = {variety: self.get_fallback_data_for_variety(variety)
                                for variety in self.base_urls.keys()}
-                mongodb_success = self.save_to_mongodb(fallback_data)
+                mongodb_success = await self.save_prices(fallback_data)
                 print(f"💾 Fallback data saved: {'✅ Success' if mongodb_success else '❌ Failed'}")
                 return fallback_data
             except Exception as fallback_error:
@@ -0,0 +1,208 @@
+"""
+Bulk Price Export
+=================
+
+Streams a commodity's full (or filtered) price history in the long schema
+
+    commodity, city_key, variety, date, price
+
+as gzip-compressed CSV, Parquet or Arrow IPC (stream format). Records are read
+from a server-side cursor in fixed-size batches (see
+price_retention.read_record_batches) and every batch is encoded and handed
+on before the next one is read, so memory use does not depend on the size of
+the history:
+
+    CSV       one gzip member, flushed per batch
+    Parquet   one row group per batch, footer at the end
+    Arrow     one record batch message per batch
+
+The API serves the same streams at GET /export/{commodity}.
+
+Usage:
+    python price_export.py egg --format parquet --output egg.parquet
+    python price_export.py copra --format csv --city mumbai --start-date 2024-01-01 > copra.csv.gz
+"""
+
+import argparse
+import csv
+import io
+import sys
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from price_records import COMMODITIES
+
+
+ARROW_AVAILABLE = pa is not None
+EXPORT_FORMATS = ('csv', 'parquet', 'arrow')
+EXPORT_COLUMNS = ('commodity', 'city_key', 'variety', 'date', 'price')
+DEFAULT_BATCH_SIZE = 10000
+
+MEDIA_TYPES = {
+    'csv': 'application/gzip',
+    'csv_plain': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+
+def export_filename(commodity: str, fmt: str, compress: bool = True) -> str:
+    """Download name for an export ('egg.csv.gz', 'egg.parquet', 'egg.arrows')"""
+    if fmt == 'csv':
+        return f"{commodity}.csv.gz" if compress else f"{commodity}.csv"
+    return f"{commodity}.{'parquet' if fmt == 'parquet' else 'arrows'}"
+
+
+def media_type(fmt: str, compress: bool = True) -> str:
+    """Content type of an export"""
+    return MEDIA_TYPES['csv_plain' if fmt == 'csv' and not compress else fmt]
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects what pyarrow writes until it is drained"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_schema():
+    return pa.schema([
+        ('commodity', pa.string()),
+        ('city_key', pa.string()),
+        ('variety', pa.string()),
+        ('date', pa.date32()),
+        ('price', pa.float64()),
+    ])
+
+
+def _arrow_table(records: List[Dict], schema):
+    return pa.table({
+        'commodity': [r['commodity'] for r in records],
+        'city_key': [r['city_key'] for r in records],
+        'variety': [r['variety'] for r in records],
+        'date': [r['date'].date() if isinstance(r['date'], datetime) else r['date'] for r in records],
+        'price': [r['price'] for r in records],
+    }, schema=schema)
+
+
+def csv_chunks(batches: Iterable[List[Dict]], compress: bool = True) -> Iterator[bytes]:
+    """Encode record batches as CSV (with a header row), gzip-compressed unless compress is False"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        for r in batch:
+            writer.writerow((r['commodity'], r['city_key'], r['variety'], r['date'].strftime('%Y-%m-%d'), r['price']))
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        if compressor is not None:
+            data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    data = buffer.getvalue().encode('utf-8')
+    if compressor is not None:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+def arrow_chunks(batches: Iterable[List[Dict]], fmt: str) -> Iterator[bytes]:
+    """Encode record batches as Parquet row groups or Arrow IPC stream messages"""
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet and Arrow exports: pip install pyarrow")
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    output = pa.PythonFile(sink, mode='w')
+    writer = pq.ParquetWriter(output, schema) if fmt == 'parquet' else pa.ipc.new_stream(output, schema)
+    try:
+        for batch in batches:
+            if batch:
+                writer.write_table(_arrow_table(batch, schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_chunks(batches: Iterable[List[Dict]], fmt: str, compress: bool = True) -> Iterator[bytes]:
+    """
+    Encode record batches in an export format
+
+    Args:
+        batches: Lists of price records (see price_records.py)
+        fmt: 'csv', 'parquet' or 'arrow'
+        compress (bool): gzip the CSV output
+
+    Yields:
+        bytes: The encoded export, one chunk per batch
+    """
+    if fmt == 'csv':
+        return csv_chunks(batches, compress)
+    if fmt in ('parquet', 'arrow'):
+        return arrow_chunks(batches, fmt)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def main():
+    """Command line entry point for exporting a commodity's history"""
+    from price_retention import read_record_batches
+    from price_storage import get_price_storage
+
+    parser = argparse.ArgumentParser(description="Bulk price export")
+    parser.add_argument('commodity', choices=COMMODITIES)
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument('--city', action='append', default=None, help="Only this city (repeatable)")
+    parser.add_argument('--start-date', default=None, help="First day (YYYY-MM-DD)")
+    parser.add_argument('--end-date', default=None, help="Last day (YYYY-MM-DD)")
+    parser.add_argument('--no-compress', action='store_true', help="Plain CSV instead of gzip")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--output', default=None, help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    storage = get_price_storage()
+    batches = read_record_batches(storage, args.commodity, args.city, args.start_date, args.end_date, args.batch_size)
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        size = 0
+        for chunk in export_chunks(batches, args.format, not args.no_compress):
+            output.write(chunk)
+            size += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+        storage.close()
+    if args.output:
+        print(f"Wrote {size} bytes to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
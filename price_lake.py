@@ -0,0 +1,234 @@
+"""
+Parquet Price Lake
+==================
+
+Local columnar copy of the egg, copra and chicken price history for bulk
+analysis, partitioned by commodity, year and month:
+
+    price_lake/
+        _watermarks.json
+        commodity=egg/year=2024/month=05/part-20240501T083000-1a2b3c4d.parquet
+        commodity=copra/...
+
+Each file uses the long schema (city_key, variety, date, price); commodity,
+year and month come from the partition path. Every export only writes the
+days it has not seen before into a new file in the touched partitions, and
+`compact` merges a partition's small files into one.
+
+Usage:
+    python price_lake.py export              # append new records from the price storage
+    python price_lake.py compact             # merge small files per partition
+
+    import pyarrow.dataset as ds
+    table = ds.dataset('price_lake', partitioning='hive').to_table()
+"""
+
+import argparse
+import itertools
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from price_records import COMMODITIES, dedupe_records
+from price_retention import read_record_batches
+
+
+DEFAULT_LAKE_DIR = "price_lake"
+WATERMARK_FILE = "_watermarks.json"
+
+
+class ParquetPriceLake:
+    """Partitioned, append-only Parquet dataset of price records"""
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        Initialize the lake
+
+        Args:
+            root (str, optional): Dataset directory (default: PRICE_LAKE_DIR or ./price_lake)
+        """
+        if pa is None:
+            raise ImportError("pyarrow is required for the Parquet price lake: pip install pyarrow")
+        self.root = root or os.getenv('PRICE_LAKE_DIR') or DEFAULT_LAKE_DIR
+        os.makedirs(self.root, exist_ok=True)
+        self.schema = pa.schema([
+            ('city_key', pa.string()),
+            ('variety', pa.string()),
+            ('date', pa.date32()),
+            ('price', pa.float64()),
+        ])
+
+    def _partition_dir(self, commodity: str, year: int, month: int) -> str:
+        return os.path.join(self.root, f"commodity={commodity}", f"year={year}", f"month={month:02d}")
+
+    @staticmethod
+    def _parquet_files(directory: str) -> List[str]:
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            os.path.join(directory, name)
+            for name in os.listdir(directory)
+            if name.endswith('.parquet')
+        )
+
+    def _existing_keys(self, directory: str) -> set:
+        """Read the (city_key, variety, date) keys already stored in a partition"""
+        keys = set()
+        for path in self._parquet_files(directory):
+            table = pq.read_table(path, columns=['city_key', 'variety', 'date'])
+            keys.update(zip(*(table.column(name).to_pylist() for name in ('city_key', 'variety', 'date'))))
+        return keys
+
+    def get_watermarks(self) -> Dict[str, str]:
+        """Get the newest exported date per commodity ('%Y-%m-%d')"""
+        path = os.path.join(self.root, WATERMARK_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_watermarks(self, watermarks: Dict[str, str]):
+        path = os.path.join(self.root, WATERMARK_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(watermarks, f, indent=2, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    def append_records(self, records: Iterable[Dict]) -> int:
+        """
+        Append records for days not yet in the lake
+
+        Only the partitions the records fall into are read, and each of them
+        gets at most one new file; existing files are never rewritten.
+
+        Args:
+            records: Long-format price records (see price_records.py)
+
+        Returns:
+            int: Number of rows written
+        """
+        partitions = {}
+        for record in dedupe_records(records):
+            day = record['date'].date() if isinstance(record['date'], datetime) else record['date']
+            partitions.setdefault((record['commodity'], day.year, day.month), []).append((record, day))
+
+        written = 0
+        watermarks = self.get_watermarks()
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        for (commodity, year, month), rows in sorted(partitions.items()):
+            directory = self._partition_dir(commodity, year, month)
+            existing = self._existing_keys(directory)
+            new_rows = [(r, day) for r, day in rows if (r['city_key'], r['variety'], day) not in existing]
+            if not new_rows:
+                continue
+
+            new_rows.sort(key=lambda item: (item[1], item[0]['city_key'], item[0]['variety']))
+            table = pa.table({
+                'city_key': [r['city_key'] for r, _ in new_rows],
+                'variety': [r['variety'] for r, _ in new_rows],
+                'date': [day for _, day in new_rows],
+                'price': [r['price'] for r, _ in new_rows],
+            }, schema=self.schema)
+            os.makedirs(directory, exist_ok=True)
+            pq.write_table(table, os.path.join(directory, f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet"))
+            written += len(new_rows)
+
+            newest = max(day for _, day in new_rows).isoformat()
+            if newest > watermarks.get(commodity, ''):
+                watermarks[commodity] = newest
+
+        self._save_watermarks(watermarks)
+        return written
+
+    def compact(self, commodity: Optional[str] = None) -> int:
+        """
+        Merge each partition's files into a single file
+
+        Args:
+            commodity (str, optional): Only compact this commodity
+
+        Returns:
+            int: Number of partitions compacted
+        """
+        compacted = 0
+        for dirpath, _, _ in os.walk(self.root):
+            if commodity and f"commodity={commodity}" not in dirpath.split(os.sep):
+                continue
+            files = self._parquet_files(dirpath)
+            if len(files) < 2:
+                continue
+
+            # Later files win when a key appears twice
+            rows = {}
+            for path in files:
+                for row in pq.read_table(path).to_pylist():
+                    rows[(row['city_key'], row['variety'], row['date'])] = row
+            ordered = sorted(rows.values(), key=lambda r: (r['date'], r['city_key'], r['variety']))
+            table = pa.Table.from_pylist(ordered, schema=self.schema)
+
+            target = os.path.join(dirpath, f"part-compacted-{uuid.uuid4().hex[:8]}.parquet")
+            pq.write_table(table, target + '.tmp')
+            os.replace(target + '.tmp', target)
+            for path in files:
+                os.remove(path)
+            compacted += 1
+        return compacted
+
+
+def export_from_database(lake: ParquetPriceLake, storage) -> Dict[str, int]:
+    """
+    Append egg, copra and chicken records newer than each commodity's watermark
+
+    The watermark day itself is re-read so cities scraped later that day are
+    picked up; rows already in the lake are skipped.
+
+    Args:
+        lake: Target lake
+        storage (PriceStorage): Configured storage backend (see price_storage.get_price_storage)
+
+    Returns:
+        dict: Rows written per commodity
+    """
+    watermarks = lake.get_watermarks()
+    written = {}
+    for commodity in COMMODITIES:
+        # From the watermark (the whole history on the first export), through to the archive
+        batches = read_record_batches(storage, commodity, None, watermarks.get(commodity))
+        written[commodity] = lake.append_records(itertools.chain.from_iterable(batches))
+    return written
+
+
+def main():
+    """Command line entry point for export and compaction"""
+    parser = argparse.ArgumentParser(description="Parquet price lake")
+    parser.add_argument('command', choices=['export', 'compact'])
+    parser.add_argument('--root', default=None, help="Dataset directory (default: PRICE_LAKE_DIR or ./price_lake)")
+    parser.add_argument('--commodity', choices=COMMODITIES, default=None)
+    parser.add_argument('--connection-string', default=None)
+    parser.add_argument('--db-name', default='egg_price_data')
+    args = parser.parse_args()
+
+    lake = ParquetPriceLake(args.root)
+    if args.command == 'export':
+        from price_storage import get_price_storage
+        storage = get_price_storage(args.connection_string, args.db_name)
+        try:
+            written = export_from_database(lake, storage)
+        finally:
+            storage.close()
+        for commodity, count in written.items():
+            print(f"{commodity.upper()}: {count} new rows")
+    else:
+        print(f"Compacted {lake.compact(args.commodity)} partitions")
+
+
+if __name__ == "__main__":
+    main()
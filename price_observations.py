@@ -0,0 +1,238 @@
+"""
+Unified Price Observations
+==========================
+
+One collection, one shape and one index for every commodity price:
+
+    {'commodity': 'egg', 'variety': 'tray', 'city_key': 'mumbai',
+     'date': datetime(2024, 5, 1), 'price': 190.0, 'unit': 'INR/30 eggs',
+     'source': 'egg_prices', 'scraped_at': datetime(...)}
+
+The unique (commodity, city_key, date, variety) index serves per-city range
+reads, latest lookups and duplicate detection for all three commodities.
+
+Transition:
+    1. Set PRICE_DUAL_WRITE=1 so every write through price_storage.py also
+       lands here (tagged with the legacy collection it went to)
+    2. Run `python price_observations.py migrate`; it copies the legacy
+       collections in _id order, checkpoints after every batch, and only
+       inserts missing observations, so it can run (and be resumed) while
+       the scrapers keep writing
+    3. `python price_observations.py status` shows progress per collection
+
+Usage:
+    python price_observations.py migrate [--batch-size 1000]
+    python price_observations.py status
+"""
+
+import argparse
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, UpdateOne
+
+from mongo_connection import get_mongo_client
+from price_records import (
+    CHICKEN_LINUX_COLLECTION, COMMODITIES, EGG_RATE_QUANTITIES, LEGACY_COLLECTIONS,
+    city_key, dedupe_records, document_to_records, records_to_documents, to_price_date,
+)
+
+
+MIGRATION_COLLECTION = "price_observations_migration"
+
+# Copra prices are normalized to per-kg by the scraper; chicken is quoted per kg
+UNITS = {
+    'egg': {
+        variety: 'INR/egg' if quantity == 1 else f'INR/{quantity} eggs'
+        for variety, quantity in EGG_RATE_QUANTITIES.items()
+    },
+    'copra': 'INR/kg',
+    'chicken': 'INR/kg',
+}
+
+
+def unit_for(commodity: str, variety: str) -> str:
+    """Unit a commodity/variety price is quoted in"""
+    unit = UNITS[commodity]
+    return unit.get(variety, 'INR') if isinstance(unit, dict) else unit
+
+
+class PriceObservationStore:
+    """Price history in the unified long-format observation collection"""
+
+    def __init__(self, connection_string=None, db_name="egg_price_data", collection_name="price_observations"):
+        """
+        Initialize the store and its indexes
+
+        Args:
+            connection_string (str, optional): MongoDB connection string (default: MONGO_URI)
+            db_name (str): Name of the database
+            collection_name (str): Name of the observation collection
+        """
+        self.client = get_mongo_client(connection_string)
+        self.db = self.client[db_name]
+        self.collection = self.db[collection_name]
+        self.collection.create_index(
+            [('commodity', ASCENDING), ('city_key', ASCENDING), ('date', ASCENDING), ('variety', ASCENDING)],
+            unique=True,
+            name='commodity_city_date_variety',
+        )
+        self.collection.create_index([('commodity', ASCENDING), ('date', ASCENDING)], name='commodity_date')
+
+    def write_records(self, records: Iterable[Dict], source: Optional[str] = None, overwrite: bool = True) -> int:
+        """
+        Upsert price records as observations
+
+        Args:
+            records: Long-format price records (see price_records.py)
+            source (str, optional): Where the prices came from, unless a record carries its own 'source'
+            overwrite (bool): Replace the price of existing observations; when False
+                only missing observations are inserted
+
+        Returns:
+            int: Number of observations inserted or modified
+        """
+        operations = []
+        now = datetime.utcnow()
+        for record in dedupe_records(records):
+            key = {
+                'commodity': record['commodity'],
+                'city_key': record['city_key'],
+                'date': record['date'],
+                'variety': record['variety'],
+            }
+            values = {
+                'price': record['price'],
+                'unit': unit_for(record['commodity'], record['variety']),
+                'source': record.get('source') or source,
+                'scraped_at': record.get('scraped_at'),
+                'updated_at': now,
+            }
+            update = {'$set': values} if overwrite else {'$setOnInsert': values}
+            operations.append(UpdateOne(key, update, upsert=True))
+        if not operations:
+            return 0
+        result = self.collection.bulk_write(operations, ordered=False)
+        return result.upserted_count + result.modified_count
+
+    def write_documents(self, commodity: str, documents: Iterable[Dict], source: Optional[str] = None,
+                        overwrite: bool = True) -> int:
+        """Convert legacy documents of one commodity and upsert their observations"""
+        records = [r for document in documents for r in document_to_records(commodity, document)]
+        return self.write_records(records, source, overwrite)
+
+    def get_records(self, commodity: str, city: str, start_date, end_date) -> List[Dict]:
+        """Get one city's observations within a date range (inclusive), oldest first"""
+        cursor = self.collection.find(
+            {
+                'commodity': commodity,
+                'city_key': city_key(city),
+                'date': {'$gte': to_price_date(start_date), '$lte': to_price_date(end_date)},
+            },
+            {'_id': 0},
+        ).sort([('date', ASCENDING), ('variety', ASCENDING)])
+        return list(cursor)
+
+    def get_prices_by_date_range(self, commodity: str, city: str, start_date, end_date) -> List[Dict]:
+        """Same documents as the legacy range reads, rebuilt from observations"""
+        return records_to_documents(self.get_records(commodity, city, start_date, end_date))
+
+
+def _legacy_sources():
+    sources = [(commodity, LEGACY_COLLECTIONS[commodity]) for commodity in COMMODITIES]
+    sources.append(('chicken', CHICKEN_LINUX_COLLECTION))
+    return sources
+
+
+def migrate_legacy_collections(store: PriceObservationStore, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Copy the legacy collections into the observation collection without stopping writers
+
+    Documents are read in _id order and the last migrated _id of each
+    collection is checkpointed after every batch, so an interrupted run
+    resumes where it stopped. Existing observations are never overwritten:
+    anything dual-written meanwhile is newer than the legacy copy.
+
+    Args:
+        store: Target observation store
+        batch_size: Legacy documents converted per bulk write
+
+    Returns:
+        dict: Observations inserted per source collection
+    """
+    checkpoints = store.db[MIGRATION_COLLECTION]
+    inserted = {}
+    for commodity, collection_name in _legacy_sources():
+        state = checkpoints.find_one({'_id': collection_name}) or {}
+        query = {'_id': {'$gt': state['last_id']}} if state.get('last_id') is not None else {}
+        inserted[collection_name] = 0
+
+        while True:
+            batch = list(
+                store.db[collection_name].find(query, {'query_text': 0}).sort('_id', ASCENDING).limit(batch_size)
+            )
+            if not batch:
+                break
+            inserted[collection_name] += store.write_documents(commodity, batch, collection_name, overwrite=False)
+            query = {'_id': {'$gt': batch[-1]['_id']}}
+            checkpoints.update_one(
+                {'_id': collection_name},
+                {
+                    '$set': {'last_id': batch[-1]['_id'], 'updated_at': datetime.utcnow()},
+                    '$inc': {'documents': len(batch)},
+                },
+                upsert=True,
+            )
+        print(f"Migrated {collection_name}: {inserted[collection_name]} observations")
+    return inserted
+
+
+def migration_status(store: PriceObservationStore) -> Dict[str, Dict]:
+    """
+    Report migration progress per legacy collection
+
+    Returns:
+        dict: {collection: {'migrated', 'remaining', 'updated_at'}} plus the
+        observation count per commodity under 'observations'
+    """
+    checkpoints = store.db[MIGRATION_COLLECTION]
+    status = {}
+    for _, collection_name in _legacy_sources():
+        state = checkpoints.find_one({'_id': collection_name}) or {}
+        query = {'_id': {'$gt': state['last_id']}} if state.get('last_id') is not None else {}
+        status[collection_name] = {
+            'migrated': state.get('documents', 0),
+            'remaining': store.db[collection_name].count_documents(query),
+            'updated_at': state.get('updated_at'),
+        }
+    status['observations'] = {
+        commodity: store.collection.count_documents({'commodity': commodity}) for commodity in COMMODITIES
+    }
+    return status
+
+
+def main():
+    """Command line entry point for migration and status"""
+    parser = argparse.ArgumentParser(description="Unified price observations")
+    parser.add_argument('command', choices=['migrate', 'status'])
+    parser.add_argument('--connection-string', default=None)
+    parser.add_argument('--db-name', default='egg_price_data')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    store = PriceObservationStore(args.connection_string, args.db_name)
+    if args.command == 'migrate':
+        inserted = migrate_legacy_collections(store, args.batch_size)
+        print(f"Migration complete: {sum(inserted.values())} observations inserted")
+    else:
+        status = migration_status(store)
+        observations = status.pop('observations')
+        for collection_name, state in status.items():
+            print(f"{collection_name}: {state['migrated']} migrated, {state['remaining']} remaining "
+                  f"(last batch: {state['updated_at'] or 'never'})")
+        for commodity, count in observations.items():
+            print(f"{commodity.upper()}: {count} observations")
+
+
+if __name__ == "__main__":
+    main()
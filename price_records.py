@@ -0,0 +1,441 @@
+"""
+Long-Format Price Records
+=========================
+
+Converts the per-commodity document shapes written by the scrapers into flat
+price records, and back again:
+
+    {'commodity': 'egg', 'city_key': 'mumbai', 'variety': 'single_egg',
+     'date': datetime(2024, 5, 1), 'price': 6.5, 'scraped_at': datetime(...)}
+
+Legacy shapes understood here:
+    egg_prices           city, rates {name: {price, quantity}} or {name: price}, date (datetime)
+                         or (compact) city, unit_price, packs {name: price}, missing_packs [name], date (datetime)
+    copra_prices         city, min_price, avg_price, max_price, price_date (datetime)
+    chicken_prices_pw    city, boneless ... skinless, date_of_price ('%Y-%m-%d'), price_date (datetime),
+                         date_of_scraping
+    chicken_prices_linux data {variety name: {city: price}}, date ('%Y-%m-%d'), price_date (datetime), timestamp
+
+Chicken documents written before price_date was added only carry the string
+dates; `python price_storage.py migrate-chicken-dates` backfills them.
+
+The variety of a record is always the field (or rate) name used by the legacy
+document, so records can be turned back into the documents the API returns.
+"""
+
+from datetime import date as date_type, datetime
+from typing import Dict, Iterable, List, Optional
+
+
+COMMODITIES = ('egg', 'copra', 'chicken')
+
+# Legacy collection and date field for each commodity
+LEGACY_COLLECTIONS = {
+    'egg': 'egg_prices',
+    'copra': 'copra_prices',
+    'chicken': 'chicken_prices_pw',
+}
+# (all datetimes; chicken also keeps its '%Y-%m-%d' date_of_price string for display)
+LEGACY_DATE_FIELDS = {
+    'egg': 'date',
+    'copra': 'price_date',
+    'chicken': 'price_date',
+}
+CHICKEN_LINUX_COLLECTION = 'chicken_prices_linux'
+
+# Varieties (legacy field names) for each commodity
+EGG_RATE_QUANTITIES = {'single_egg': 1, 'tray': 30, 'hundred_eggs': 100, 'box': 210}
+COPRA_FIELDS = ['min_price', 'avg_price', 'max_price']
+CHICKEN_VARIETY_FIELDS = {
+    'Boneless Chicken': 'boneless',
+    'Chicken': 'chicken',
+    'Chicken Liver': 'chicken_liver',
+    'Country Chicken': 'country',
+    'Live Chicken': 'live',
+    'Skinless Chicken': 'skinless',
+}
+VARIETIES = {
+    'egg': list(EGG_RATE_QUANTITIES),
+    'copra': COPRA_FIELDS,
+    'chicken': list(CHICKEN_VARIETY_FIELDS.values()),
+}
+
+# Spellings that refer to the same city (chicken stores Bangalore under both names)
+CITY_ALIASES = {
+    'bangalore': 'bengaluru',
+}
+
+
+def city_key(city: str) -> str:
+    """
+    Normalize a city name to the key used by the long-format stores
+
+    Args:
+        city: City name in any casing ('Bangalore', 'navi mumbai', 'navi-mumbai')
+
+    Returns:
+        str: Lowercase, hyphenated, alias-resolved key ('bengaluru', 'navi-mumbai')
+    """
+    key = '-'.join(str(city).strip().lower().split())
+    return CITY_ALIASES.get(key, key)
+
+
+def to_price_date(value) -> Optional[datetime]:
+    """
+    Convert any stored date representation to a midnight datetime
+
+    Args:
+        value: datetime, date or '%Y-%m-%d' string
+
+    Returns:
+        datetime: The day at 00:00, or None if the value cannot be parsed
+    """
+    if isinstance(value, datetime):
+        return datetime.combine(value.date(), datetime.min.time())
+    if isinstance(value, date_type):
+        return datetime.combine(value, datetime.min.time())
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value[:10], '%Y-%m-%d')
+        except ValueError:
+            return None
+    return None
+
+
+def document_date_key(commodity: str, document: Dict) -> str:
+    """
+    Sortable string form of a document's price date (its keyset position, in ISO format)
+    """
+    value = document.get(LEGACY_DATE_FIELDS[commodity])
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def compact_egg_rates(rates: Dict):
+    """
+    Split egg rates into the single-egg price and the pack prices that are not derivable from it
+
+    Args:
+        rates: {name: {'price', 'quantity'}} or {name: price}
+
+    Returns:
+        tuple: (unit_price or None,
+                {name: price} for packs priced differently from unit_price * quantity,
+                [name] of packs that were not priced, so they are not derived when reading)
+    """
+    prices = {
+        name: rate.get('price') if isinstance(rate, dict) else rate
+        for name, rate in (rates or {}).items()
+    }
+    unit_price = prices.get('single_egg')
+    packs = {}
+    missing = []
+    for name, quantity in EGG_RATE_QUANTITIES.items():
+        price = prices.get(name)
+        if name == 'single_egg':
+            continue
+        if price is None:
+            missing.append(name)
+        elif unit_price is None or abs(price - unit_price * quantity) > 0.005:
+            packs[name] = price
+    return unit_price, packs, missing
+
+
+def expand_egg_rates(unit_price: Optional[float], packs: Optional[Dict] = None,
+                     missing: Optional[List[str]] = None) -> Dict:
+    """
+    Rebuild the four {'price', 'quantity'} rates from a unit price and observed pack prices
+
+    Packs listed in missing were not priced by the scrape and stay None;
+    every other pack without its own price is unit_price * quantity.
+    """
+    packs = packs or {}
+    missing = missing or ()
+    rates = {}
+    for name, quantity in EGG_RATE_QUANTITIES.items():
+        if name in packs:
+            price = packs[name]
+        elif unit_price is not None and name not in missing:
+            price = round(unit_price * quantity, 2)
+        else:
+            price = None
+        rates[name] = {'price': price, 'quantity': quantity}
+    return rates
+
+
+def compact_egg_document(doc: Dict) -> Dict:
+    """
+    Convert an egg document to the compact format (no derived rates, no query_text)
+
+    Compact documents are returned unchanged.
+    """
+    if 'rates' not in doc:
+        return doc
+    compact = {key: value for key, value in doc.items() if key not in ('rates', 'query_text')}
+    compact['unit_price'], packs, missing = compact_egg_rates(doc['rates'])
+    if packs:
+        compact['packs'] = packs
+    if missing:
+        compact['missing_packs'] = missing
+    return compact
+
+
+def expand_egg_document(doc: Dict) -> Dict:
+    """Add the full 'rates' to a compact egg document (in place); legacy documents are returned unchanged"""
+    if 'rates' not in doc and 'unit_price' in doc:
+        doc['rates'] = expand_egg_rates(doc['unit_price'], doc.get('packs'), doc.get('missing_packs'))
+    return doc
+
+
+def _record(commodity, city, variety, day, price, scraped_at=None):
+    return {
+        'commodity': commodity,
+        'city_key': city_key(city),
+        'variety': variety,
+        'date': day,
+        'price': float(price),
+        'scraped_at': scraped_at,
+    }
+
+
+def egg_document_to_records(doc: Dict) -> List[Dict]:
+    """Convert an egg_prices document to price records"""
+    day = to_price_date(doc.get('date'))
+    if day is None or not doc.get('city'):
+        return []
+    if 'rates' not in doc and 'unit_price' in doc:
+        doc = expand_egg_document(dict(doc))
+    records = []
+    for variety, rate in (doc.get('rates') or {}).items():
+        price = rate.get('price') if isinstance(rate, dict) else rate
+        if price is not None:
+            records.append(_record('egg', doc['city'], variety, day, price, doc.get('timestamp')))
+    return records
+
+
+def copra_document_to_records(doc: Dict) -> List[Dict]:
+    """Convert a copra_prices document to price records"""
+    day = to_price_date(doc.get('price_date'))
+    if day is None or not doc.get('city'):
+        return []
+    return [
+        _record('copra', doc['city'], field, day, doc[field], doc.get('timestamp'))
+        for field in COPRA_FIELDS
+        if doc.get(field) is not None
+    ]
+
+
+def chicken_document_to_records(doc: Dict) -> List[Dict]:
+    """Convert a chicken_prices_pw (one row per city) or chicken_prices_linux (one blob per run) document"""
+    if 'data' in doc and isinstance(doc['data'], dict):
+        day = to_price_date(doc.get('date') or doc.get('timestamp'))
+        if day is None:
+            return []
+        records = []
+        for variety_name, city_prices in doc['data'].items():
+            variety = CHICKEN_VARIETY_FIELDS.get(variety_name)
+            if variety is None or not isinstance(city_prices, dict):
+                continue
+            for city, price in city_prices.items():
+                if price is not None:
+                    records.append(_record('chicken', city, variety, day, price, doc.get('timestamp')))
+        return records
+
+    day = to_price_date(doc.get('date_of_price'))
+    if day is None or not doc.get('city'):
+        return []
+    return [
+        _record('chicken', doc['city'], field, day, doc[field], doc.get('date_of_scraping'))
+        for field in VARIETIES['chicken']
+        if doc.get(field) is not None
+    ]
+
+
+_CONVERTERS = {
+    'egg': egg_document_to_records,
+    'copra': copra_document_to_records,
+    'chicken': chicken_document_to_records,
+}
+
+
+def document_to_records(commodity: str, doc: Dict) -> List[Dict]:
+    """
+    Convert a legacy document of any commodity to price records
+
+    Args:
+        commodity: 'egg', 'copra' or 'chicken'
+        doc: Document as stored in the commodity's legacy collection
+
+    Returns:
+        list: Price records (empty if the document has no usable prices)
+    """
+    return _CONVERTERS[commodity](doc)
+
+
+def record_key(record: Dict) -> tuple:
+    """Identity of a record: one price per commodity, city, variety and day"""
+    return (record['commodity'], record['city_key'], record['variety'], record['date'])
+
+
+def dedupe_records(records: Iterable[Dict]) -> List[Dict]:
+    """Drop duplicate records (e.g. Bangalore/Bengaluru copies), keeping the last one seen"""
+    unique = {}
+    for record in records:
+        unique[record_key(record)] = record
+    return list(unique.values())
+
+
+def records_to_document(commodity: str, city: str, day: datetime, prices: Dict[str, float],
+                        scraped_at: Optional[datetime] = None) -> Dict:
+    """
+    Build the legacy-shaped document for one city and day from variety prices
+
+    Args:
+        commodity: 'egg', 'copra' or 'chicken'
+        city: City key
+        day: Price date
+        prices: {variety: price}
+        scraped_at: When the prices were scraped, if known
+
+    Returns:
+        dict: Document in the shape the commodity's legacy collection uses
+    """
+    if commodity == 'egg':
+        return {
+            'city': city,
+            'commodity': 'egg',
+            'rates': {
+                name: {'price': prices.get(name), 'quantity': quantity}
+                for name, quantity in EGG_RATE_QUANTITIES.items()
+            },
+            'date': day,
+            'timestamp': scraped_at or day,
+        }
+    if commodity == 'copra':
+        document = {'city': city, 'commodity': 'copra'}
+        document.update({field: prices.get(field) for field in COPRA_FIELDS})
+        document['price_date'] = day
+        document['timestamp'] = scraped_at or day
+        return document
+    document = {'city': city.title()}
+    document.update({field: prices.get(field) for field in VARIETIES['chicken']})
+    document['date_of_price'] = day.strftime('%Y-%m-%d')
+    document['price_date'] = day
+    document['date_of_scraping'] = scraped_at or day
+    return document
+
+
+def with_chicken_price_date(document: Dict) -> Dict:
+    """
+    Add the typed price_date to a chicken document that only has its string date
+
+    Args:
+        document: chicken_prices_pw (date_of_price) or chicken_prices_linux (date) document
+
+    Returns:
+        dict: The same document, changed in place
+    """
+    if document.get('price_date') is None:
+        day = to_price_date(document.get('date_of_price') or document.get('date'))
+        if day is not None:
+            document['price_date'] = day
+    return document
+
+
+def group_records_by_day(records: Iterable[Dict]) -> List[Dict]:
+    """
+    Group records into one row per (city, day)
+
+    Returns:
+        list: [{'commodity', 'city_key', 'date', 'prices': {variety: price}, 'scraped_at'}]
+        in the order the (city, day) pairs were first seen
+    """
+    rows = {}
+    for record in records:
+        key = (record['commodity'], record['city_key'], record['date'])
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = {
+                'commodity': record['commodity'],
+                'city_key': record['city_key'],
+                'date': record['date'],
+                'prices': {},
+                'scraped_at': record.get('scraped_at'),
+            }
+        row['prices'][record['variety']] = record['price']
+        if record.get('scraped_at') and (row['scraped_at'] is None or record['scraped_at'] > row['scraped_at']):
+            row['scraped_at'] = record['scraped_at']
+    return list(rows.values())
+
+
+def records_to_documents(records: Iterable[Dict]) -> List[Dict]:
+    """Turn records back into legacy-shaped documents, one per (city, day)"""
+    return [
+        records_to_document(row['commodity'], row['city_key'], row['date'], row['prices'], row['scraped_at'])
+        for row in group_records_by_day(records)
+    ]
+
+
+def extract_egg_rates(response):
+    """
+    Extract the four types of rates from agent response
+    
+    Args:
+        response (str|dict): Price data in string or dictionary format
+        
+    Returns:
+        dict: Standardized rates with numeric values
+    """
+    rates = {
+        'single_egg': {'price': None, 'quantity': 1},
+        'tray': {'price': None, 'quantity': 30},
+        'hundred_eggs': {'price': None, 'quantity': 100},
+        'box': {'price': None, 'quantity': 210}
+    }
+    
+    try:
+        if isinstance(response, str):
+            lines = response.split('\n')
+        elif isinstance(response, dict):
+            # If response is already a dictionary, process it directly
+            lines = [f"- {k}: {v}" for k, v in response.items()]
+        else:
+            return rates
+
+        for line in lines:
+            if ':' in line and (line.strip().startswith('-') or isinstance(response, dict)):
+                parts = line.strip().lstrip('- ').split(':', 1)
+                if len(parts) == 2:
+                    key = parts[0].strip().lower()
+                    value = parts[1].strip()
+                    
+                    try:
+                        # Extract numeric value, handling different formats
+                        if '₹' in value:
+                            # Remove rupee symbol and any whitespace
+                            price_str = value.replace('₹', '').strip()
+                            # Remove any other non-numeric characters except decimal point
+                            price_str = ''.join(c for c in price_str if c.isdigit() or c == '.')
+                            # Ensure the string is not empty and doesn't end with a decimal point
+                            if price_str and not price_str.endswith('.'):
+                                try:
+                                    price = float(price_str)
+                                    # Map to standardized rate keys with price and quantity
+                                    if any(term in key for term in ['single', '1 egg']):
+                                        rates['single_egg']['price'] = price
+                                    elif any(term in key for term in ['tray', '30']):
+                                        rates['tray']['price'] = price
+                                    elif '100' in key:
+                                        rates['hundred_eggs']['price'] = price
+                                    elif any(term in key for term in ['box', '210']):
+                                        rates['box']['price'] = price
+                                except ValueError:
+                                    # Skip invalid numeric values
+                                    continue
+                    except ValueError:
+                        continue
+        
+        return rates
+        
+    except Exception as e:
+        print(f"Error extracting rates: {e}")
+        return rates
@@ -0,0 +1,284 @@
+"""
+Tiered Price Retention
+======================
+
+Keeps the raw price collections (or the SQLite observation table) limited to
+recent history. Raw prices older than the retention age are moved into
+compressed archive blocks, one per (commodity, city_key, month):
+
+    {'commodity': 'egg', 'city_key': 'mumbai', 'month': datetime(2023, 1, 1),
+     'count': 124, 'payload': zlib(JSON [[variety, 'YYYY-MM-DD', price], ...]),
+     'archived_at': datetime(...)}
+
+Rollups (see price_rollups.py) and the latest prices stay hot. Each
+commodity's archive horizon (the first day still held raw) is recorded, and
+the range/historical reads below fetch archived blocks only when a query
+starts before it.
+
+Configuration:
+    PRICE_RETENTION_DAYS    Age after which raw prices are archived (default: 365)
+
+Usage:
+    python price_retention.py archive [--days 365] [--commodity egg]
+"""
+
+import argparse
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from price_records import COMMODITIES, city_key, document_date_key, records_to_documents, to_price_date
+
+
+DEFAULT_RETENTION_DAYS = 365
+HISTORY_START = datetime(2000, 1, 1)
+
+
+def retention_cutoff(days: Optional[int] = None, today: Optional[datetime] = None) -> datetime:
+    """
+    First day kept raw: the start of the month containing (today - retention age)
+
+    Whole months are archived so every archive block is complete.
+    """
+    if days is None:
+        days = int(os.getenv('PRICE_RETENTION_DAYS', DEFAULT_RETENTION_DAYS))
+    day = to_price_date(today or datetime.now()) - timedelta(days=days)
+    return day.replace(day=1)
+
+
+def pack_block(commodity: str, city: str, month: datetime, records: List[Dict]) -> Dict:
+    """Compress one city's records for one month into an archive block"""
+    rows = sorted(
+        [r['variety'], r['date'].strftime('%Y-%m-%d'), r['price']]
+        for r in records
+    )
+    return {
+        'commodity': commodity,
+        'city_key': city,
+        'month': month,
+        'count': len(rows),
+        'payload': zlib.compress(json.dumps(rows, separators=(',', ':')).encode('utf-8'), 9),
+        'archived_at': datetime.utcnow(),
+    }
+
+
+def unpack_block(block: Dict) -> List[Dict]:
+    """Expand an archive block back into price records"""
+    rows = json.loads(zlib.decompress(block['payload']).decode('utf-8'))
+    return [
+        {
+            'commodity': block['commodity'],
+            'city_key': block['city_key'],
+            'variety': variety,
+            'date': datetime.strptime(day, '%Y-%m-%d'),
+            'price': price,
+            'scraped_at': None,
+        }
+        for variety, day, price in rows
+    ]
+
+
+def archive_commodity(storage, commodity: str, cutoff: datetime) -> Dict[str, int]:
+    """
+    Move one commodity's raw prices older than cutoff into archive blocks
+
+    Blocks that already exist for a month are merged with the new records, so
+    re-running (or archiving a late backfill) never loses archived prices.
+    Only the days that were packed into blocks are deleted; raw rows that
+    yield no records (unparseable rates, all-None chicken prices) stay raw.
+
+    Args:
+        storage (PriceStorage): Backend holding the raw prices and the archive
+        cutoff: First day to keep raw (month-aligned)
+
+    Returns:
+        dict: Cities processed, records archived and raw rows deleted
+    """
+    report = {'cities': 0, 'records': 0, 'deleted': 0}
+    complete = True
+    last_archived_day = cutoff - timedelta(days=1)
+    # Includes cities whose raw prices were all archived, so their blocks are merged, not replaced
+    for city in storage.get_city_keys(commodity):
+        records = storage.get_records(commodity, city, HISTORY_START, last_archived_day)
+        if not records:
+            continue
+
+        months = {}
+        for record in records:
+            months.setdefault(record['date'].replace(day=1), []).append(record)
+        existing = {
+            block['month']: unpack_block(block)
+            for block in storage.get_archive_blocks(commodity, city, min(months), last_archived_day)
+        }
+        blocks = []
+        for month, month_records in months.items():
+            merged = {(r['variety'], r['date']): r for r in existing.get(month, []) + month_records}
+            blocks.append(pack_block(commodity, city, month, list(merged.values())))
+
+        written = storage.store_archive_blocks(blocks)
+        if written < len(blocks):
+            print(f"⚠️ Only {written} of {len(blocks)} archive blocks written for {commodity} {city}; keeping raw prices")
+            complete = False
+            continue
+        archived_days = {record['date'] for record in records}
+        report['deleted'] += storage.delete_prices_on_days(commodity, city, archived_days)
+        report['records'] += len(records)
+        report['cities'] += 1
+
+    # Blocks whose raw prices were kept would be read twice once the horizon moves past them
+    if complete and cutoff > (storage.get_archive_horizon(commodity) or datetime.min):
+        storage.set_archive_horizon(commodity, cutoff)
+    if report['records']:
+        # Archived days are read back without their scrape times, so cached responses are stale
+        storage.bump_data_version(commodity)
+    return report
+
+
+def _archived_records(storage, commodity: str, city: str, start: datetime, end: datetime) -> List[Dict]:
+    """Archived records in a range, or nothing if the range starts at or after the archive horizon"""
+    horizon = storage.get_archive_horizon(commodity)
+    if not horizon or start >= horizon:
+        return []
+    end = min(end, horizon - timedelta(days=1))
+    records = []
+    for block in storage.get_archive_blocks(commodity, city, start, end):
+        records.extend(r for r in unpack_block(block) if start <= r['date'] <= end)
+    records.sort(key=lambda r: (r['date'], r['variety']))
+    return records
+
+
+def read_records(storage, commodity: str, city: str, start_date, end_date) -> List[Dict]:
+    """
+    Same as storage.get_records, reading through to the archive
+
+    The archive is only consulted when the range starts before the commodity's
+    archive horizon.
+    """
+    start, end = to_price_date(start_date), to_price_date(end_date)
+    return _archived_records(storage, commodity, city, start, end) + storage.get_records(commodity, city, start, end)
+
+
+def read_records_for_cities(storage, commodity: str, cities: Optional[List[str]], start_date, end_date) -> List[Dict]:
+    """
+    Same as storage.get_records_for_cities, reading through to the archive
+
+    Archive blocks are stored per city, so a range reaching into the archive
+    reads them city by city (every city with prices when cities is None).
+    """
+    start, end = to_price_date(start_date), to_price_date(end_date)
+    archived = []
+    horizon = storage.get_archive_horizon(commodity)
+    if horizon and start < horizon:
+        archived_cities = cities
+        if archived_cities is None:
+            archived_cities = storage.get_city_keys(commodity)
+        for city in dict.fromkeys(city_key(city) for city in archived_cities):
+            archived.extend(_archived_records(storage, commodity, city, start, end))
+    return archived + storage.get_records_for_cities(commodity, cities, start, end)
+
+
+def read_record_batches(storage, commodity: str, cities: Optional[List[str]] = None, start_date=None, end_date=None,
+                        batch_size: int = 10000) -> Iterator[List[Dict]]:
+    """
+    Same as storage.iter_records, reading through to the archive
+
+    Archived records come first, one archive block at a time, so memory stays
+    bounded by one block plus one batch.
+    """
+    start = to_price_date(start_date) if start_date is not None else HISTORY_START
+    end = to_price_date(end_date) if end_date is not None else None
+    horizon = storage.get_archive_horizon(commodity)
+    if horizon and start < horizon:
+        archived_end = horizon - timedelta(days=1) if end is None else min(end, horizon - timedelta(days=1))
+        archived_cities = cities
+        if archived_cities is None:
+            archived_cities = storage.get_city_keys(commodity)
+        batch = []
+        for city in dict.fromkeys(city_key(city) for city in archived_cities):
+            for block in storage.get_archive_blocks(commodity, city, start, archived_end):
+                batch.extend(r for r in unpack_block(block) if start <= r['date'] <= archived_end)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    yield from storage.iter_records(commodity, cities, start_date, end_date, batch_size)
+
+
+def read_prices_by_date_range(storage, commodity: str, city: str, start_date, end_date) -> List[Dict]:
+    """
+    Same as storage.get_prices_by_date_range, reading through to the archive
+
+    Archived days come back as documents rebuilt from records (see
+    price_records.records_to_document), ahead of the raw documents.
+    """
+    archived = _archived_records(storage, commodity, city, to_price_date(start_date), to_price_date(end_date))
+    return records_to_documents(archived) + storage.get_prices_by_date_range(commodity, city, start_date, end_date)
+
+
+def read_prices_on_date(storage, commodity: str, city: str, date) -> Optional[Dict]:
+    """Same as storage.get_prices_on_date, reading through to the archive"""
+    day = to_price_date(date)
+    archived = _archived_records(storage, commodity, city, day, day)
+    if archived:
+        return records_to_documents(archived)[0]
+    return storage.get_prices_on_date(commodity, city, date)
+
+
+def read_prices_page(storage, commodity: str, city: str, start_date, end_date,
+                     after: Optional[list] = None, limit: int = 500) -> Tuple[List[Dict], Optional[list]]:
+    """
+    Same as storage.get_prices_page, reading through to the archive
+
+    Pages walk the archived days first and then the raw documents, the same
+    order as read_prices_by_date_range. Positions are tagged with their tier:
+    ['archive', date_key, ''] or ['raw', date_key, tie_breaker].
+    """
+    documents = []
+    if not after or after[0] == 'archive':
+        start = to_price_date(start_date)
+        if after:
+            start = max(start, to_price_date(after[1]))
+        archived = records_to_documents(
+            _archived_records(storage, commodity, city, start, to_price_date(end_date))
+        )
+        if after:
+            archived = [d for d in archived if document_date_key(commodity, d) > after[1]]
+        if len(archived) >= limit:
+            documents = archived[:limit]
+            return documents, ['archive', document_date_key(commodity, documents[-1]), '']
+        documents = archived
+        after = None
+
+    raw, position = storage.get_prices_page(
+        commodity, city, start_date, end_date, after[1:] if after else None, limit - len(documents)
+    )
+    documents.extend(raw)
+    return documents, (['raw'] + position if position else None)
+
+
+def main():
+    """Command line entry point for archiving"""
+    from price_storage import get_price_storage
+
+    parser = argparse.ArgumentParser(description="Tiered price retention")
+    parser.add_argument('command', choices=['archive'])
+    parser.add_argument('--days', type=int, default=None,
+                        help=f"Retention age in days (default: PRICE_RETENTION_DAYS or {DEFAULT_RETENTION_DAYS})")
+    parser.add_argument('--commodity', choices=COMMODITIES, default=None)
+    args = parser.parse_args()
+
+    storage = get_price_storage()
+    cutoff = retention_cutoff(args.days)
+    print(f"Archiving raw prices before {cutoff.strftime('%Y-%m-%d')}")
+    for commodity in ([args.commodity] if args.commodity else COMMODITIES):
+        report = archive_commodity(storage, commodity, cutoff)
+        print(f"{commodity.upper()}: {report['records']} records from {report['cities']} cities archived, "
+              f"{report['deleted']} raw rows deleted")
+    storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Price Rollups
+=============
+
+Pre-aggregated min/max/avg/first/last prices per (commodity, city, variety)
+for day, ISO week and month buckets:
+
+    {'commodity': 'egg', 'city_key': 'mumbai', 'variety': 'single_egg',
+     'period': 'week', 'bucket': datetime(2024, 4, 29), 'label': '2024-W18',
+     'min': 6.2, 'max': 6.6, 'avg': 6.4, 'first': 6.2, 'last': 6.6, 'count': 7,
+     'first_date': datetime(2024, 4, 29), 'last_date': datetime(2024, 5, 5)}
+
+Rollups are maintained incrementally: after every storage write, only the
+buckets containing the written (city, day) pairs are recomputed from raw
+prices and merged into the rollup store (replace when the bucket exists,
+insert otherwise), the same semantics as a $merge stage.
+
+Usage:
+    python price_rollups.py rebuild [--commodity egg]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from price_records import COMMODITIES, city_key, to_price_date
+from price_retention import HISTORY_START, read_records
+
+
+PERIODS = ('day', 'week', 'month')
+
+
+def bucket_start(period: str, day: datetime) -> datetime:
+    """First day of the day / ISO week (Monday) / month bucket containing a day"""
+    day = to_price_date(day)
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    raise ValueError(f"Unknown rollup period: {period}")
+
+
+def bucket_end(period: str, start: datetime) -> datetime:
+    """Last day of the bucket starting at start"""
+    if period == 'day':
+        return start
+    if period == 'week':
+        return start + timedelta(days=6)
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def bucket_label(period: str, start: datetime) -> str:
+    """Human-readable bucket name ('2024-05-01', '2024-W18', '2024-05')"""
+    if period == 'day':
+        return start.strftime('%Y-%m-%d')
+    if period == 'week':
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}"
+    return start.strftime('%Y-%m')
+
+
+def compute_rollups(records: Iterable[Dict], periods: Iterable[str] = PERIODS) -> List[Dict]:
+    """
+    Aggregate price records into rollup buckets
+
+    Args:
+        records: Long-format price records (see price_records.py)
+        periods: Bucket sizes to compute
+
+    Returns:
+        list: One rollup document per (commodity, city, variety, period, bucket)
+    """
+    series = {}
+    for record in records:
+        for period in periods:
+            key = (record['commodity'], record['city_key'], record['variety'], period,
+                   bucket_start(period, record['date']))
+            series.setdefault(key, {})[to_price_date(record['date'])] = record['price']
+
+    rollups = []
+    now = datetime.utcnow()
+    for (commodity, city, variety, period, start), prices in series.items():
+        days = sorted(prices)
+        values = [prices[day] for day in days]
+        rollups.append({
+            'commodity': commodity,
+            'city_key': city,
+            'variety': variety,
+            'period': period,
+            'bucket': start,
+            'label': bucket_label(period, start),
+            'min': min(values),
+            'max': max(values),
+            'avg': round(sum(values) / len(values), 4),
+            'first': values[0],
+            'last': values[-1],
+            'count': len(values),
+            'first_date': days[0],
+            'last_date': days[-1],
+            'updated_at': now,
+        })
+    return rollups
+
+
+class PriceRollups:
+    """Keeps a storage backend's rollups in step with its raw prices"""
+
+    def __init__(self, storage):
+        """
+        Initialize the rollup stage
+
+        Args:
+            storage (PriceStorage): Backend holding both raw prices and rollups
+        """
+        self.storage = storage
+
+    def refresh(self, commodity: str, touched: Iterable[tuple]) -> int:
+        """
+        Recompute the buckets containing the given (city, day) pairs
+
+        Args:
+            commodity: 'egg', 'copra' or 'chicken'
+            touched: (city, day) pairs that were just written
+
+        Returns:
+            int: Number of rollup documents written
+        """
+        by_city = {}
+        for city, day in touched:
+            by_city.setdefault(city_key(city), set()).add(to_price_date(day))
+
+        written = 0
+        for city, days in by_city.items():
+            affected = {(period, bucket_start(period, day)) for day in days for period in PERIODS}
+            start = min(bucket for _, bucket in affected)
+            end = max(bucket_end(period, bucket) for period, bucket in affected)
+            # Read through the archive so buckets reaching into archived months stay complete
+            records = read_records(self.storage, commodity, city, start, end)
+            rollups = [
+                rollup for rollup in compute_rollups(records)
+                if (rollup['period'], rollup['bucket']) in affected
+            ]
+            written += self.storage.store_rollups(rollups)
+        return written
+
+    def on_write(self, commodity: str, records: List[Dict]):
+        """Storage write listener: refresh the buckets the new records fall into"""
+        try:
+            self.refresh(commodity, {(r['city_key'], r['date']) for r in records})
+        except Exception as e:
+            print(f"⚠️ Error updating {commodity} rollups: {e}")
+
+    def rebuild(self, commodity: str, until: Optional[datetime] = None) -> int:
+        """
+        Recompute every rollup of a commodity from the full history
+
+        Args:
+            commodity: 'egg', 'copra' or 'chicken'
+            until (datetime, optional): Last day to include (default: today)
+
+        Returns:
+            int: Number of rollup documents written
+        """
+        until = to_price_date(until or datetime.now())
+        written = 0
+        for city in self.storage.get_city_keys(commodity):
+            records = read_records(self.storage, commodity, city, HISTORY_START, until)
+            written += self.storage.store_rollups(compute_rollups(records))
+        return written
+
+
+def main():
+    """Command line entry point for rebuilding rollups"""
+    from price_storage import get_price_storage
+
+    parser = argparse.ArgumentParser(description="Price rollups")
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--commodity', choices=COMMODITIES, default=None)
+    args = parser.parse_args()
+
+    storage = get_price_storage()
+    rollups = PriceRollups(storage)
+    for commodity in ([args.commodity] if args.commodity else COMMODITIES):
+        print(f"{commodity.upper()}: {rollups.rebuild(commodity)} rollup documents written")
+    storage.close()
+
+
+if __name__ == "__main__":
+    main()
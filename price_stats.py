@@ -0,0 +1,146 @@
+"""
+Price Statistics
+================
+
+Rolling and summary statistics per (city, variety) price series, computed
+server-side so clients do not have to download raw ranges:
+
+    rolling_mean / rolling_min / rolling_max   over the last `window` days
+    rolling_volatility                         standard deviation of the daily
+                                               changes within the window
+    pct_change                                 change from the previous observed price
+    summary                                    min, max, mean, std, first, last,
+                                               change_pct and volatility over the range
+
+All series of a request are pivoted into one date x (city, variety) frame,
+so every statistic is a single vectorized pass over all series. Windows are
+calendar days: gaps in the scraping history shorten a window instead of
+stretching it. The read starts `window` days before the requested range so
+the first rolling values are complete.
+
+Usage:
+    from price_stats import compute_price_stats
+
+    stats = compute_price_stats(records, start_date, end_date, window=7)
+"""
+
+import math
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from price_records import to_price_date
+
+
+DEFAULT_WINDOW = 7
+
+
+def lookback_start(start_date, window: int = DEFAULT_WINDOW):
+    """First day to read so the rolling window is full at start_date"""
+    return to_price_date(start_date) - timedelta(days=window)
+
+
+def _values(series) -> List[Optional[float]]:
+    """Column values for JSON: rounded, with NaN as None"""
+    rounded = series.round(4).astype(object)
+    return rounded.where(series.notna(), None).tolist()
+
+
+def _number(value) -> Optional[float]:
+    return None if value is None or math.isnan(value) else round(float(value), 4)
+
+
+def compute_price_stats(records: List[Dict], start_date, end_date, window: int = DEFAULT_WINDOW,
+                        varieties: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Compute rolling and summary statistics per city and variety
+
+    Args:
+        records: Long-format price records, including the lookback before start_date
+        start_date, end_date: Range to report (inclusive)
+        window: Rolling window in days
+        varieties (list, optional): Only these varieties
+
+    Returns:
+        dict: {city_key: {'dates': ['YYYY-MM-DD', ...],
+                          'series': {variety: {'price': [...], 'rolling_mean': [...], ...}},
+                          'summary': {variety: {'min', 'max', 'mean', 'std', 'first', 'last',
+                                                'change_pct', 'volatility', 'count'}}}}
+    """
+    if varieties:
+        wanted = set(varieties)
+        records = [r for r in records if r['variety'] in wanted]
+    if not records:
+        return {}
+
+    # Imported here so the API does not pay for pandas at startup
+    import pandas as pd
+
+    frame = pd.DataFrame.from_records(
+        [(r['city_key'], r['variety'], r['date'], r['price']) for r in records],
+        columns=['city_key', 'variety', 'date', 'price'],
+    )
+    # One column per (city, variety); duplicate days keep the last price seen
+    wide = frame.pivot_table(index='date', columns=['city_key', 'variety'], values='price', aggfunc='last') \
+        .sort_index().astype(float)
+
+    # Change from each series' previous observed price, not from the previous row
+    previous = wide.ffill().shift(1).replace(0, float('nan'))
+    pct_change = (wide / previous - 1).where(wide.notna())
+
+    rolling = wide.rolling(f'{window}D', min_periods=1)
+    columns = {
+        'price': wide,
+        'rolling_mean': rolling.mean(),
+        'rolling_min': rolling.min(),
+        'rolling_max': rolling.max(),
+        'rolling_volatility': pct_change.rolling(f'{window}D', min_periods=2).std(),
+        'pct_change': pct_change,
+    }
+
+    start, end = to_price_date(start_date), to_price_date(end_date)
+    in_range = (wide.index >= start) & (wide.index <= end)
+    columns = {name: values[in_range] for name, values in columns.items()}
+    prices = columns['price']
+
+    first = prices.bfill().iloc[0] if len(prices) else None
+    last = prices.ffill().iloc[-1] if len(prices) else None
+    summary = pd.DataFrame({
+        'min': prices.min(),
+        'max': prices.max(),
+        'mean': prices.mean(),
+        'std': prices.std(),
+        'first': first,
+        'last': last,
+        'change_pct': last / first.replace(0, float('nan')) - 1 if len(prices) else None,
+        'volatility': columns['pct_change'].std(),
+        'count': prices.count(),
+    })
+
+    stats = {}
+    for city in prices.columns.get_level_values(0).unique():
+        city_prices = prices[city]
+        # Dates on which this city has any price
+        has_price = city_prices.notna().any(axis=1)
+        if not has_price.any():
+            continue
+        dates = city_prices.index[has_price]
+        series = {}
+        for variety in city_prices.columns:
+            if not city_prices[variety].notna().any():
+                continue
+            series[variety] = {
+                name: _values(values[(city, variety)][has_price])
+                for name, values in columns.items()
+            }
+        stats[city] = {
+            'dates': [day.strftime('%Y-%m-%d') for day in dates],
+            'series': series,
+            'summary': {
+                variety: {
+                    key: (int(value) if key == 'count' else _number(value))
+                    for key, value in summary.loc[(city, variety)].items()
+                }
+                for variety in series
+            },
+        }
+    return stats
@@ -0,0 +1,1436 @@
+"""
+Price Storage Backends
+======================
+
+One storage interface for the scrapers and the API, implemented for MongoDB
+(the existing egg_prices / copra_prices / chicken_prices_pw collections) and
+for SQLite (a single local file, no mongod needed).
+
+Reads always return documents in each commodity's legacy shape (see
+price_records.py), so callers do not care which backend is active.
+
+The MongoDB backend keeps a latest_prices collection (one document per
+commodity and city_key) current on every write, so latest-price lookups are
+indexed point reads instead of a sort/group over the full history. Rebuild it
+after writing to the legacy collections directly:
+
+    python price_storage.py rebuild-latest [--commodity egg]
+
+Egg documents are stored compactly (single-egg price plus any pack price
+that is not a plain multiple of it, and the packs the scrape did not price;
+see price_records.compact_egg_rates).
+Convert documents written in the old rates/query_text format with:
+
+    python price_storage.py compact-egg
+
+Chicken documents carry a typed price_date next to their '%Y-%m-%d'
+date_of_price string, so chicken reads use the same (city, date) index range
+scans as egg and copra. Backfill documents written before it with:
+
+    python price_storage.py migrate-chicken-dates
+
+Every write is reported to the storage's write listeners as price records;
+get_price_storage() registers the rollup stage (see price_rollups.py) so the
+affected day/week/month buckets are refreshed after each scrape, and bumps
+the commodity's data version, which API caches use to detect new data.
+
+Configuration:
+    PRICE_STORAGE_BACKEND   'mongo' (default) or 'sqlite'
+    SQLITE_DB_PATH          SQLite database file (default: commodity_prices.db)
+    PRICE_ROLLUPS           '0' disables rollup maintenance on write (default: enabled)
+    PRICE_DUAL_WRITE        '1' also writes MongoDB prices to price_observations (see price_observations.py)
+    PRICE_TIMESERIES        '1' also writes MongoDB prices to price_timeseries (see timeseries_storage.py)
+
+Usage:
+    from price_storage import get_price_storage
+
+    storage = get_price_storage()
+    storage.store_copra_prices(documents)
+    latest = storage.get_latest_prices('copra')
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from price_records import (
+    CHICKEN_LINUX_COLLECTION, CITY_ALIASES, COMMODITIES, LEGACY_COLLECTIONS, LEGACY_DATE_FIELDS,
+    VARIETIES, city_key, compact_egg_document, dedupe_records, document_date_key, document_to_records,
+    extract_egg_rates, record_key, records_to_documents, to_price_date, with_chicken_price_date,
+)
+
+
+# Fields the MongoDB reads fetch: ids and the egg search text are dropped at the
+# query level, and chicken reads only fetch what the API and the record
+# converters use
+READ_PROJECTIONS = {
+    'egg': {'_id': 0, 'query_text': 0},
+    'copra': {'_id': 0, 'query_text': 0},
+    'chicken': {
+        '_id': 0, 'city': 1, 'date_of_price': 1, 'price_date': 1, 'date_of_scraping': 1,
+        **{field: 1 for field in VARIETIES['chicken']},
+    },
+}
+LATEST_PROJECTION = {'_id': 0, 'document._id': 0, 'document.query_text': 0, 'commodity': 0, 'updated_at': 0}
+
+
+class PriceStorage:
+    """Interface shared by the MongoDB and SQLite storage backends"""
+
+    backend = None
+
+    def __init__(self):
+        self._write_listeners = []
+
+    def add_write_listener(self, listener):
+        """
+        Register a callback run after every write
+
+        Args:
+            listener (callable): Called as listener(commodity, records) with the
+                price records that were just written
+        """
+        self._write_listeners.append(listener)
+
+    def _notify_write(self, commodity: str, records: List[Dict]):
+        if not records:
+            return
+        for listener in self._write_listeners:
+            listener(commodity, records)
+
+    def store_egg_prices(self, city, price_data, date=None):
+        """
+        Store egg prices for a city, replacing any entry for the same day
+
+        Args:
+            city (str): City name
+            price_data (str|dict): Scraped price data (parsed with extract_egg_rates)
+            date (datetime.date, optional): The date for historical prices (default: now)
+
+        Returns:
+            Truthy value if stored, None if there were no valid rates
+        """
+        raise NotImplementedError
+
+    def store_copra_prices(self, documents: List[Dict]) -> int:
+        """
+        Store copra documents, skipping cities that already have prices for that day
+
+        Returns:
+            int: Number of documents stored
+        """
+        raise NotImplementedError
+
+    def store_chicken_prices(self, documents: List[Dict]) -> int:
+        """
+        Store per-city chicken documents, skipping cities that already have prices for that day
+
+        Returns:
+            int: Number of documents stored
+        """
+        raise NotImplementedError
+
+    def store_chicken_snapshot(self, document: Dict):
+        """Store one chicken scraping run ({'data': {variety: {city: price}}, 'date', ...})"""
+        raise NotImplementedError
+
+    def has_prices_for_date(self, commodity: str, date, city: Optional[str] = None) -> bool:
+        """Check whether prices exist for a day (optionally for one city)"""
+        raise NotImplementedError
+
+    def get_latest_prices(self, commodity: str, city: Optional[str] = None) -> List[Dict]:
+        """Get the newest document per city (or for one city)"""
+        raise NotImplementedError
+
+    def get_prices_on_date(self, commodity: str, city: str, date) -> Optional[Dict]:
+        """Get the document for one city and day, or None"""
+        raise NotImplementedError
+
+    def get_prices_by_date_range(self, commodity: str, city: str, start_date, end_date) -> List[Dict]:
+        """Get the documents for one city within a date range (inclusive), oldest first"""
+        raise NotImplementedError
+
+    def get_prices_page(self, commodity: str, city: str, start_date, end_date,
+                        after: Optional[list] = None, limit: int = 500) -> Tuple[List[Dict], Optional[list]]:
+        """
+        Get one keyset page of a city's documents within a date range, oldest first
+
+        Args:
+            after (list, optional): Position returned with the previous page (None for the first page)
+            limit: Most documents per page
+
+        Returns:
+            tuple: (documents, position of the last document, or None when the range is exhausted)
+        """
+        raise NotImplementedError
+
+    def get_records(self, commodity: str, city: str, start_date, end_date) -> List[Dict]:
+        """Get one city's price records within a date range (inclusive)"""
+        documents = self.get_prices_by_date_range(commodity, city, start_date, end_date)
+        return dedupe_records(r for document in documents for r in document_to_records(commodity, document))
+
+    def get_records_for_cities(self, commodity: str, cities: Optional[List[str]], start_date, end_date) -> List[Dict]:
+        """
+        Get the price records of several cities within a date range (inclusive)
+
+        Backends answer this with one query; this default reads city by city.
+
+        Args:
+            cities (list, optional): City names; None for every city with prices
+        """
+        if cities is None:
+            cities = [document['city'] for document in self.get_latest_prices(commodity)]
+        return [
+            record
+            for city in dict.fromkeys(city_key(city) for city in cities)
+            for record in self.get_records(commodity, city, start_date, end_date)
+        ]
+
+    def iter_records(self, commodity: str, cities: Optional[List[str]] = None, start_date=None, end_date=None,
+                     batch_size: int = 10000) -> Iterator[List[Dict]]:
+        """
+        Read a commodity's price records in fixed-size batches from a server-side cursor
+
+        Memory use is bounded by the batch size, whatever the size of the
+        history. Records come ordered by city and day.
+
+        Args:
+            cities (list, optional): City names; None for every city
+            start_date, end_date (optional): Inclusive day bounds; None for the whole history
+            batch_size: Records per yielded batch
+        """
+        raise NotImplementedError
+
+    def store_rollups(self, rollups: List[Dict]) -> int:
+        """
+        Insert or replace rollup documents (see price_rollups.py)
+
+        Returns:
+            int: Number of rollups written
+        """
+        raise NotImplementedError
+
+    def get_rollups(self, commodity: str, city: str, period: str,
+                    start_date=None, end_date=None, variety: Optional[str] = None) -> List[Dict]:
+        """Get one city's rollups for a period, oldest bucket first"""
+        raise NotImplementedError
+
+    def get_data_versions(self) -> Dict[str, Dict]:
+        """
+        Get the write counter of every commodity
+
+        Returns:
+            dict: {commodity: {'version': int, 'updated_at': datetime (UTC)}}; a
+            commodity that was never written is missing (version 0)
+        """
+        raise NotImplementedError
+
+    def bump_data_version(self, commodity: str) -> None:
+        """Increment a commodity's write counter (called after every write)"""
+        raise NotImplementedError
+
+    def get_city_keys(self, commodity: str) -> List[str]:
+        """Get the sorted keys of every city with raw or archived prices for a commodity"""
+        raise NotImplementedError
+
+    def store_archive_blocks(self, blocks: List[Dict]) -> int:
+        """Insert or replace compressed archive blocks (see price_retention.py)"""
+        raise NotImplementedError
+
+    def get_archive_blocks(self, commodity: str, city: str, start_date, end_date) -> List[Dict]:
+        """Get one city's archive blocks for the months overlapping a date range"""
+        raise NotImplementedError
+
+    def delete_prices_on_days(self, commodity: str, city: str, days: List) -> int:
+        """
+        Delete one city's raw prices dated on the given days
+
+        Returns:
+            int: Number of documents (MongoDB) or rows (SQLite) deleted
+        """
+        raise NotImplementedError
+
+    def get_archive_horizon(self, commodity: str) -> Optional[datetime]:
+        """First day still held raw for a commodity, or None if nothing was archived"""
+        raise NotImplementedError
+
+    def set_archive_horizon(self, commodity: str, day: datetime):
+        """Record the first day still held raw for a commodity"""
+        raise NotImplementedError
+
+    def ping(self):
+        """Check that the storage is reachable (raises if it is not)"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the storage handle"""
+        pass
+
+
+def _day_bounds(date):
+    """First and last instant of a day as datetimes"""
+    day = to_price_date(date)
+    return day, datetime.combine(day.date(), datetime.max.time())
+
+
+def _day_runs(days):
+    """Collapse days into (first, last) runs of consecutive days, oldest first"""
+    runs = []
+    for day in sorted({to_price_date(day) for day in days}):
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [(first, last) for first, last in runs]
+
+
+def _city_spellings(city):
+    """Every lowercase spelling egg and copra documents may use for a city"""
+    key = city_key(city)
+    return list(dict.fromkeys(
+        [city.lower(), key] + [alias for alias, target in CITY_ALIASES.items() if target == key]
+    ))
+
+
+def _tag_source(records, source):
+    """Record which legacy collection the prices were written to"""
+    for record in records:
+        record['source'] = source
+    return records
+
+
+def _chicken_city_names(city):
+    """Chicken documents use title-cased names and store Bangalore under both spellings"""
+    if city.lower() in ['bangalore', 'bengaluru']:
+        return ['Bangalore', 'Bengaluru']
+    return [city.title()]
+
+
+class MongoPriceStorage(PriceStorage):
+    """Storage backed by the existing MongoDB collections"""
+
+    backend = 'mongo'
+
+    def __init__(self, connection_string=None, db_name="egg_price_data"):
+        """
+        Initialize the MongoDB backend
+
+        Args:
+            connection_string (str, optional): MongoDB connection string (default: MONGO_URI)
+            db_name (str): Name of the database
+        """
+        from egg_price_schema import EggPriceDatabase
+
+        super().__init__()
+        self.egg_db = EggPriceDatabase(connection_string, db_name)
+        self.client = self.egg_db.client
+        self.db = self.egg_db.db
+        self.egg_prices = self.db[LEGACY_COLLECTIONS['egg']]
+        self.copra_prices = self.db[LEGACY_COLLECTIONS['copra']]
+        self.chicken_prices = self.db[LEGACY_COLLECTIONS['chicken']]
+        self.chicken_snapshots = self.db[CHICKEN_LINUX_COLLECTION]
+        self.price_rollups = self.db['price_rollups']
+        self.latest_prices = self.db['latest_prices']
+        self.price_archive = self.db['price_archive']
+        self.archive_state = self.db['price_archive_state']
+        self.data_versions = self.db['data_versions']
+        # {commodity: {city_key: [stored city names]}}, see _city_names
+        self._stored_city_names = {}
+        self.ensure_indexes()
+        self.add_write_listener(self._refresh_latest_prices)
+
+        self.observations = None
+        if os.getenv('PRICE_DUAL_WRITE', '0') == '1':
+            from price_observations import PriceObservationStore
+            self.observations = PriceObservationStore(connection_string, db_name)
+            self.add_write_listener(self._dual_write_observations)
+
+    def ensure_indexes(self):
+        """Create the city/date indexes the read paths rely on (no-op if they exist)"""
+        try:
+            # _id is the keyset tie-breaker of get_prices_page, so page reads need no in-memory sort
+            self.egg_prices.create_index([('commodity', 1), ('city', 1), ('date', 1), ('_id', 1)])
+            self.copra_prices.create_index([('city', 1), ('price_date', 1), ('_id', 1)])
+            self.chicken_prices.create_index([('city', 1), ('price_date', 1), ('_id', 1)])
+            self.price_rollups.create_index(
+                [('commodity', 1), ('city_key', 1), ('period', 1), ('bucket', 1), ('variety', 1)],
+                unique=True,
+            )
+            self.latest_prices.create_index([('commodity', 1), ('city_key', 1)], unique=True)
+            self.price_archive.create_index([('commodity', 1), ('city_key', 1), ('month', 1)], unique=True)
+            if self.chicken_prices.find_one({'price_date': {'$exists': False}}, {'_id': 1}):
+                print("⚠️ Chicken documents without price_date are missing from reads; "
+                      "run: python price_storage.py migrate-chicken-dates")
+        except Exception as e:
+            print(f"⚠️ Could not create indexes: {e}")
+
+    def store_egg_prices(self, city, price_data, date=None):
+        result = self.egg_db.store_egg_prices(city, price_data, date=date)
+        if result is not None:
+            now = datetime.utcnow()
+            document = {'city': city.lower(), 'rates': extract_egg_rates(price_data), 'date': date or now, 'timestamp': now}
+            self._notify_write('egg', _tag_source(document_to_records('egg', document), self.egg_prices.name))
+        return result
+
+    def store_copra_prices(self, documents):
+        if not documents:
+            return 0
+        existing = {
+            (doc['city'], doc['price_date'])
+            for doc in self.copra_prices.find(
+                {
+                    'commodity': 'copra',
+                    'city': {'$in': [d['city'] for d in documents]},
+                    'price_date': {'$in': list({d['price_date'] for d in documents})},
+                },
+                {'city': 1, 'price_date': 1},
+            )
+        }
+        new_documents = [d for d in documents if (d['city'], d['price_date']) not in existing]
+        if new_documents:
+            self.copra_prices.insert_many(new_documents)
+            records = [r for d in new_documents for r in document_to_records('copra', d)]
+            self._notify_write('copra', _tag_source(records, self.copra_prices.name))
+        return len(new_documents)
+
+    def store_chicken_prices(self, documents):
+        if not documents:
+            return 0
+        documents = [with_chicken_price_date(d) for d in documents]
+        existing = {
+            (doc['city'], doc['price_date'])
+            for doc in self.chicken_prices.find(
+                {
+                    'city': {'$in': list({d['city'] for d in documents})},
+                    'price_date': {'$in': list({d['price_date'] for d in documents})},
+                },
+                {'city': 1, 'price_date': 1},
+            )
+        }
+        new_documents = [d for d in documents if (d['city'], d['price_date']) not in existing]
+        if new_documents:
+            self.chicken_prices.insert_many(new_documents)
+            records = [r for d in new_documents for r in document_to_records('chicken', d)]
+            self._notify_write('chicken', _tag_source(records, self.chicken_prices.name))
+        return len(new_documents)
+
+    def store_chicken_snapshot(self, document):
+        with_chicken_price_date(document)
+        inserted_id = self.chicken_snapshots.insert_one(document).inserted_id
+        self._notify_write('chicken', _tag_source(document_to_records('chicken', document), self.chicken_snapshots.name))
+        return inserted_id
+
+    def has_prices_for_date(self, commodity, date, city=None):
+        start, end = _day_bounds(date)
+        if commodity == 'egg':
+            query = {'commodity': 'egg', 'date': {'$gte': start, '$lte': end}}
+            collection = self.egg_prices
+        else:
+            query = {'price_date': {'$gte': start, '$lte': end}}
+            collection = self.copra_prices if commodity == 'copra' else self.chicken_prices
+        if city:
+            query.update(self._city_query(commodity, city))
+        return collection.find_one(query, {'_id': 1}) is not None
+
+    def _load_city_names(self, commodity):
+        """Read the city names stored in a commodity's legacy collection, grouped by city_key"""
+        collection = self.db[LEGACY_COLLECTIONS[commodity]]
+        # Served from the (city, date) indexes; egg shares its collection with the commodity field
+        by_key = {}
+        for name in collection.distinct('city', {'commodity': 'egg'} if commodity == 'egg' else {}):
+            if name:
+                by_key.setdefault(city_key(name), []).append(name)
+        self._stored_city_names[commodity] = by_key
+        return by_key
+
+    def _city_names(self, commodity, city):
+        """
+        Every name a city may be stored under in a commodity's legacy collection
+
+        Keys cannot be turned back into names reliably ('navi-mumbai' is stored
+        as 'Navi Mumbai' for chicken and 'navi mumbai' for egg), so the stored
+        names with the same city_key are looked up; the list is re-read when a
+        city is not in it yet. The historical spellings are always included so
+        a city without documents still gets a well-formed query.
+        """
+        key = city_key(city)
+        names = self._stored_city_names.get(commodity, {}).get(key)
+        if names is None:
+            names = self._load_city_names(commodity).get(key, [])
+        guesses = _chicken_city_names(city) if commodity == 'chicken' else _city_spellings(city)
+        return list(dict.fromkeys(names + guesses))
+
+    def _city_query(self, commodity, city):
+        """Match one city, under every stored spelling, in a commodity's legacy collection"""
+        names = self._city_names(commodity, city)
+        if len(names) == 1:
+            return {'city': names[0]}
+        return {'city': {'$in': names}}
+
+    def _cities_query(self, commodity, cities):
+        """Match several cities (every spelling of each) in a legacy collection; None matches all"""
+        if cities is None:
+            return {}
+        names = [name for city in cities for name in self._city_names(commodity, city)]
+        return {'city': {'$in': list(dict.fromkeys(names))}}
+
+    def _dual_write_observations(self, commodity, records):
+        """Write listener: mirror every write into the unified observation collection"""
+        try:
+            self.observations.write_records(records)
+        except Exception as e:
+            print(f"⚠️ Error dual-writing {commodity} observations: {e}")
+
+    def _scan_latest_prices(self, commodity, city=None):
+        """Newest document per city, read from the legacy collection"""
+        if commodity == 'egg':
+            collection, match, sort_field = self.egg_prices, {'commodity': 'egg'}, 'date'
+        else:
+            collection = self.copra_prices if commodity == 'copra' else self.chicken_prices
+            match, sort_field = {}, 'price_date'
+
+        projection = READ_PROJECTIONS[commodity]
+        if city:
+            match.update(self._city_query(commodity, city))
+            return list(collection.find(match, projection).sort(sort_field, -1).limit(1))
+
+        pipeline = [
+            {'$sort': {sort_field: -1}},
+            {'$project': projection},
+            {'$group': {
+                '_id': '$city',
+                'latest_price': {'$first': '$$ROOT'}
+            }}
+        ]
+        if match:
+            pipeline.insert(0, {'$match': match})
+        return [row['latest_price'] for row in collection.aggregate(pipeline)]
+
+    def _latest_entry(self, commodity, document):
+        return {
+            'commodity': commodity,
+            'city_key': city_key(document['city']),
+            'date': to_price_date(document.get(LEGACY_DATE_FIELDS[commodity])),
+            'document': document,
+            'updated_at': datetime.utcnow(),
+        }
+
+    def _refresh_latest_prices(self, commodity, records):
+        """Write listener: re-read the newest document of each city that got a newer day"""
+        newest = {}
+        for record in records:
+            if record['date'] > newest.get(record['city_key'], datetime.min):
+                newest[record['city_key']] = record['date']
+        try:
+            for city, day in newest.items():
+                current = self.latest_prices.find_one({'commodity': commodity, 'city_key': city}, {'date': 1})
+                if current and current['date'] and current['date'] > day:
+                    continue
+                documents = self._scan_latest_prices(commodity, city)
+                if documents:
+                    self.latest_prices.replace_one(
+                        {'commodity': commodity, 'city_key': city},
+                        self._latest_entry(commodity, documents[0]),
+                        upsert=True,
+                    )
+        except Exception as e:
+            print(f"⚠️ Error updating latest {commodity} prices: {e}")
+
+    def rebuild_latest_prices(self, commodity):
+        """
+        Regenerate a commodity's latest_prices documents from the legacy collection
+
+        Returns:
+            int: Number of cities written
+        """
+        from pymongo import ReplaceOne
+
+        entries = {}
+        for document in self._scan_latest_prices(commodity):
+            entry = self._latest_entry(commodity, document)
+            current = entries.get(entry['city_key'])
+            # Bangalore and Bengaluru chicken documents collapse into one city_key
+            if current is None or (entry['date'] or datetime.min) >= (current['date'] or datetime.min):
+                entries[entry['city_key']] = entry
+
+        if entries:
+            self.latest_prices.bulk_write([
+                ReplaceOne({'commodity': commodity, 'city_key': key}, entry, upsert=True)
+                for key, entry in entries.items()
+            ], ordered=False)
+        self.latest_prices.delete_many({'commodity': commodity, 'city_key': {'$nin': list(entries)}})
+        return len(entries)
+
+    def _collection_size(self, collection):
+        try:
+            stats = self.db.command('collStats', collection.name)
+            return {'size': stats.get('size', 0), 'storage_size': stats.get('storageSize', 0)}
+        except Exception:
+            return None
+
+    def compact_egg_documents(self, batch_size=500):
+        """
+        Rewrite egg documents stored with full rates and query_text in the compact format
+
+        Documents are converted in _id order; a document rewritten by a scraper
+        in the meantime is left alone.
+
+        Args:
+            batch_size (int): Documents replaced per bulk write
+
+        Returns:
+            dict: Documents converted, their BSON size before and after, and the
+            collection's collStats size/storageSize before and after (None if unavailable)
+        """
+        import bson
+        from pymongo import ReplaceOne
+
+        report = {
+            'documents': 0,
+            'bytes_before': 0,
+            'bytes_after': 0,
+            'collection_before': self._collection_size(self.egg_prices),
+        }
+        query = {'rates': {'$exists': True}}
+        while True:
+            batch = list(self.egg_prices.find(query).sort('_id', 1).limit(batch_size))
+            if not batch:
+                break
+            operations = []
+            for document in batch:
+                compact = compact_egg_document(document)
+                report['bytes_before'] += len(bson.encode(document))
+                report['bytes_after'] += len(bson.encode(compact))
+                operations.append(ReplaceOne({'_id': document['_id'], 'rates': {'$exists': True}}, compact))
+            self.egg_prices.bulk_write(operations, ordered=False)
+            report['documents'] += len(batch)
+            query = {'rates': {'$exists': True}, '_id': {'$gt': batch[-1]['_id']}}
+
+        report['collection_after'] = self._collection_size(self.egg_prices)
+        if report['documents']:
+            self.rebuild_latest_prices('egg')
+        return report
+
+    def migrate_chicken_dates(self, batch_size=500):
+        """
+        Add the typed price_date to chicken documents that only have string dates
+
+        Documents are updated in _id order in both chicken collections; the
+        date_of_price string index, which no read uses any more, is dropped.
+
+        Args:
+            batch_size (int): Documents updated per bulk write
+
+        Returns:
+            dict: {collection name: documents updated, 'skipped': documents without a parsable date}
+        """
+        from pymongo import UpdateOne
+
+        report = {'skipped': 0}
+        for collection in (self.chicken_prices, self.chicken_snapshots):
+            report[collection.name] = 0
+            query = {'price_date': {'$exists': False}}
+            while True:
+                batch = list(collection.find(query, {'date_of_price': 1, 'date': 1}).sort('_id', 1).limit(batch_size))
+                if not batch:
+                    break
+                operations = []
+                for document in batch:
+                    day = with_chicken_price_date(document).get('price_date')
+                    if day is None:
+                        report['skipped'] += 1
+                        continue
+                    operations.append(UpdateOne(
+                        {'_id': document['_id'], 'price_date': {'$exists': False}},
+                        {'$set': {'price_date': day}},
+                    ))
+                if operations:
+                    collection.bulk_write(operations, ordered=False)
+                report[collection.name] += len(operations)
+                query = {'price_date': {'$exists': False}, '_id': {'$gt': batch[-1]['_id']}}
+
+        try:
+            self.chicken_prices.drop_index([('city', 1), ('date_of_price', 1), ('_id', 1)])
+        except Exception:
+            pass
+        if report[self.chicken_prices.name]:
+            self.rebuild_latest_prices('chicken')
+        return report
+
+    def get_latest_prices(self, commodity, city=None):
+        query = {'commodity': commodity}
+        if city:
+            query['city_key'] = city_key(city)
+        documents = [row['document'] for row in self.latest_prices.find(query, LATEST_PROJECTION).sort('city_key', 1)]
+        if documents:
+            return documents
+        # Not materialized yet (fresh deployment before rebuild-latest)
+        return self._scan_latest_prices(commodity, city)
+
+    def get_prices_on_date(self, commodity, city, date):
+        start, end = _day_bounds(date)
+        projection = READ_PROJECTIONS[commodity]
+        if commodity == 'egg':
+            return self.egg_prices.find_one({
+                **self._city_query('egg', city),
+                'commodity': 'egg',
+                'date': {'$gte': start, '$lte': end}
+            }, projection)
+        if commodity == 'copra':
+            return self.copra_prices.find_one({
+                **self._city_query('copra', city),
+                'price_date': {'$gte': start, '$lte': end}
+            }, projection)
+        return self.chicken_prices.find_one({
+            **self._city_query('chicken', city),
+            'price_date': {'$gte': start, '$lte': end}
+        }, projection)
+
+    def _range_query(self, commodity, city, start_date, end_date):
+        """Collection and query for one city's documents within a date range"""
+        start, _ = _day_bounds(start_date)
+        _, end = _day_bounds(end_date)
+        if commodity == 'egg':
+            return self.egg_prices, {
+                **self._city_query('egg', city), 'commodity': 'egg', 'date': {'$gte': start, '$lte': end}
+            }
+        if commodity == 'copra':
+            return self.copra_prices, {**self._city_query('copra', city), 'price_date': {'$gte': start, '$lte': end}}
+        return self.chicken_prices, {**self._city_query('chicken', city), 'price_date': {'$gte': start, '$lte': end}}
+
+    def get_prices_by_date_range(self, commodity, city, start_date, end_date):
+        collection, query = self._range_query(commodity, city, start_date, end_date)
+        return list(collection.find(query, READ_PROJECTIONS[commodity]).sort(LEGACY_DATE_FIELDS[commodity], 1))
+
+    def get_prices_page(self, commodity, city, start_date, end_date, after=None, limit=500):
+        from bson import ObjectId
+
+        collection, query = self._range_query(commodity, city, start_date, end_date)
+        field = LEGACY_DATE_FIELDS[commodity]
+        if after:
+            value = datetime.fromisoformat(after[0])
+            same_day = {field: value}
+            if after[1]:
+                same_day['_id'] = {'$gt': ObjectId(after[1])}
+            query = {'$and': [query, {'$or': [{field: {'$gt': value}}, same_day]}]}
+
+        # One round trip per page: the first batch holds the whole page
+        cursor = collection.find(query, {**READ_PROJECTIONS[commodity], '_id': 1}) \
+            .sort([(field, 1), ('_id', 1)]).limit(limit).batch_size(limit)
+        documents, position = [], None
+        for document in cursor:
+            position = [document_date_key(commodity, document), str(document.pop('_id'))]
+            documents.append(document)
+        return documents, (position if len(documents) == limit else None)
+
+    def _records_query(self, commodity, cities, start_date=None, end_date=None):
+        """Collection and query for several cities (None: all) and optional day bounds"""
+        collection = {'egg': self.egg_prices, 'copra': self.copra_prices, 'chicken': self.chicken_prices}[commodity]
+        query = self._cities_query(commodity, cities)
+        if commodity == 'egg':
+            query['commodity'] = 'egg'
+        date_range = {}
+        if start_date is not None:
+            start, _ = _day_bounds(start_date)
+            date_range['$gte'] = start
+        if end_date is not None:
+            _, end = _day_bounds(end_date)
+            date_range['$lte'] = end
+        if date_range:
+            query[LEGACY_DATE_FIELDS[commodity]] = date_range
+        return collection, query
+
+    def get_records_for_cities(self, commodity, cities, start_date, end_date):
+        collection, query = self._records_query(commodity, cities, start_date, end_date)
+        cursor = collection.find(query, READ_PROJECTIONS[commodity]).batch_size(1000)
+        return dedupe_records(r for document in cursor for r in document_to_records(commodity, document))
+
+    def iter_records(self, commodity, cities=None, start_date=None, end_date=None, batch_size=10000):
+        collection, query = self._records_query(commodity, cities, start_date, end_date)
+        # (city, date) follows the city/date indexes, so the cursor streams without an in-memory sort
+        cursor = collection.find(query, READ_PROJECTIONS[commodity]) \
+            .sort([('city', 1), (LEGACY_DATE_FIELDS[commodity], 1)]).batch_size(batch_size)
+        # Aliased cities are stored under several spellings; only their keys need remembering
+        aliased = set(CITY_ALIASES.values())
+        seen = set()
+        batch = []
+        try:
+            for document in cursor:
+                for record in document_to_records(commodity, document):
+                    if record['city_key'] in aliased:
+                        key = record_key(record)
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    batch.append(record)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            cursor.close()
+
+    def store_rollups(self, rollups):
+        if not rollups:
+            return 0
+        from pymongo import ReplaceOne
+
+        self.price_rollups.bulk_write([
+            ReplaceOne(
+                {key: rollup[key] for key in ('commodity', 'city_key', 'period', 'bucket', 'variety')},
+                rollup,
+                upsert=True,
+            )
+            for rollup in rollups
+        ], ordered=False)
+        return len(rollups)
+
+    def get_data_versions(self):
+        return {
+            row['_id']: {'version': row['version'], 'updated_at': row.get('updated_at')}
+            for row in self.data_versions.find({}, {'version': 1, 'updated_at': 1})
+        }
+
+    def bump_data_version(self, commodity):
+        self.data_versions.update_one(
+            {'_id': commodity},
+            {'$inc': {'version': 1}, '$set': {'updated_at': datetime.utcnow()}},
+            upsert=True,
+        )
+
+    def get_city_keys(self, commodity):
+        archived = self.price_archive.distinct('city_key', {'commodity': commodity})
+        return sorted(set(self._load_city_names(commodity)) | set(archived))
+
+    def store_archive_blocks(self, blocks):
+        if not blocks:
+            return 0
+        from pymongo import ReplaceOne
+
+        self.price_archive.bulk_write([
+            ReplaceOne(
+                {'commodity': block['commodity'], 'city_key': block['city_key'], 'month': block['month']},
+                block,
+                upsert=True,
+            )
+            for block in blocks
+        ], ordered=False)
+        return len(blocks)
+
+    def get_archive_blocks(self, commodity, city, start_date, end_date):
+        return list(self.price_archive.find(
+            {
+                'commodity': commodity,
+                'city_key': city_key(city),
+                'month': {'$gte': to_price_date(start_date).replace(day=1), '$lte': to_price_date(end_date)},
+            },
+            {'_id': 0},
+        ).sort('month', 1))
+
+    def delete_prices_on_days(self, commodity, city, days):
+        runs = _day_runs(days)
+        if not runs:
+            return 0
+        collection = {'egg': self.egg_prices, 'copra': self.copra_prices, 'chicken': self.chicken_prices}[commodity]
+        field = LEGACY_DATE_FIELDS[commodity]
+        query = {
+            **self._city_query(commodity, city),
+            '$or': [{field: {'$gte': _day_bounds(first)[0], '$lte': _day_bounds(last)[1]}} for first, last in runs],
+        }
+        if commodity == 'egg':
+            query['commodity'] = 'egg'
+        return collection.delete_many(query).deleted_count
+
+    def get_archive_horizon(self, commodity):
+        state = self.archive_state.find_one({'_id': commodity})
+        return state['horizon'] if state else None
+
+    def set_archive_horizon(self, commodity, day):
+        self.archive_state.update_one(
+            {'_id': commodity},
+            {'$set': {'horizon': to_price_date(day), 'updated_at': datetime.utcnow()}},
+            upsert=True,
+        )
+
+    def get_rollups(self, commodity, city, period, start_date=None, end_date=None, variety=None):
+        query = {'commodity': commodity, 'city_key': city_key(city), 'period': period}
+        if start_date or end_date:
+            query['bucket'] = {}
+            if start_date:
+                query['bucket']['$gte'] = to_price_date(start_date)
+            if end_date:
+                query['bucket']['$lte'] = to_price_date(end_date)
+        if variety:
+            query['variety'] = variety
+        return list(self.price_rollups.find(query, {'_id': 0}).sort([('bucket', 1), ('variety', 1)]))
+
+    def ping(self):
+        self.client.admin.command('ping')
+
+    def close(self):
+        self.egg_db.close()
+
+
+class SQLitePriceStorage(PriceStorage):
+    """Storage backed by a single SQLite file, one row per (commodity, city, day, variety)"""
+
+    backend = 'sqlite'
+
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS price_observations (
+            commodity TEXT NOT NULL,
+            city_key TEXT NOT NULL,
+            price_date TEXT NOT NULL,
+            variety TEXT NOT NULL,
+            price REAL NOT NULL,
+            scraped_at TEXT,
+            PRIMARY KEY (commodity, city_key, price_date, variety)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_observations_commodity_date ON price_observations (commodity, price_date)",
+        """
+        CREATE TABLE IF NOT EXISTS price_rollups (
+            commodity TEXT NOT NULL,
+            city_key TEXT NOT NULL,
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            variety TEXT NOT NULL,
+            label TEXT NOT NULL,
+            min_price REAL NOT NULL,
+            max_price REAL NOT NULL,
+            avg_price REAL NOT NULL,
+            first_price REAL NOT NULL,
+            last_price REAL NOT NULL,
+            observations INTEGER NOT NULL,
+            first_date TEXT NOT NULL,
+            last_date TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (commodity, city_key, period, bucket, variety)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS price_archive (
+            commodity TEXT NOT NULL,
+            city_key TEXT NOT NULL,
+            month TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            payload BLOB NOT NULL,
+            archived_at TEXT NOT NULL,
+            PRIMARY KEY (commodity, city_key, month)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS price_archive_state (
+            commodity TEXT PRIMARY KEY,
+            horizon TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            commodity TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """,
+    ]
+
+    def __init__(self, path=None):
+        """
+        Initialize the SQLite backend
+
+        Args:
+            path (str, optional): Database file (default: SQLITE_DB_PATH or commodity_prices.db)
+        """
+        super().__init__()
+        self.path = path or os.getenv('SQLITE_DB_PATH') or 'commodity_prices.db'
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._connection()
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside a writer"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write_records(self, records: Iterable[Dict], replace: bool) -> int:
+        """Write records in one transaction; returns rows inserted or replaced"""
+        rows = [
+            (
+                r['commodity'], r['city_key'], r['date'].strftime('%Y-%m-%d'), r['variety'], r['price'],
+                r['scraped_at'].isoformat() if r.get('scraped_at') else None,
+            )
+            for r in dedupe_records(records)
+        ]
+        if not rows:
+            return 0
+        if replace:
+            sql = """
+                INSERT INTO price_observations (commodity, city_key, price_date, variety, price, scraped_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (commodity, city_key, price_date, variety)
+                DO UPDATE SET price = excluded.price, scraped_at = excluded.scraped_at
+            """
+        else:
+            sql = """
+                INSERT OR IGNORE INTO price_observations (commodity, city_key, price_date, variety, price, scraped_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """
+        conn = self._connection()
+        with self._write_lock, conn:
+            before = conn.total_changes
+            conn.executemany(sql, rows)
+            return conn.total_changes - before
+
+    def _existing_city_days(self, commodity, keys):
+        """Which (city_key, 'YYYY-MM-DD') pairs already have prices"""
+        if not keys:
+            return set()
+        conn = self._connection()
+        existing = set()
+        for city, day in keys:
+            row = conn.execute(
+                "SELECT 1 FROM price_observations WHERE commodity = ? AND city_key = ? AND price_date = ? LIMIT 1",
+                (commodity, city, day),
+            ).fetchone()
+            if row:
+                existing.add((city, day))
+        return existing
+
+    def _store_new_documents(self, commodity, documents):
+        """Store documents for (city, day) pairs that have no prices yet"""
+        by_key = {}
+        for document in documents:
+            records = document_to_records(commodity, document)
+            if records:
+                by_key.setdefault((records[0]['city_key'], records[0]['date'].strftime('%Y-%m-%d')), []).extend(records)
+        existing = self._existing_city_days(commodity, list(by_key))
+        new_records = [r for key, records in by_key.items() if key not in existing for r in records]
+        self._write_records(new_records, replace=False)
+        self._notify_write(commodity, new_records)
+        return len(by_key) - len(existing)
+
+    def store_egg_prices(self, city, price_data, date=None):
+        rates = extract_egg_rates(price_data)
+        if not any(rate['price'] is not None for rate in rates.values()):
+            print(f"No valid rates found for {city}")
+            return None
+        now = datetime.utcnow()
+        document = {'city': city.lower(), 'rates': rates, 'date': date or now, 'timestamp': now}
+        records = document_to_records('egg', document)
+        written = self._write_records(records, replace=True)
+        self._notify_write('egg', records)
+        return written
+
+    def store_copra_prices(self, documents):
+        return self._store_new_documents('copra', documents)
+
+    def store_chicken_prices(self, documents):
+        return self._store_new_documents('chicken', documents)
+
+    def store_chicken_snapshot(self, document):
+        records = document_to_records('chicken', document)
+        written = self._write_records(records, replace=True)
+        self._notify_write('chicken', records)
+        return written
+
+    def has_prices_for_date(self, commodity, date, city=None):
+        sql = "SELECT 1 FROM price_observations WHERE commodity = ? AND price_date = ?"
+        params = [commodity, to_price_date(date).strftime('%Y-%m-%d')]
+        if city:
+            sql += " AND city_key = ?"
+            params.append(city_key(city))
+        return self._connection().execute(sql + " LIMIT 1", params).fetchone() is not None
+
+    @staticmethod
+    def _rows_to_records(commodity, rows):
+        return [
+            {
+                'commodity': commodity,
+                'city_key': row['city_key'],
+                'variety': row['variety'],
+                'date': datetime.strptime(row['price_date'], '%Y-%m-%d'),
+                'price': row['price'],
+                'scraped_at': datetime.fromisoformat(row['scraped_at']) if row['scraped_at'] else None,
+            }
+            for row in rows
+        ]
+
+    @classmethod
+    def _rows_to_documents(cls, commodity, rows):
+        return records_to_documents(cls._rows_to_records(commodity, rows))
+
+    def get_latest_prices(self, commodity, city=None):
+        params = [commodity]
+        city_filter = ""
+        if city:
+            city_filter = " AND city_key = ?"
+            params.append(city_key(city))
+        rows = self._connection().execute(
+            f"""
+            SELECT o.city_key, o.variety, o.price_date, o.price, o.scraped_at
+            FROM price_observations o
+            JOIN (
+                SELECT city_key, MAX(price_date) AS price_date
+                FROM price_observations
+                WHERE commodity = ?{city_filter}
+                GROUP BY city_key
+            ) latest ON o.city_key = latest.city_key AND o.price_date = latest.price_date
+            WHERE o.commodity = ?
+            ORDER BY o.city_key
+            """,
+            params + [commodity],
+        ).fetchall()
+        return self._rows_to_documents(commodity, rows)
+
+    def get_prices_on_date(self, commodity, city, date):
+        documents = self.get_prices_by_date_range(commodity, city, date, date)
+        return documents[0] if documents else None
+
+    def _select_records(self, commodity, city, start_date, end_date):
+        return self._connection().execute(
+            """
+            SELECT city_key, variety, price_date, price, scraped_at
+            FROM price_observations
+            WHERE commodity = ? AND city_key = ? AND price_date BETWEEN ? AND ?
+            ORDER BY price_date
+            """,
+            (
+                commodity, city_key(city),
+                to_price_date(start_date).strftime('%Y-%m-%d'),
+                to_price_date(end_date).strftime('%Y-%m-%d'),
+            ),
+        ).fetchall()
+
+    def get_prices_by_date_range(self, commodity, city, start_date, end_date):
+        return self._rows_to_documents(commodity, self._select_records(commodity, city, start_date, end_date))
+
+    def get_records(self, commodity, city, start_date, end_date):
+        return self._rows_to_records(commodity, self._select_records(commodity, city, start_date, end_date))
+
+    def get_prices_page(self, commodity, city, start_date, end_date, after=None, limit=500):
+        # One document per day, so the day alone is the keyset position
+        start = to_price_date(start_date)
+        if after:
+            start = max(start, to_price_date(after[0]) + timedelta(days=1))
+        key = city_key(city)
+        rows = self._connection().execute(
+            """
+            SELECT city_key, variety, price_date, price, scraped_at
+            FROM price_observations
+            WHERE commodity = ? AND city_key = ? AND price_date IN (
+                SELECT DISTINCT price_date FROM price_observations
+                WHERE commodity = ? AND city_key = ? AND price_date BETWEEN ? AND ?
+                ORDER BY price_date
+                LIMIT ?
+            )
+            ORDER BY price_date
+            """,
+            (
+                commodity, key, commodity, key,
+                start.strftime('%Y-%m-%d'), to_price_date(end_date).strftime('%Y-%m-%d'), limit,
+            ),
+        ).fetchall()
+        documents = self._rows_to_documents(commodity, rows)
+        if len(documents) < limit:
+            return documents, None
+        return documents, [document_date_key(commodity, documents[-1]), '']
+
+    def get_records_for_cities(self, commodity, cities, start_date, end_date):
+        sql = """
+            SELECT city_key, variety, price_date, price, scraped_at
+            FROM price_observations
+            WHERE commodity = ? AND price_date BETWEEN ? AND ?
+        """
+        params = [commodity, to_price_date(start_date).strftime('%Y-%m-%d'), to_price_date(end_date).strftime('%Y-%m-%d')]
+        if cities is not None:
+            keys = list(dict.fromkeys(city_key(city) for city in cities))
+            if not keys:
+                return []
+            sql += f" AND city_key IN ({', '.join('?' for _ in keys)})"
+            params.extend(keys)
+        rows = self._connection().execute(sql + " ORDER BY city_key, price_date", params).fetchall()
+        return self._rows_to_records(commodity, rows)
+
+    def iter_records(self, commodity, cities=None, start_date=None, end_date=None, batch_size=10000):
+        sql = """
+            SELECT city_key, variety, price_date, price, scraped_at
+            FROM price_observations
+            WHERE commodity = ?
+        """
+        params = [commodity]
+        if cities is not None:
+            keys = list(dict.fromkeys(city_key(city) for city in cities))
+            sql += f" AND city_key IN ({', '.join('?' for _ in keys)})" if keys else " AND 0"
+            params.extend(keys)
+        if start_date is not None:
+            sql += " AND price_date >= ?"
+            params.append(to_price_date(start_date).strftime('%Y-%m-%d'))
+        if end_date is not None:
+            sql += " AND price_date <= ?"
+            params.append(to_price_date(end_date).strftime('%Y-%m-%d'))
+
+        # A connection of its own: the caller may resume the generator from another thread
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute(sql + " ORDER BY city_key, price_date", params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield self._rows_to_records(commodity, rows)
+        finally:
+            conn.close()
+
+    def store_rollups(self, rollups):
+        rows = [
+            (
+                r['commodity'], r['city_key'], r['period'], r['bucket'].strftime('%Y-%m-%d'), r['variety'],
+                r['label'], r['min'], r['max'], r['avg'], r['first'], r['last'], r['count'],
+                r['first_date'].strftime('%Y-%m-%d'), r['last_date'].strftime('%Y-%m-%d'),
+                r['updated_at'].isoformat(),
+            )
+            for r in rollups
+        ]
+        if not rows:
+            return 0
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO price_rollups (
+                    commodity, city_key, period, bucket, variety, label,
+                    min_price, max_price, avg_price, first_price, last_price, observations,
+                    first_date, last_date, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+        return len(rows)
+
+    def get_data_versions(self):
+        rows = self._connection().execute("SELECT commodity, version, updated_at FROM data_versions").fetchall()
+        return {
+            row['commodity']: {'version': row['version'], 'updated_at': datetime.fromisoformat(row['updated_at'])}
+            for row in rows
+        }
+
+    def bump_data_version(self, commodity):
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.execute(
+                """
+                INSERT INTO data_versions (commodity, version, updated_at) VALUES (?, 1, ?)
+                ON CONFLICT (commodity) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+                """,
+                (commodity, datetime.utcnow().isoformat()),
+            )
+
+    def get_city_keys(self, commodity):
+        rows = self._connection().execute(
+            """
+            SELECT DISTINCT city_key FROM price_observations WHERE commodity = ?
+            UNION SELECT city_key FROM price_archive WHERE commodity = ?
+            ORDER BY city_key
+            """,
+            (commodity, commodity),
+        ).fetchall()
+        return [row['city_key'] for row in rows]
+
+    def store_archive_blocks(self, blocks):
+        rows = [
+            (
+                b['commodity'], b['city_key'], b['month'].strftime('%Y-%m-%d'), b['count'],
+                b['payload'], b['archived_at'].isoformat(),
+            )
+            for b in blocks
+        ]
+        if not rows:
+            return 0
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO price_archive (commodity, city_key, month, count, payload, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+        return len(rows)
+
+    def get_archive_blocks(self, commodity, city, start_date, end_date):
+        rows = self._connection().execute(
+            """
+            SELECT commodity, city_key, month, count, payload, archived_at
+            FROM price_archive
+            WHERE commodity = ? AND city_key = ? AND month BETWEEN ? AND ?
+            ORDER BY month
+            """,
+            (
+                commodity, city_key(city),
+                to_price_date(start_date).replace(day=1).strftime('%Y-%m-%d'),
+                to_price_date(end_date).strftime('%Y-%m-%d'),
+            ),
+        ).fetchall()
+        return [
+            {
+                'commodity': row['commodity'],
+                'city_key': row['city_key'],
+                'month': datetime.strptime(row['month'], '%Y-%m-%d'),
+                'count': row['count'],
+                'payload': row['payload'],
+                'archived_at': datetime.fromisoformat(row['archived_at']),
+            }
+            for row in rows
+        ]
+
+    def delete_prices_on_days(self, commodity, city, days):
+        runs = [
+            (commodity, city_key(city), first.strftime('%Y-%m-%d'), last.strftime('%Y-%m-%d'))
+            for first, last in _day_runs(days)
+        ]
+        if not runs:
+            return 0
+        conn = self._connection()
+        with self._write_lock, conn:
+            cursor = conn.executemany(
+                "DELETE FROM price_observations WHERE commodity = ? AND city_key = ? AND price_date BETWEEN ? AND ?",
+                runs,
+            )
+        return cursor.rowcount
+
+    def get_archive_horizon(self, commodity):
+        row = self._connection().execute(
+            "SELECT horizon FROM price_archive_state WHERE commodity = ?", (commodity,)
+        ).fetchone()
+        return datetime.strptime(row['horizon'], '%Y-%m-%d') if row else None
+
+    def set_archive_horizon(self, commodity, day):
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO price_archive_state (commodity, horizon) VALUES (?, ?)",
+                (commodity, to_price_date(day).strftime('%Y-%m-%d')),
+            )
+
+    def get_rollups(self, commodity, city, period, start_date=None, end_date=None, variety=None):
+        sql = "SELECT * FROM price_rollups WHERE commodity = ? AND city_key = ? AND period = ?"
+        params = [commodity, city_key(city), period]
+        if start_date:
+            sql += " AND bucket >= ?"
+            params.append(to_price_date(start_date).strftime('%Y-%m-%d'))
+        if end_date:
+            sql += " AND bucket <= ?"
+            params.append(to_price_date(end_date).strftime('%Y-%m-%d'))
+        if variety:
+            sql += " AND variety = ?"
+            params.append(variety)
+        rows = self._connection().execute(sql + " ORDER BY bucket, variety", params).fetchall()
+        return [
+            {
+                'commodity': row['commodity'],
+                'city_key': row['city_key'],
+                'variety': row['variety'],
+                'period': row['period'],
+                'bucket': datetime.strptime(row['bucket'], '%Y-%m-%d'),
+                'label': row['label'],
+                'min': row['min_price'],
+                'max': row['max_price'],
+                'avg': row['avg_price'],
+                'first': row['first_price'],
+                'last': row['last_price'],
+                'count': row['observations'],
+                'first_date': datetime.strptime(row['first_date'], '%Y-%m-%d'),
+                'last_date': datetime.strptime(row['last_date'], '%Y-%m-%d'),
+                'updated_at': datetime.fromisoformat(row['updated_at']),
+            }
+            for row in rows
+        ]
+
+    def ping(self):
+        self._connection().execute('SELECT 1').fetchone()
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def get_price_storage(connection_string=None, db_name="egg_price_data", backend=None) -> PriceStorage:
+    """
+    Create the storage backend selected by configuration
+
+    Args:
+        connection_string (str, optional): MongoDB connection string (mongo backend only)
+        db_name (str): MongoDB database name (mongo backend only)
+        backend (str, optional): 'mongo' or 'sqlite' (default: PRICE_STORAGE_BACKEND or 'mongo')
+
+    Returns:
+        PriceStorage: The configured backend
+    """
+    backend = (backend or os.getenv('PRICE_STORAGE_BACKEND') or 'mongo').lower()
+    if backend == 'sqlite':
+        storage = SQLitePriceStorage()
+    elif backend == 'mongo':
+        storage = MongoPriceStorage(connection_string, db_name)
+    else:
+        raise ValueError(f"Unknown PRICE_STORAGE_BACKEND: {backend}")
+
+    if os.getenv('PRICE_ROLLUPS', '1') != '0':
+        from price_rollups import PriceRollups
+        storage.add_write_listener(PriceRollups(storage).on_write)
+    if backend == 'mongo' and os.getenv('PRICE_TIMESERIES', '0') == '1':
+        from timeseries_storage import TimeSeriesPriceStore
+        storage.add_write_listener(TimeSeriesPriceStore(connection_string, db_name).on_write)
+    storage.add_write_listener(lambda commodity, records: storage.bump_data_version(commodity))
+    return storage
+
+
+def main():
+    """Command line entry point for storage maintenance"""
+    parser = argparse.ArgumentParser(description="Price storage maintenance")
+    parser.add_argument('command', choices=['rebuild-latest', 'compact-egg', 'migrate-chicken-dates'])
+    parser.add_argument('--commodity', choices=COMMODITIES, default=None)
+    parser.add_argument('--connection-string', default=None)
+    parser.add_argument('--db-name', default='egg_price_data')
+    args = parser.parse_args()
+
+    storage = MongoPriceStorage(args.connection_string, args.db_name)
+    if args.command == 'compact-egg':
+        report = storage.compact_egg_documents()
+        before, after = report['bytes_before'], report['bytes_after']
+        reduction = (1 - after / before) * 100 if before else 0
+        print(f"Compacted {report['documents']} egg documents: {before} -> {after} bytes ({reduction:.1f}% smaller)")
+        if report['collection_before'] and report['collection_after']:
+            print(f"egg_prices data size: {report['collection_before']['size']} -> "
+                  f"{report['collection_after']['size']} bytes "
+                  f"(storage size {report['collection_before']['storage_size']} -> "
+                  f"{report['collection_after']['storage_size']} bytes; run MongoDB's compact to release disk space)")
+    elif args.command == 'migrate-chicken-dates':
+        report = storage.migrate_chicken_dates()
+        print(f"Added price_date to {report[LEGACY_COLLECTIONS['chicken']]} {LEGACY_COLLECTIONS['chicken']} and "
+              f"{report[CHICKEN_LINUX_COLLECTION]} {CHICKEN_LINUX_COLLECTION} documents "
+              f"({report['skipped']} without a parsable date left unchanged)")
+    else:
+        for commodity in ([args.commodity] if args.commodity else COMMODITIES):
+            print(f"{commodity.upper()}: latest prices rebuilt for {storage.rebuild_latest_prices(commodity)} cities")
+    storage.close()
+
+
+if __name__ == "__main__":
+    main()
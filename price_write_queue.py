@@ -0,0 +1,326 @@
+"""
+Batched Price Write Queue
+=========================
+
+Non-blocking writer for async scrapers. Storage calls are queued, grouped
+into batches (up to max_batch calls, or whatever arrived within max_delay
+seconds of the first one) and executed in a worker thread, so pymongo and
+sqlite3 never block the event loop.
+
+If the storage cannot be reached, the batch is appended to a local
+append-only spool file (one JSON line per call) instead of being dropped.
+The spool is replayed, oldest first, as soon as a later batch connects
+successfully, or on demand:
+
+    python price_write_queue.py replay
+
+Usage:
+    queue = PriceWriteQueue(lambda: get_price_storage())
+    saved = await queue.submit('store_chicken_prices', documents)   # None if spooled
+    print(queue.stats())          # queue depth, spool depth, flush latency
+    await queue.close()
+
+Configuration:
+    PRICE_SPOOL_PATH    Spool file (default: price_write_spool.jsonl)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import date as date_type, datetime
+from typing import Callable, Dict, List, Optional
+
+
+DEFAULT_SPOOL_PATH = "price_write_spool.jsonl"
+
+# Storage methods that take a list of documents; consecutive calls are merged into one
+LIST_METHODS = ('store_copra_prices', 'store_chicken_prices')
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'$date': value.isoformat()}
+    if isinstance(value, date_type):
+        return {'$day': value.isoformat()}
+    raise TypeError(f"Cannot spool {type(value).__name__}")
+
+
+def _decode(obj):
+    if '$date' in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj['$date'])
+    if '$day' in obj and len(obj) == 1:
+        return date_type.fromisoformat(obj['$day'])
+    return obj
+
+
+def merge_runs(calls: List[tuple]) -> List[tuple]:
+    """Merge consecutive list-method calls, returning (merged call, number of calls merged) pairs"""
+    runs = []
+    for method, args in calls:
+        if runs and method in LIST_METHODS and runs[-1][0][0] == method:
+            (_, (documents,)), count = runs[-1]
+            runs[-1] = ((method, (documents + list(args[0]),)), count + 1)
+        else:
+            runs.append(((method, (list(args[0]),) if method in LIST_METHODS else tuple(args)), 1))
+    return runs
+
+
+def merge_calls(calls: List[tuple]) -> List[tuple]:
+    """Merge consecutive list-method calls into one call per run of the same method"""
+    return [call for call, _ in merge_runs(calls)]
+
+
+def _spool_line(method: str, args) -> str:
+    return json.dumps({'method': method, 'args': list(args)}, default=_encode) + '\n'
+
+
+class PriceWriteQueue:
+    """Asynchronous, batching front end for PriceStorage writes with a disk spool"""
+
+    def __init__(self, storage_factory: Callable, spool_path: Optional[str] = None,
+                 max_batch: int = 100, max_delay: float = 1.0):
+        """
+        Initialize the queue (the flusher task starts on the first submit)
+
+        Args:
+            storage_factory (callable): Returns the PriceStorage to write to (or None / raises
+                when it is unavailable); called again after a failed write
+            spool_path (str, optional): Spool file (default: PRICE_SPOOL_PATH or price_write_spool.jsonl)
+            max_batch (int): Most storage calls per flush
+            max_delay (float): Seconds to wait for more calls after the first one of a batch
+        """
+        self.storage_factory = storage_factory
+        self.spool_path = spool_path or os.getenv('PRICE_SPOOL_PATH') or DEFAULT_SPOOL_PATH
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.storage = None
+        self._queue = None
+        self._task = None
+        self._spool_lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {
+            'submitted': 0,
+            'written': 0,
+            'spooled': 0,
+            'replayed': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'last_flush_ms': None,
+            'total_flush_ms': 0.0,
+        }
+
+    # ------------------------------------------------------------------ async side
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    def submit(self, method: str, *args) -> asyncio.Future:
+        """
+        Queue a storage call without blocking
+
+        Args:
+            method: PriceStorage write method ('store_chicken_prices', 'store_chicken_snapshot', ...)
+            *args: Arguments for the method
+
+        Returns:
+            asyncio.Future: Resolves to the storage result, or None if the call was spooled
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((method, args, future))
+        self._stats['submitted'] += 1
+        return future
+
+    async def _flush_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self._in_flight = len(batch)
+            started = time.perf_counter()
+            try:
+                results = await asyncio.to_thread(self._write_batch, [(m, a) for m, a, _ in batch])
+            except Exception as e:
+                print(f"⚠️ Write queue flush failed: {e}")
+                results = [None] * len(batch)
+            elapsed = (time.perf_counter() - started) * 1000
+            self._stats['flushes'] += 1
+            self._stats['last_flush_ms'] = round(elapsed, 3)
+            self._stats['total_flush_ms'] += elapsed
+            self._in_flight = 0
+
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            for _ in batch:
+                self._queue.task_done()
+
+    async def flush(self):
+        """Wait until every submitted call has been written or spooled"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        """Flush outstanding calls, stop the flusher task and close the storage"""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.storage is not None:
+            await asyncio.to_thread(self.storage.close)
+            self.storage = None
+
+    def stats(self) -> Dict:
+        """Queue depth, spool depth, write counts and flush latency"""
+        stats = dict(self._stats)
+        flushes = stats.pop('total_flush_ms')
+        stats['avg_flush_ms'] = round(flushes / stats['flushes'], 3) if stats['flushes'] else None
+        stats['queue_depth'] = (self._queue.qsize() if self._queue is not None else 0) + self._in_flight
+        stats['spool_depth'] = self.spool_depth()
+        return stats
+
+    # ------------------------------------------------------------------ worker thread side
+
+    def _connect(self):
+        if self.storage is None:
+            try:
+                self.storage = self.storage_factory()
+            except Exception as e:
+                print(f"⚠️ Price storage unavailable: {e}")
+                self.storage = None
+        return self.storage
+
+    def _write_batch(self, calls: List[tuple]) -> List:
+        """Write one batch (replaying the spool first); spool whatever storage did not take"""
+        written = 0
+        merged_results = []
+        storage = self._connect()
+        if storage is not None:
+            try:
+                self._replay(storage)
+                for (method, args), count in merge_runs(calls):
+                    merged_results.append(getattr(storage, method)(*args))
+                    written += count
+            except Exception as e:
+                print(f"⚠️ Price storage write failed, spooling {len(calls) - written} calls: {e}")
+                self._stats['failed_flushes'] += 1
+                self.storage = None
+        self._stats['written'] += written
+        if written < len(calls):
+            # Calls already written stay out of the spool (snapshot inserts are not idempotent)
+            self._spool(calls[written:])
+        return self._split_results(calls[:written], merged_results) + [None] * (len(calls) - written)
+
+    @staticmethod
+    def _split_results(calls: List[tuple], merged_results: List) -> List:
+        """Hand each merged call's result to the first submitter of that run (others get 0)"""
+        results = []
+        merged_index = -1
+        previous = None
+        for method, _ in calls:
+            if not (method in LIST_METHODS and method == previous):
+                merged_index += 1
+                results.append(merged_results[merged_index])
+            else:
+                results.append(0)
+            previous = method
+        return results
+
+    def _spool(self, calls: List[tuple]):
+        with self._spool_lock, open(self.spool_path, 'a', encoding='utf-8') as f:
+            for method, args in calls:
+                f.write(_spool_line(method, args))
+            f.flush()
+            os.fsync(f.fileno())
+        self._stats['spooled'] += len(calls)
+        print(f"📥 Spooled {len(calls)} price writes to {self.spool_path}")
+
+    def spool_depth(self) -> int:
+        """Number of calls waiting in the spool file"""
+        with self._spool_lock:
+            if not os.path.exists(self.spool_path):
+                return 0
+            with open(self.spool_path, encoding='utf-8') as f:
+                return sum(1 for line in f if line.strip())
+
+    def _replay(self, storage) -> int:
+        """Write spooled calls oldest first; the call that fails and everything after it stay in the spool"""
+        replaying = self.spool_path + '.replaying'
+        with self._spool_lock:
+            if not os.path.exists(self.spool_path):
+                return 0
+            os.replace(self.spool_path, replaying)
+
+        with open(replaying, encoding='utf-8') as f:
+            calls = [
+                (entry['method'], tuple(entry['args']))
+                for entry in (json.loads(line, object_hook=_decode) for line in f if line.strip())
+            ]
+        written = 0
+        try:
+            for (method, args), count in merge_runs(calls):
+                getattr(storage, method)(*args)
+                written += count
+        except Exception:
+            # Put back only what was not written (snapshot inserts are not idempotent),
+            # in front of anything spooled meanwhile
+            with self._spool_lock:
+                with open(replaying, 'w', encoding='utf-8') as out:
+                    for method, args in calls[written:]:
+                        out.write(_spool_line(method, args))
+                    if os.path.exists(self.spool_path):
+                        with open(self.spool_path, encoding='utf-8') as new:
+                            out.write(new.read())
+                os.replace(replaying, self.spool_path)
+            self._stats['replayed'] += written
+            raise
+        os.remove(replaying)
+        self._stats['replayed'] += len(calls)
+        print(f"📤 Replayed {len(calls)} spooled price writes")
+        return len(calls)
+
+    def replay_spool(self) -> int:
+        """Replay the spool now (synchronously); returns the number of calls written"""
+        storage = self._connect()
+        if storage is None:
+            return 0
+        return self._replay(storage)
+
+
+def main():
+    """Command line entry point for replaying the spool"""
+    from price_storage import get_price_storage
+
+    parser = argparse.ArgumentParser(description="Price write spool")
+    parser.add_argument('command', choices=['replay', 'status'])
+    parser.add_argument('--spool-path', default=None)
+    args = parser.parse_args()
+
+    queue = PriceWriteQueue(get_price_storage, args.spool_path)
+    if args.command == 'status':
+        print(f"{queue.spool_path}: {queue.spool_depth()} spooled writes")
+    else:
+        print(f"Replayed {queue.replay_spool()} spooled writes")
+        if queue.storage is not None:
+            queue.storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -13,13 +13,17 @@ Before running:
     1. Insert your Slack webhook URL in slack_notifier.py
     2. Ensure MongoDB is running
     3. Install all required dependencies
+
+Set PRICE_LAKE_DIR to also append each run's prices to the Parquet price lake.
 """
 
 import asyncio
+import os
 import sys
 import traceback
 from datetime import datetime
 from slack_notifier import SlackNotifier
+from mongo_connection import get_pool_stats, close_mongo_clients
 
 # Import the enhanced scrapers
 from egg_scraper_with_slack import EggScraperWithSlack
@@ -156,6 +160,62 @@ class MasterScraperRunner:
             except:
                 pass
     
+    def run_export_stage(self):
+        """Append this run's prices to the Parquet price lake (only when PRICE_LAKE_DIR is set)"""
+        if not os.getenv('PRICE_LAKE_DIR'):
+            return
+
+        print("\n" + "="*50)
+        print("📦 EXPORTING TO PARQUET PRICE LAKE")
+        print("="*50)
+        storage = None
+        try:
+            from price_lake import ParquetPriceLake, export_from_database
+            from price_storage import get_price_storage
+
+            lake = ParquetPriceLake()
+            storage = get_price_storage()
+            written = export_from_database(lake, storage)
+            for commodity, count in written.items():
+                print(f"  {commodity.upper()}: {count} new rows")
+        except Exception as e:
+            print(f"⚠️ Parquet export failed: {str(e)}")
+            traceback.print_exc()
+        finally:
+            if storage:
+                try:
+                    storage.close()
+                except:
+                    pass
+    
+    def run_retention_stage(self):
+        """Archive raw prices older than the retention age (only when PRICE_RETENTION_DAYS is set)"""
+        if not os.getenv('PRICE_RETENTION_DAYS'):
+            return
+
+        print("\n" + "="*50)
+        print("🗄️ ARCHIVING OLD RAW PRICES")
+        print("="*50)
+        storage = None
+        try:
+            from price_retention import archive_commodity, retention_cutoff
+            from price_storage import get_price_storage
+
+            storage = get_price_storage()
+            cutoff = retention_cutoff()
+            for commodity in ('egg', 'copra', 'chicken'):
+                report = archive_commodity(storage, commodity, cutoff)
+                print(f"  {commodity.upper()}: {report['records']} records archived before {cutoff.strftime('%Y-%m-%d')}")
+        except Exception as e:
+            print(f"⚠️ Archiving failed: {str(e)}")
+            traceback.print_exc()
+        finally:
+            if storage:
+                try:
+                    storage.close()
+                except:
+                    pass
+    
     def print_summary(self):
         """Print final summary of all scraping results"""
         print("\n" + "="*80)
@@ -186,6 +246,13 @@ class MasterScraperRunner:
         
         print("="*80)
     
+    def print_pool_stats(self):
+        """Print shared MongoDB connection pool usage for the session"""
+        for pool, stats in get_pool_stats().items():
+            print(f"🔌 MongoDB pool ({pool}): {stats['checkouts']} checkouts, "
+                  f"{stats['waits']} waits, {stats['open_connections']} open connections, "
+                  f"{stats['checkout_failures']} failed checkouts")
+    
     async def run_all_scrapers(self):
         """Run all scrapers in sequence"""
         self.print_header()
@@ -207,6 +274,12 @@ class MasterScraperRunner:
             # Run chicken scraper (async)
             await self.run_chicken_scraper()
             
+            # Append new prices to the Parquet lake
+            self.run_export_stage()
+            
+            # Move raw prices past the retention age into the archive
+            self.run_retention_stage()
+            
         except KeyboardInterrupt:
             print("\n⚠️ Scraping interrupted by user!")
             sys.exit(1)
@@ -217,6 +290,8 @@ class MasterScraperRunner:
         finally:
             # Always print summary
             self.print_summary()
+            self.print_pool_stats()
+            close_mongo_clients()
 
 
 async def main():
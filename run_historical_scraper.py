@@ -1,9 +1,9 @@
 from egg_price_historical_scraper import EggPriceHistoricalScraper
-from egg_price_schema import EggPriceDatabase
+from price_storage import get_price_storage
 
 def main():
     scraper = EggPriceHistoricalScraper()
-    db = EggPriceDatabase()
+    db = get_price_storage()
     print('Fetching historical egg prices for all major cities...')
     
     # Get today's date to check if we already have entries for today
@@ -17,7 +17,7 @@ def main():
     existing_entries = {}
     try:
         # Get latest prices for all cities
-        latest_prices = db.get_latest_prices()
+        latest_prices = db.get_latest_prices('egg')
         for entry in latest_prices:
             # For aggregation result structure
             if '_id' in entry and 'latest_price' in entry:
@@ -43,7 +43,7 @@ def main():
     # Get all existing entries for the past 30 days
     for city in cities:
         try:
-            city_entries = db.egg_prices.find({'city': city, 'date': {'$gte': datetime.combine(past_30_days[-1], datetime.min.time())}})
+            city_entries = db.get_prices_by_date_range('egg', city, past_30_days[-1], today)
             existing_dates = {entry['date'].date() for entry in city_entries}
             missing_dates = [date for date in past_30_days if date not in existing_dates]
             if missing_dates:
@@ -0,0 +1,383 @@
+"""
+MongoDB Time-Series Storage for Price History
+=============================================
+
+Stores every commodity price as one measurement in a native MongoDB
+time-series collection:
+
+    {'date': datetime(2024, 5, 1),
+     'meta': {'commodity': 'egg', 'city_key': 'mumbai', 'variety': 'single_egg'},
+     'price': 6.5, 'scraped_at': datetime(...)}
+
+MongoDB buckets measurements that share a metaField, so a year of daily
+prices for one city/variety is a handful of compressed buckets instead of
+hundreds of documents with mixed date types.
+
+With PRICE_TIMESERIES=1, get_price_storage() registers the store as a write
+listener of the MongoDB backend, so every scrape is mirrored into the
+collection after the one-off migration.
+
+Usage:
+    python timeseries_storage.py migrate     # copy egg, copra and chicken history
+    python timeseries_storage.py compare     # storage size and query latency vs legacy
+"""
+
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from mongo_connection import get_mongo_client
+from price_records import (
+    CHICKEN_LINUX_COLLECTION, COMMODITIES, LEGACY_COLLECTIONS, LEGACY_DATE_FIELDS,
+    city_key, dedupe_records, document_to_records, records_to_documents, to_price_date,
+)
+
+
+DAY_SECONDS = 86400
+
+
+class TimeSeriesPriceStore:
+    """Price history backed by a MongoDB time-series collection"""
+
+    def __init__(self, connection_string=None, db_name="egg_price_data", collection_name="price_timeseries"):
+        """
+        Initialize the store, creating the time-series collection if needed
+
+        Args:
+            connection_string (str, optional): MongoDB connection string (default: MONGO_URI)
+            db_name (str): Name of the database
+            collection_name (str): Name of the time-series collection
+        """
+        self.client = get_mongo_client(connection_string)
+        self.db = self.client[db_name]
+        self.collection_name = collection_name
+        self.collection = self._ensure_collection()
+
+    def _ensure_collection(self):
+        """Create the time-series collection with day-sized buckets"""
+        if self.collection_name not in self.db.list_collection_names():
+            try:
+                # MongoDB 6.3+: one bucket per metaField per day
+                self.db.create_collection(self.collection_name, timeseries={
+                    'timeField': 'date',
+                    'metaField': 'meta',
+                    'bucketMaxSpanSeconds': DAY_SECONDS,
+                    'bucketRoundingSeconds': DAY_SECONDS,
+                })
+            except CollectionInvalid:
+                pass
+            except OperationFailure:
+                # Older servers only support the named granularities; hours is the coarsest
+                self.db.create_collection(self.collection_name, timeseries={
+                    'timeField': 'date',
+                    'metaField': 'meta',
+                    'granularity': 'hours',
+                })
+            print(f"Created time-series collection {self.collection_name}")
+
+        collection = self.db[self.collection_name]
+        collection.create_index([
+            ('meta.commodity', ASCENDING),
+            ('meta.city_key', ASCENDING),
+            ('date', ASCENDING),
+        ])
+        return collection
+
+    def write_records(self, records: Iterable[Dict]) -> int:
+        """
+        Insert price records, skipping (commodity, city, variety, day) measurements already stored
+
+        Time-series collections cannot upsert, so existing keys in the batch's
+        date span are read first and filtered out.
+
+        Args:
+            records: Long-format price records (see price_records.py)
+
+        Returns:
+            int: Number of measurements inserted
+        """
+        records = dedupe_records(records)
+        if not records:
+            return 0
+
+        start = min(r['date'] for r in records)
+        end = max(r['date'] for r in records)
+        commodities = sorted({r['commodity'] for r in records})
+        cities = sorted({r['city_key'] for r in records})
+        existing = {
+            (doc['meta']['commodity'], doc['meta']['city_key'], doc['meta']['variety'], doc['date'])
+            for doc in self.collection.find(
+                {
+                    'meta.commodity': {'$in': commodities},
+                    'meta.city_key': {'$in': cities},
+                    'date': {'$gte': start, '$lte': end},
+                },
+                {'meta': 1, 'date': 1, '_id': 0},
+            )
+        }
+
+        measurements = []
+        for record in records:
+            if (record['commodity'], record['city_key'], record['variety'], record['date']) in existing:
+                continue
+            measurement = {
+                'date': record['date'],
+                'meta': {
+                    'commodity': record['commodity'],
+                    'city_key': record['city_key'],
+                    'variety': record['variety'],
+                },
+                'price': record['price'],
+            }
+            if record.get('scraped_at'):
+                measurement['scraped_at'] = record['scraped_at']
+            measurements.append(measurement)
+
+        if measurements:
+            self.collection.insert_many(measurements, ordered=False)
+        return len(measurements)
+
+    def on_write(self, commodity: str, records: List[Dict]):
+        """Storage write listener: mirror the records that were just written"""
+        try:
+            self.write_records(records)
+        except Exception as e:
+            print(f"⚠️ Error writing {commodity} prices to {self.collection_name}: {e}")
+
+    def write_documents(self, commodity: str, documents: Iterable[Dict]) -> int:
+        """Convert legacy-shaped documents to records and insert them"""
+        records = []
+        for document in documents:
+            records.extend(document_to_records(commodity, document))
+        return self.write_records(records)
+
+    @staticmethod
+    def _to_records(measurements):
+        for doc in measurements:
+            yield {
+                'commodity': doc['meta']['commodity'],
+                'city_key': doc['meta']['city_key'],
+                'variety': doc['meta']['variety'],
+                'date': doc['date'],
+                'price': doc['price'],
+                'scraped_at': doc.get('scraped_at'),
+            }
+
+    def get_latest_prices(self, commodity: str, city: Optional[str] = None) -> List[Dict]:
+        """
+        Get the latest day's prices per city, in the commodity's legacy document shape
+
+        Args:
+            commodity: 'egg', 'copra' or 'chicken'
+            city (str, optional): Only this city
+
+        Returns:
+            list: One document per city, newest day only
+        """
+        match = {'meta.commodity': commodity}
+        if city:
+            match['meta.city_key'] = city_key(city)
+        pipeline = [
+            {'$match': match},
+            {'$sort': {'date': -1}},
+            {'$group': {
+                '_id': {'city_key': '$meta.city_key', 'variety': '$meta.variety'},
+                'date': {'$first': '$date'},
+                'price': {'$first': '$price'},
+                'scraped_at': {'$first': '$scraped_at'},
+            }},
+        ]
+        latest = [
+            {
+                'commodity': commodity,
+                'city_key': row['_id']['city_key'],
+                'variety': row['_id']['variety'],
+                'date': row['date'],
+                'price': row['price'],
+                'scraped_at': row.get('scraped_at'),
+            }
+            for row in self.collection.aggregate(pipeline)
+        ]
+        # Keep only varieties observed on each city's newest day
+        newest = {}
+        for record in latest:
+            newest[record['city_key']] = max(newest.get(record['city_key'], record['date']), record['date'])
+        latest = [r for r in latest if r['date'] == newest[r['city_key']]]
+        latest.sort(key=lambda r: r['city_key'])
+        return records_to_documents(latest)
+
+    def get_prices_by_date_range(self, commodity: str, city: str, start_date, end_date) -> List[Dict]:
+        """
+        Get daily prices for a city within a date range, in the commodity's legacy document shape
+
+        Args:
+            commodity: 'egg', 'copra' or 'chicken'
+            city: City name
+            start_date: First day (date or datetime)
+            end_date: Last day (date or datetime), inclusive
+
+        Returns:
+            list: One document per day, oldest first
+        """
+        start = to_price_date(start_date)
+        end = to_price_date(end_date) + timedelta(days=1)
+        cursor = self.collection.find(
+            {
+                'meta.commodity': commodity,
+                'meta.city_key': city_key(city),
+                'date': {'$gte': start, '$lt': end},
+            },
+            {'_id': 0},
+        ).sort('date', ASCENDING)
+        return records_to_documents(self._to_records(cursor))
+
+    def collection_stats(self, name: Optional[str] = None) -> Dict:
+        """
+        Get document count and on-disk sizes for a collection
+
+        Args:
+            name (str, optional): Collection name (default: the time-series collection)
+
+        Returns:
+            dict: count, size, storage_size and index_size in bytes
+        """
+        stats = self.db.command('collStats', name or self.collection_name)
+        return {
+            'count': stats.get('count', 0),
+            'size': stats.get('size', 0),
+            'storage_size': stats.get('storageSize', 0),
+            'index_size': stats.get('totalIndexSize', 0),
+        }
+
+
+def migrate_legacy_collections(store: TimeSeriesPriceStore, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Copy egg, copra and chicken history from the legacy collections into the time-series store
+
+    Safe to re-run: measurements that already exist are skipped.
+
+    Args:
+        store: Target time-series store
+        batch_size: Legacy documents converted per insert
+
+    Returns:
+        dict: Measurements inserted per source collection
+    """
+    sources = [(commodity, LEGACY_COLLECTIONS[commodity]) for commodity in COMMODITIES]
+    sources.append(('chicken', CHICKEN_LINUX_COLLECTION))
+
+    inserted = {}
+    for commodity, collection_name in sources:
+        collection = store.db[collection_name]
+        batch = []
+        inserted[collection_name] = 0
+        for document in collection.find({}, {'query_text': 0}).batch_size(batch_size):
+            batch.append(document)
+            if len(batch) >= batch_size:
+                inserted[collection_name] += store.write_documents(commodity, batch)
+                batch = []
+        if batch:
+            inserted[collection_name] += store.write_documents(commodity, batch)
+        print(f"Migrated {collection_name}: {inserted[collection_name]} measurements")
+    return inserted
+
+
+def _median_ms(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def compare_with_legacy(store: TimeSeriesPriceStore, days: int = 30, repeats: int = 20) -> Dict:
+    """
+    Compare storage size and latest/range query latency against the legacy collections
+
+    Args:
+        store: Time-series store (already migrated)
+        days: Length of the range query, ending today
+        repeats: Runs per query; the median is reported
+
+    Returns:
+        dict: Per-commodity sizes and median latencies in milliseconds
+    """
+    end = datetime.combine(datetime.now().date(), datetime.min.time())
+    start = end - timedelta(days=days)
+    report = {'time_series': store.collection_stats(), 'commodities': {}}
+
+    for commodity in COMMODITIES:
+        legacy = store.db[LEGACY_COLLECTIONS[commodity]]
+        date_field = LEGACY_DATE_FIELDS[commodity]
+        # The legacy egg collection is shared, so both sides read only the egg series
+        match = {'commodity': 'egg'} if commodity == 'egg' else {}
+        sample = legacy.find_one(match, {'city': 1})
+        if not sample:
+            continue
+        city = sample['city']
+        legacy_start, legacy_end = start, end + timedelta(days=1)
+
+        def legacy_latest():
+            list(legacy.aggregate(([{'$match': match}] if match else []) + [
+                {'$sort': {date_field: -1}},
+                {'$group': {'_id': '$city', 'latest_price': {'$first': '$$ROOT'}}},
+            ]))
+
+        def legacy_range():
+            query = {**match, 'city': city, date_field: {'$gte': legacy_start, '$lte': legacy_end}}
+            list(legacy.find(query).sort(date_field, 1))
+
+        report['commodities'][commodity] = {
+            'legacy_storage': store.collection_stats(legacy.name),
+            'sample_city': city,
+            'latest_ms': {
+                'legacy': _median_ms(legacy_latest, repeats),
+                'time_series': _median_ms(lambda: store.get_latest_prices(commodity), repeats),
+            },
+            'range_ms': {
+                'legacy': _median_ms(legacy_range, repeats),
+                'time_series': _median_ms(lambda: store.get_prices_by_date_range(commodity, city, start, end), repeats),
+            },
+        }
+    return report
+
+
+def main():
+    """Command line entry point for migration and comparison"""
+    parser = argparse.ArgumentParser(description="MongoDB time-series price storage")
+    parser.add_argument('command', choices=['migrate', 'compare'])
+    parser.add_argument('--connection-string', default=None)
+    parser.add_argument('--db-name', default='egg_price_data')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    store = TimeSeriesPriceStore(args.connection_string, args.db_name)
+    if args.command == 'migrate':
+        inserted = migrate_legacy_collections(store, args.batch_size)
+        print(f"Migration complete: {sum(inserted.values())} measurements inserted")
+    else:
+        report = compare_with_legacy(store, args.days, args.repeats)
+        ts = report['time_series']
+        print(f"Time-series: {ts['count']} measurements, {ts['storage_size']} bytes on disk, "
+              f"{ts['index_size']} bytes of indexes")
+        for commodity, result in report['commodities'].items():
+            legacy = result['legacy_storage']
+            print(f"\n{commodity.upper()} ({result['sample_city']})")
+            print(f"  Legacy storage: {legacy['count']} documents, {legacy['storage_size']} bytes on disk, "
+                  f"{legacy['index_size']} bytes of indexes")
+            print(f"  Latest query: legacy {result['latest_ms']['legacy']} ms, "
+                  f"time-series {result['latest_ms']['time_series']} ms")
+            print(f"  Range query:  legacy {result['range_ms']['legacy']} ms, "
+                  f"time-series {result['range_ms']['time_series']} ms")
+
+
+if __name__ == "__main__":
+    main()